@@ -3,9 +3,28 @@
 
 from ._models import (Naive, SeasonalNaive, Naive2, RandomWalkDrift,
                       Average, MovingAverage, SeasonalMovingAverage,
-                      FQRA, QRAL1, Croston, TSB, ADIDA, iMAPA)
+                      FQRA, QRAL1, Croston, TSB, ADIDA, iMAPA,
+                      qral1_grid)
 
 from ._models_r import (ARIMA, ETS, TBATS, STLM, STLMFFORMA, RandomWalk,
                         ThetaF, NaiveR, SeasonalNaiveR, NNETAR)
 
-from ._quantile_models import QuantileAutoRegression
+from ._ets import AutoETS
+
+from ._arima import AutoARIMA
+
+from ._quantile_models import (QuantileAutoRegression, MultiQuantileAutoRegression,
+                               qar_predict_batch)
+
+from ._quantreg import QuantRegFit, quantreg_fit, fit_quantiles
+
+from ._panel import (to_panel, append_panel, take_panel, fit_panel,
+                     update_panel, predict_panel)
+
+from ._routing import DemandRouter, classify_demand
+
+from ._pool import WorkerPool
+
+from ._rworker import RWorkerPool, RExpression, forecast_dtype
+
+from ._cache import ForecastCache
@@ -0,0 +1,751 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numba import njit
+from scipy.optimize import minimize
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.utils.validation import check_is_fitted
+from statsmodels.tsa.seasonal import STL
+
+# Critical values of the KPSS test (type='mu') of urca and their levels
+_KPSS_CVAL = np.array([0.347, 0.463, 0.574, 0.739])
+_KPSS_PVAL = np.array([0.1, 0.05, 0.025, 0.01])
+
+# Defaults of forecast::auto.arima
+_AUTO_ARIMA_DEFAULTS = {'d': None, 'D': None, 'max_p': 5, 'max_q': 5, 'max_P': 2,
+                        'max_Q': 2, 'max_order': 5, 'max_d': 2, 'max_D': 1,
+                        'start_p': 2, 'start_q': 2, 'start_P': 1, 'start_Q': 1,
+                        'stationary': False, 'seasonal': True, 'ic': 'aicc',
+                        'stepwise': True, 'nmodels': 94, 'approximation': None,
+                        'allowdrift': True, 'allowmean': True}
+
+
+######################################################################
+# ARMA LIKELIHOOD
+######################################################################
+
+@njit(cache=True, nogil=True)
+def _partrans(raw):
+    """Maps unconstrained values to a stationary AR polynomial. Port of R."""
+    p = len(raw)
+    new = np.tanh(raw)
+    work = new.copy()
+    for j in range(1, p):
+        a = new[j]
+        for k in range(j):
+            work[k] -= a * new[j - k - 1]
+        new[:j] = work[:j]
+
+    return new
+
+@njit(cache=True, nogil=True)
+def _inv_partrans(phi):
+    """Inverse of _partrans. Port of R."""
+    p = len(phi)
+    new = phi.copy()
+    work = new.copy()
+    for j in range(p - 1, 0, -1):
+        a = new[j]
+        for k in range(j):
+            work[k] = (new[k] + a * new[j - k - 1]) / (1 - a * a)
+        new[:j] = work[:j]
+
+    return np.arctanh(new)
+
+@njit(cache=True, nogil=True)
+def _arma_polys(par, p, q, P, Q, m, trans):
+    """Expanded AR (phi) and MA (theta) polynomials of a seasonal ARMA.
+
+    par is [ar(p), ma(q), sar(P), sma(Q)], AR blocks are in
+    the space of _partrans if trans.
+    """
+    ar = par[:p].copy()
+    ma = par[p:p + q]
+    sar = par[p + q:p + q + P].copy()
+    sma = par[p + q + P:p + q + P + Q]
+    if trans:
+        if p > 0:
+            ar = _partrans(ar)
+        if P > 0:
+            sar = _partrans(sar)
+
+    phi = np.zeros(p + P * m)
+    theta = np.zeros(q + Q * m)
+    phi[:p] = ar
+    theta[:q] = ma
+    for j in range(P):
+        phi[(j + 1) * m - 1] += sar[j]
+        for i in range(p):
+            phi[(j + 1) * m + i] -= ar[i] * sar[j]
+    for j in range(Q):
+        theta[(j + 1) * m - 1] += sma[j]
+        for i in range(q):
+            theta[(j + 1) * m + i] += ma[i] * sma[j]
+
+    return phi, theta
+
+@njit(cache=True, nogil=True)
+def _css(w, phi, theta):
+    """Conditional sum of squares and number of residuals. Port of ARIMA_CSS."""
+    n = len(w)
+    p, q = len(phi), len(theta)
+    resid = np.zeros(n)
+    ssq = 0.
+    for t in range(p, n):
+        tmp = w[t]
+        for j in range(p):
+            tmp -= phi[j] * w[t - j - 1]
+        for j in range(min(t - p, q)):
+            tmp -= theta[j] * resid[t - j - 1]
+        resid[t] = tmp
+        ssq += tmp * tmp
+
+    return ssq, n - p
+
+@njit(cache=True, nogil=True)
+def _psi_weights(phi, theta, n):
+    """First n coefficients of the MA(infinity) representation."""
+    psi = np.zeros(n)
+    psi[0] = 1.
+    for j in range(1, n):
+        value = theta[j - 1] if j <= len(theta) else 0.
+        for i in range(min(j, len(phi))):
+            value += phi[i] * psi[j - i - 1]
+        psi[j] = value
+
+    return psi
+
+@njit(cache=True, nogil=True)
+def _arma_acvf(phi, theta, psi, n_lags):
+    """Autocovariances (lags 0, ..., n_lags - 1) of an ARMA with unit variance."""
+    p, q = len(phi), len(theta)
+    theta0 = np.ones(q + 1)
+    theta0[1:] = theta
+    # rhs[k] = sum_{j=k}^{q} theta_j psi_{j-k}
+    n_rhs = max(p + 1, n_lags)
+    rhs = np.zeros(n_rhs)
+    for k in range(min(q + 1, n_rhs)):
+        for j in range(k, q + 1):
+            rhs[k] += theta0[j] * psi[j - k]
+
+    acvf = np.zeros(n_rhs)
+    A = np.eye(p + 1)
+    for k in range(p + 1):
+        for j in range(1, p + 1):
+            A[k, abs(k - j)] -= phi[j - 1]
+    acvf[:p + 1] = np.linalg.solve(A, rhs[:p + 1])
+    for k in range(p + 1, n_rhs):
+        value = rhs[k]
+        for j in range(1, p + 1):
+            value += phi[j - 1] * acvf[k - j]
+        acvf[k] = value
+
+    return acvf[:n_lags]
+
+@njit(cache=True, nogil=True)
+def _kalman(w, phi, theta, h):
+    """Exact likelihood and forecasts of a zero mean ARMA with unit variance.
+
+    The state is [y_t, E_t y_{t+1}, ..., E_t y_{t+r-1}], its
+    initial covariance follows from the autocovariances. Once
+    the filter reaches its steady state, the covariance is not
+    updated anymore (fast recursions).
+
+    Returns
+    -------
+    ssq, sumlog, nu: float, float, int
+        Sum of squared standardized innovations, sum of log
+        innovation variances and number of innovations.
+    forecasts: numpy array
+        Forecasts of the next h values.
+    """
+    p, q = len(phi), len(theta)
+    r = max(p, q + 1)
+    psi = _psi_weights(phi, theta, r)
+    acvf = _arma_acvf(phi, theta, psi, r)
+
+    P = np.empty((r, r))
+    for i in range(r):
+        for j in range(i, r):
+            value = acvf[j - i]
+            for k in range(i):
+                value -= psi[k] * psi[k + j - i]
+            P[i, j] = value
+            P[j, i] = value
+    a = np.zeros(r)
+    # Last row of the transition matrix
+    phi_r = np.zeros(r)
+    phi_r[r - p:] = phi[::-1]
+
+    ssq = 0.
+    sumlog = 0.
+    steady = False
+    for t in range(len(w)):
+        F = P[0, 0]
+        v = w[t] - a[0]
+        ssq += v * v / F
+        sumlog += np.log(F)
+        if not steady:
+            K = P[:, 0] / F
+            a += K * v
+            P -= np.outer(K, P[0, :])
+        else:
+            a += psi * v
+        # Prediction, a <- T a, P <- T P T' + psi psi'
+        a_next = np.empty(r)
+        a_next[:r - 1] = a[1:]
+        a_next[r - 1] = np.sum(phi_r * a)
+        a = a_next
+        if not steady:
+            TP = np.empty((r, r))
+            TP[:r - 1] = P[1:]
+            TP[r - 1] = phi_r @ P
+            P_next = np.empty((r, r))
+            P_next[:, :r - 1] = TP[:, 1:]
+            P_next[:, r - 1] = TP @ phi_r
+            P = P_next + np.outer(psi, psi)
+            steady = abs(P[0, 0] - 1.) < 1e-12
+
+    forecasts = np.empty(h)
+    for k in range(h):
+        forecasts[k] = a[0]
+        a_next = np.empty(r)
+        a_next[:r - 1] = a[1:]
+        a_next[r - 1] = np.sum(phi_r * a)
+        a = a_next
+
+    return ssq, sumlog, len(w), forecasts
+
+@njit(cache=True, nogil=True)
+def _arima_objective(par, w, p, q, P, Q, m, has_mean, css):
+    """Objective of stats::arima (armaCSS or armafn with transformed pars)."""
+    phi, theta = _arma_polys(par, p, q, P, Q, m, not css)
+    mu = par[p + q + P + Q] if has_mean else 0.
+    if css:
+        ssq, nu = _css(w - mu, phi, theta)
+        return 0.5 * np.log(ssq / nu)
+
+    ssq, sumlog, nu, _ = _kalman(w - mu, phi, theta, 0)
+    value = 0.5 * (np.log(ssq / nu) + sumlog / nu)
+    if not np.isfinite(value):
+        return 1.7976931348623157e+308
+
+    return value
+
+
+######################################################################
+# ESTIMATION
+######################################################################
+
+def _gradient(fn, x: np.ndarray, eps: float = 1e-3) -> np.ndarray:
+    """Central differences, as optim in R (ndeps=1e-3)."""
+    grad = np.empty_like(x)
+    for i in range(len(x)):
+        step = np.zeros_like(x)
+        step[i] = eps
+        grad[i] = (fn(x + step) - fn(x - step)) / (2 * eps)
+
+    return grad
+
+def _bfgs(fn, x0: np.ndarray) -> np.ndarray:
+    if not len(x0):
+        return x0
+    res = minimize(fn, x0, jac=lambda x: _gradient(fn, x), method='BFGS',
+                   options={'maxiter': 100})
+
+    return res.x
+
+def _max_nonzero(coefs: np.ndarray) -> int:
+    nonzero, = np.nonzero(np.abs(coefs) > 0)
+
+    return nonzero[-1] + 1 if len(nonzero) else 0
+
+def _ar_check(ar: np.ndarray) -> bool:
+    """Whether the AR polynomial is stationary (arCheck in R)."""
+    p = _max_nonzero(ar)
+    if not p:
+        return True
+
+    return np.all(np.abs(np.roots(np.r_[1, -ar[:p]][::-1])) > 1)
+
+def _ma_invert(ma: np.ndarray) -> np.ndarray:
+    """Invertible MA polynomial with the same autocovariances (maInvert in R)."""
+    q = len(ma)
+    q0 = _max_nonzero(ma)
+    if not q0:
+        return ma
+    roots = np.roots(np.r_[1, ma[:q0]][::-1])
+    inside = np.abs(roots) < 1
+    if not inside.any():
+        return ma
+    if q0 == 1:
+        return np.r_[1 / ma[0], np.zeros(q - q0)]
+    roots[inside] = 1 / roots[inside]
+    x = np.array([1.], dtype=np.complex128)
+    for root in roots:
+        x = np.r_[x, 0] - np.r_[0, x] / root
+
+    return np.r_[x[1:].real, np.zeros(q - q0)]
+
+def _difference(x: np.ndarray, d: int, D: int, m: int) -> np.ndarray:
+    for _ in range(D):
+        x = x[m:] - x[:-m]
+    for _ in range(d):
+        x = np.diff(x)
+
+    return x
+
+def _integrate(x: np.ndarray, w_hat: np.ndarray, d: int, D: int, m: int) -> np.ndarray:
+    """Forecasts of x from the forecasts of its differences."""
+    delta = np.array([1.])
+    for _ in range(d):
+        delta = np.convolve(delta, [1., -1.])
+    for _ in range(D):
+        delta = np.convolve(delta, np.r_[1., np.zeros(m - 1), -1.])
+    lags = len(delta) - 1
+
+    y = np.concatenate([x[len(x) - lags:], np.empty(len(w_hat))]) if lags else w_hat.copy()
+    for t in range(len(w_hat)):
+        y[lags + t] = w_hat[t] - np.dot(delta[1:], y[lags + t - 1::-1][:lags]) if lags \
+                      else w_hat[t]
+
+    return y[lags:]
+
+def fit_arima(x: np.ndarray, order: Tuple[int, int, int],
+              seasonal_order: Tuple[int, int, int], m: int,
+              constant: bool, method: str = 'CSS-ML') -> Optional[Dict]:
+    """Fits a seasonal ARIMA as stats::arima.
+
+    The series is differenced explicitly, the constant is the mean
+    of the differenced series (mean if there is no differencing,
+    drift if there is one difference).
+
+    Parameters
+    ----------
+    x: numpy array
+        Time series.
+    order, seasonal_order: tuples
+        (p, d, q) and (P, D, Q).
+    m: int
+        Seasonal period.
+    constant: bool
+        Whether to include the constant.
+    method: str
+        'CSS-ML' (default) or 'CSS'.
+
+    Returns
+    -------
+    Dict or None
+        Coefficients, sigma2 and -2 * loglik (None if
+        the model can not be fitted).
+    """
+    p, d, q = order
+    P, D, Q = seasonal_order
+    w = _difference(x, d, D, m)
+    n_arma = p + q + P + Q
+    init = np.zeros(n_arma + constant)
+    if constant:
+        init[-1] = w.mean()
+    args = (w, p, q, P, Q, m, constant)
+
+    css = lambda par: _arima_objective(par, *args, True)
+    par = _bfgs(css, init)
+    if method == 'CSS':
+        phi, theta = _arma_polys(par, p, q, P, Q, m, False)
+        mu = par[-1] if constant else 0.
+        ssq, nu = _css(w - mu, phi, theta)
+        sigma2 = ssq / nu
+        neg2loglik = nu * np.log(sigma2) + nu + nu * np.log(2 * np.pi)
+        return {'par': par, 'phi': phi, 'theta': theta, 'mu': mu, 'sigma2': sigma2,
+                'neg2loglik': neg2loglik, 'n_used': len(w)}
+
+    if not (_ar_check(par[:p]) and _ar_check(par[p + q:p + q + P])):
+        # Non stationary AR part from CSS
+        return None
+    init = par.copy()
+    if p:
+        init[:p] = _inv_partrans(par[:p])
+    if P:
+        init[p + q:p + q + P] = _inv_partrans(par[p + q:p + q + P])
+    if q:
+        init[p:p + q] = _ma_invert(par[p:p + q])
+    if Q:
+        init[p + q + P:n_arma] = _ma_invert(par[p + q + P:n_arma])
+
+    ml = lambda par: _arima_objective(par, *args, False)
+    par = _bfgs(ml, init)
+    # Enforce invertibility
+    if q:
+        par[p:p + q] = _ma_invert(par[p:p + q])
+    if Q:
+        par[p + q + P:n_arma] = _ma_invert(par[p + q + P:n_arma])
+
+    value = ml(par)
+    if not np.isfinite(value) or value >= 1e300:
+        return None
+    phi, theta = _arma_polys(par, p, q, P, Q, m, True)
+    mu = par[-1] if constant else 0.
+    n_used = len(w)
+    ssq, _, nu, _ = _kalman(w - mu, phi, theta, 0)
+    neg2loglik = 2 * n_used * value + n_used + n_used * np.log(2 * np.pi)
+
+    return {'par': par, 'phi': phi, 'theta': theta, 'mu': mu, 'sigma2': ssq / nu,
+            'neg2loglik': neg2loglik, 'n_used': n_used}
+
+def predict_arima(x: np.ndarray, fit: Dict, h: int) -> np.ndarray:
+    """Point forecasts of a model of fit_arima on x."""
+    d, D, m = fit['d'], fit['D'], fit['m']
+    w = _difference(x, d, D, m)
+    _, _, _, w_hat = _kalman(w - fit['mu'], fit['phi'], fit['theta'], h)
+
+    return _integrate(x, w_hat + fit['mu'], d, D, m)
+
+
+######################################################################
+# ORDER SELECTION
+######################################################################
+
+def _is_constant(x: np.ndarray) -> bool:
+    return np.all(x == x[0])
+
+def _kpss_diff(x: np.ndarray, alpha: float = 0.05) -> bool:
+    """Whether the KPSS test (urca::ur.kpss, type='mu') rejects stationarity."""
+    n = len(x)
+    lags = int(3 * np.sqrt(n) / 13)
+    e = x - x.mean()
+    eta = np.sum(np.cumsum(e) ** 2) / n ** 2
+    s2 = np.sum(e ** 2) / n
+    for lag in range(1, lags + 1):
+        s2 += 2 / n * (1 - lag / (lags + 1)) * np.sum(e[lag:] * e[:-lag])
+    stat = eta / s2
+    pval = np.interp(stat, _KPSS_CVAL, _KPSS_PVAL)
+
+    return pval < alpha
+
+def ndiffs(x: np.ndarray, max_d: int = 2, alpha: float = 0.05) -> int:
+    """Number of differences of forecast::ndiffs (KPSS test)."""
+    d = 0
+    if _is_constant(x):
+        return d
+    while _kpss_diff(x, alpha) and d < max_d:
+        d += 1
+        x = np.diff(x)
+        if len(x) < 2 or _is_constant(x):
+            return d
+
+    return d
+
+def nsdiffs(x: np.ndarray, m: int, max_D: int = 1) -> int:
+    """Number of seasonal differences of forecast::nsdiffs (test='seas').
+
+    The series is differenced while the seasonal strength of
+    a periodic STL decomposition (s.window='periodic', which R
+    runs as a degree 0 window of 10 * n + 1) is larger than 0.64.
+    """
+    D = 0
+    while D < max_D and len(x) > 2 * m and not _is_constant(x):
+        stl = STL(x, period=m, seasonal=10 * len(x) + 1, seasonal_deg=0).fit()
+        remainder, seasonal = stl.resid, stl.seasonal
+        strength = max(0., min(1., 1 - np.var(remainder) / np.var(remainder + seasonal)))
+        if strength <= 0.64:
+            break
+        D += 1
+        x = x[m:] - x[:-m]
+
+    return D
+
+def _roots_ok(fit: Dict) -> bool:
+    """auto.arima discards models with roots close to the unit circle."""
+    for coefs in (np.r_[1, -fit['phi']], np.r_[1, fit['theta']]):
+        k = _max_nonzero(coefs[1:])
+        if k and np.min(np.abs(np.roots(coefs[:k + 1][::-1]))) < 1 + 1e-2:
+            return False
+
+    return True
+
+class _Search:
+    """Fits and scores candidate models (myarima in forecast)."""
+
+    def __init__(self, x, d, D, m, ic, method, offset, executor):
+        self.x, self.d, self.D, self.m = x, d, D, m
+        self.ic, self.method, self.offset = ic, method, offset
+        self.executor = executor
+        self.results: Dict[Tuple, Tuple[float, Optional[Dict]]] = {}
+
+    def _fit(self, candidate: Tuple) -> Tuple[float, Optional[Dict]]:
+        p, q, P, Q, constant = candidate
+        try:
+            fit = fit_arima(self.x, (p, self.d, q), (P, self.D, Q), self.m,
+                            constant, self.method)
+        except (np.linalg.LinAlgError, ValueError, ZeroDivisionError):
+            fit = None
+        if fit is None:
+            return np.inf, None
+
+        n_par = p + q + P + Q + constant + 1
+        nstar = fit['n_used']
+        if self.method == 'CSS':
+            aic = self.offset + nstar * np.log(fit['sigma2']) + 2 * n_par
+        else:
+            aic = fit['neg2loglik'] + 2 * n_par
+        if not np.isfinite(aic):
+            return np.inf, None
+        if self.ic == 'aic':
+            value = aic
+        elif self.ic == 'bic':
+            value = aic + n_par * (np.log(nstar) - 2)
+        else:
+            value = aic + 2 * n_par * (n_par + 1) / (nstar - n_par - 1) \
+                    if nstar - n_par - 1 > 0 else np.inf
+        fit.update(order=(p, self.d, q), seasonal_order=(P, self.D, Q),
+                   d=self.d, D=self.D, m=self.m, constant=constant, ic=value)
+        if not _roots_ok(fit):
+            value = np.inf
+
+        return value, fit
+
+    def evaluate(self, candidates: List[Tuple]) -> List[float]:
+        """IC of each candidate, fitting the new ones concurrently."""
+        new = [c for c in dict.fromkeys(candidates) if c not in self.results]
+        if self.executor is not None and len(new) > 1:
+            fitted = list(self.executor.map(self._fit, new))
+        else:
+            fitted = [self._fit(c) for c in new]
+        self.results.update(zip(new, fitted))
+
+        return [self.results[c][0] for c in candidates]
+
+    def best(self) -> Tuple[float, Optional[Dict]]:
+        return min(self.results.values(), key=lambda r: r[0], default=(np.inf, None))
+
+def _stepwise(search: _Search, start: Tuple, max_p: int, max_q: int,
+              max_P: int, max_Q: int, constant: bool, seasonal: bool, nmodels: int) -> None:
+    """Stepwise search of forecast::auto.arima."""
+    p, q, P, Q = start
+    initial = [(p, q, P, Q, constant), (0, 0, 0, 0, constant)]
+    if max_p > 0 or max_P > 0:
+        initial.append((int(max_p > 0), 0, int(seasonal and max_P > 0), 0, constant))
+    if max_q > 0 or max_Q > 0:
+        initial.append((0, int(max_q > 0), 0, int(seasonal and max_Q > 0), constant))
+    if constant:
+        initial.append((0, 0, 0, 0, False))
+    ics = search.evaluate(initial)
+
+    best_ic = np.inf
+    current = None
+    for candidate, ic in zip(initial, ics):
+        if ic < best_ic:
+            best_ic, current = ic, candidate
+    if current is None:
+        current = initial[0]
+
+    while len(search.results) < nmodels:
+        p, q, P, Q, c = current
+        moves = [
+            (P > 0, (p, q, P - 1, Q, c)),
+            (Q > 0, (p, q, P, Q - 1, c)),
+            (P < max_P, (p, q, P + 1, Q, c)),
+            (Q < max_Q, (p, q, P, Q + 1, c)),
+            (Q > 0 and P > 0, (p, q, P - 1, Q - 1, c)),
+            (Q < max_Q and P > 0, (p, q, P - 1, Q + 1, c)),
+            (Q > 0 and P < max_P, (p, q, P + 1, Q - 1, c)),
+            (Q < max_Q and P < max_P, (p, q, P + 1, Q + 1, c)),
+            (p > 0, (p - 1, q, P, Q, c)),
+            (q > 0, (p, q - 1, P, Q, c)),
+            (p < max_p, (p + 1, q, P, Q, c)),
+            (q < max_q, (p, q + 1, P, Q, c)),
+            (q > 0 and p > 0, (p - 1, q - 1, P, Q, c)),
+            (q < max_q and p > 0, (p - 1, q + 1, P, Q, c)),
+            (q > 0 and p < max_p, (p + 1, q - 1, P, Q, c)),
+            (q < max_q and p < max_p, (p + 1, q + 1, P, Q, c)),
+            (constant, (p, q, P, Q, not c)),
+        ]
+        moves = [move for allowed, move in moves
+                 if allowed and move not in search.results]
+        if not moves:
+            break
+        moves = moves[:nmodels - len(search.results)]
+        if search.executor is not None:
+            # Neighbours are fitted concurrently, the first improvement is kept
+            ics = search.evaluate(moves)
+        else:
+            # Neighbours are fitted until the first improvement
+            ics = []
+            for move in moves:
+                ics.extend(search.evaluate([move]))
+                if ics[-1] < best_ic:
+                    break
+        improved = [(move, ic) for move, ic in zip(moves, ics) if ic < best_ic]
+        if not improved:
+            break
+        current, best_ic = improved[0]
+
+def auto_arima_fit(x: np.ndarray, m: int, n_jobs: int = 1, **kwargs) -> Dict:
+    """Automatic ARIMA model of forecast::auto.arima.
+
+    Parameters
+    ----------
+    x: numpy array
+        Time series.
+    m: int
+        Frequency of the time series.
+    n_jobs: int
+        Number of threads to fit candidate models.
+    kwargs:
+        Arguments of auto.arima with underscores instead of
+        dots (max_p, stepwise, approximation, ...).
+
+    Returns
+    -------
+    Dict
+        Orders, coefficients and information criterion of the model.
+    """
+    unknown = set(kwargs) - set(_AUTO_ARIMA_DEFAULTS)
+    if unknown:
+        raise ValueError(f'Unsupported arguments of auto.arima: {sorted(unknown)}')
+    args = {**_AUTO_ARIMA_DEFAULTS, **kwargs}
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+
+    if _is_constant(x):
+        return {'order': (0, 0, 0), 'seasonal_order': (0, 0, 0), 'd': 0, 'D': 0,
+                'm': 1, 'phi': np.empty(0), 'theta': np.empty(0), 'mu': x[0],
+                'constant': True, 'ic': np.inf}
+
+    max_p, max_q = args['max_p'], args['max_q']
+    max_P, max_Q = args['max_P'], args['max_Q']
+    ic = args['ic'] if n > 3 else 'aic'
+    seasonal = args['seasonal'] and m > 1
+    if not seasonal:
+        m, max_P, max_Q = 1, 0, 0
+    max_p, max_q = min(max_p, n // 3), min(max_q, n // 3)
+    max_P, max_Q = min(max_P, n // 3 // m), min(max_Q, n // 3 // m)
+
+    if args['stationary']:
+        d = D = 0
+    else:
+        D = args['D']
+        if D is None:
+            D = nsdiffs(x, m, args['max_D']) if seasonal else 0
+        dx = _difference(x, 0, D, m)
+        d = args['d']
+        if d is None:
+            d = ndiffs(dx, args['max_d'])
+
+    dx = _difference(x, d, D, m)
+    if not len(dx):
+        raise ValueError('Not enough data to proceed')
+    if _is_constant(dx):
+        mu = dx[0] if d + D < 2 else 0.
+        return {'order': (0, d, 0), 'seasonal_order': (0, D, 0), 'd': d, 'D': D,
+                'm': m, 'phi': np.empty(0), 'theta': np.empty(0), 'mu': mu,
+                'constant': d + D < 2, 'ic': np.inf}
+
+    if m > 1:
+        if max_P > 0:
+            max_p = min(max_p, m - 1)
+        if max_Q > 0:
+            max_q = min(max_q, m - 1)
+
+    constant = (args['allowdrift'] and d + D == 1) or (args['allowmean'] and d + D == 0)
+    approximation = args['approximation']
+    if approximation is None:
+        approximation = n > 150 or m > 12
+    offset = 0.
+    if approximation:
+        fit = fit_arima(x, (1, d, 0), (0, 0, 0), 1, d == 0)
+        if fit is not None:
+            offset = fit['neg2loglik'] - n * np.log(fit['sigma2'])
+    method = 'CSS' if approximation else 'CSS-ML'
+
+    executor = ThreadPoolExecutor(n_jobs) if n_jobs > 1 else None
+    try:
+        search = _Search(x, d, D, m, ic, method, offset, executor)
+        if args['stepwise']:
+            start = (min(args['start_p'], max_p), min(args['start_q'], max_q),
+                     min(args['start_P'], max_P), min(args['start_Q'], max_Q))
+            _stepwise(search, start, max_p, max_q, max_P, max_Q, constant,
+                      seasonal, args['nmodels'])
+        else:
+            constants = [False, True] if constant else [False]
+            candidates = [(i, j, I, J, K) for i, j, I, J in
+                          product(range(max_p + 1), range(max_q + 1),
+                                  range(max_P + 1), range(max_Q + 1))
+                          if i + j + I + J <= args['max_order']
+                          for K in constants]
+            search.evaluate(candidates)
+
+        if approximation:
+            # Refit the best models without approximations
+            ranked = sorted((ic, c) for c, (ic, _) in search.results.items()
+                            if np.isfinite(ic))
+            search.method = 'CSS-ML'
+            search.results = {}
+            for _, candidate in ranked:
+                if np.isfinite(search.evaluate([candidate])[0]):
+                    break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    ic, best = search.best()
+    if best is None or not np.isfinite(ic):
+        raise ValueError('No suitable ARIMA model found')
+
+    return best
+
+
+class AutoARIMA(BaseEstimator, RegressorMixin):
+    """Native implementation of forecast::auto.arima from R.
+
+    Drop-in for ARIMA: candidate orders are fitted with a
+    compiled Kalman filter likelihood (numba, without the GIL)
+    and scored by their information criterion.
+
+    Parameters
+    ----------
+    freq: int or iterable
+        Frequency of the time series.
+        Can be multiple seasonalities. (Last seasonality
+        considered as frequency.)
+    n_jobs: int
+        Number of threads to fit candidate orders concurrently.
+    kwargs:
+        Arguments of auto.arima (stepwise, approximation,
+        max.p or max_p, ...).
+    """
+
+    def __init__(self, freq, n_jobs=1, **kwargs):
+        self.freq = freq
+        self.n_jobs = n_jobs
+        self.kwargs = kwargs
+
+    def fit(self, X, y):
+        self.y_ = np.asarray(y, dtype=np.float64).ravel()
+        m = int(np.floor(np.max(self.freq)))
+        kwargs = {key.replace('.', '_'): value for key, value in self.kwargs.items()}
+        self.model_ = auto_arima_fit(self.y_, m, n_jobs=self.n_jobs, **kwargs)
+
+        return self
+
+    def update(self, X, y):
+        """Applies the fitted model to y, the whole history extended with new values.
+
+        Orders and coefficients are kept, as forecast::Arima with
+        the model argument (see ARIMA.update).
+        """
+        if not hasattr(self, 'model_'):
+            return self.fit(X, y)
+        self.y_ = np.asarray(y, dtype=np.float64).ravel()
+
+        return self
+
+    def predict(self, X):
+        check_is_fitted(self, 'model_')
+
+        return predict_arima(self.y_, self.model_, len(X))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Changing it invalidates every stored forecast
+_CACHE_VERSION = b'2'
+
+
+def _stable_repr(value) -> str:
+    """repr of a parameter that does not depend on memory addresses."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return repr(value)
+    if isinstance(value, np.ndarray):
+        return f'array({value.tolist()!r})'
+    if isinstance(value, (list, tuple)):
+        return f'{type(value).__name__}({", ".join(_stable_repr(v) for v in value)})'
+    if isinstance(value, dict):
+        items = sorted((str(k), _stable_repr(v)) for k, v in value.items())
+        return f'dict({items!r})'
+    if isinstance(value, np.generic):
+        return repr(value.item())
+    if hasattr(value, 'fit') and hasattr(value, '__dict__'):
+        # Models inside models (PanelModel, fallbacks, ...)
+        return _model_repr(value)
+
+    # Functions, R objects, ...
+    name = getattr(value, '__rname__', getattr(value, '__name__', ''))
+    return f'{type(value).__module__}.{type(value).__qualname__}:{name}'
+
+def _model_repr(model) -> str:
+    """Class and constructor state of a model, fitted attributes excluded.
+
+    The whole state is used instead of get_params: models that collect
+    their arguments in **kwargs (R models, AutoARIMA) only report the
+    named ones.
+    """
+    if hasattr(model, '__dict__'):
+        state = {name: value for name, value in vars(model).items()
+                 if not name.endswith('_')}
+    else:
+        state = model.get_params(deep=False)
+    cls = f'{type(model).__module__}.{type(model).__qualname__}'
+
+    return f'{cls}({_stable_repr(state)})'
+
+def model_key(model) -> str:
+    """Hash of the class and constructor state of a model."""
+    content = _model_repr(model).encode()
+
+    return hashlib.blake2b(_CACHE_VERSION + content, digest_size=16).hexdigest()
+
+def series_keys(values: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                horizons: np.ndarray,
+                X_test: Optional[Sequence[np.ndarray]] = None) -> np.ndarray:
+    """Hash of the values, the horizon and the exogenous vars of each series.
+
+    Parameters
+    ----------
+    values: numpy array
+        Concatenated values of the series.
+    starts, ends: numpy arrays
+        The i-th series is values[starts[i]:ends[i]].
+    horizons: numpy array
+        Forecast horizon of each series.
+    X_test: Sequence of numpy arrays
+        Exogenous vars to predict of each series. Default to None.
+
+    Returns
+    -------
+    numpy array
+        Hex digests.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    keys = np.empty(len(starts), dtype=object)
+
+    for i in range(len(keys)):
+        digest = hashlib.blake2b(_CACHE_VERSION, digest_size=16)
+        digest.update(values[starts[i]:ends[i]].tobytes())
+        digest.update(int(horizons[i]).to_bytes(8, 'little'))
+        if X_test is not None:
+            digest.update(np.ascontiguousarray(X_test[i], dtype=np.float64).tobytes())
+        keys[i] = digest.hexdigest()
+
+    return keys
+
+
+class ForecastCache:
+    """
+    Content-addressed on-disk store of forecasts.
+
+    Forecasts are keyed by the hash of the model (class and constructor
+    state, kwargs included) and the hash of the series (values, horizon
+    and exogenous vars), so changing a model or a series only invalidates
+    its own entries. Each model has a directory of append-only shards,
+    written atomically as tasks finish, so an interrupted run resumes
+    from the forecasts already stored.
+
+    Parameters
+    ----------
+    directory: str or Path
+        Directory of the cache, created if needed.
+    flush_size: int
+        Number of forecasts of a model buffered before writing a shard.
+    """
+
+    def __init__(self, directory: Union[str, Path], flush_size: int = 1_000):
+        self.directory = Path(directory)
+        self.flush_size = flush_size
+
+    def _model_dir(self, key: str) -> Path:
+        return self.directory / key
+
+    def get(self, key: str, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored forecasts of model key for the series keys.
+
+        Returns
+        -------
+        Dict[str, numpy array]
+            Forecasts by series key, missing series are not included.
+        """
+        model_dir = self._model_dir(key)
+        if not model_dir.exists():
+            return {}
+
+        wanted = set(keys)
+        found = {}
+        for shard in sorted(model_dir.glob('*.npz')):
+            with np.load(shard, allow_pickle=False) as data:
+                shard_keys = data['keys']
+                rows = [i for i, k in enumerate(shard_keys) if k in wanted]
+                if not rows:
+                    continue
+                values, indptr = data['values'], data['indptr']
+                for i in rows:
+                    found[shard_keys[i]] = values[indptr[i]:indptr[i + 1]]
+
+        return found
+
+    def put(self, key: str, keys: Sequence[str], y_hats: Sequence[np.ndarray]) -> None:
+        """Stores forecasts of model key for the series keys in a new shard."""
+        if not len(keys):
+            return
+
+        model_dir = self._model_dir(key)
+        model_dir.mkdir(parents=True, exist_ok=True)
+
+        y_hats = [np.asarray(y_hat, dtype=np.float64).ravel() for y_hat in y_hats]
+        indptr = np.zeros(len(y_hats) + 1, dtype=np.int64)
+        np.cumsum([len(y_hat) for y_hat in y_hats], out=indptr[1:])
+
+        name = uuid.uuid4().hex
+        tmp = model_dir / f'{name}.tmp'
+        with open(tmp, 'wb') as file:
+            np.savez(file, keys=np.array(keys, dtype=str),
+                     values=np.concatenate(y_hats), indptr=indptr)
+        os.replace(tmp, model_dir / f'{name}.npz')
+
+    def writer(self, key: str) -> 'CacheWriter':
+        """Buffered writer of forecasts of model key."""
+        return CacheWriter(self, key)
+
+    def compact(self) -> None:
+        """Merges the shards of each model into one."""
+        for model_dir in self.directory.glob('*'):
+            shards = sorted(model_dir.glob('*.npz'))
+            if len(shards) < 2:
+                continue
+            keys, y_hats = [], []
+            for shard in shards:
+                with np.load(shard, allow_pickle=False) as data:
+                    values, indptr = data['values'], data['indptr']
+                    keys.extend(data['keys'])
+                    y_hats.extend(values[indptr[i]:indptr[i + 1]]
+                                  for i in range(len(indptr) - 1))
+            self.put(model_dir.name, keys, y_hats)
+            for shard in shards:
+                shard.unlink()
+
+
+class CacheWriter:
+    """Buffers forecasts of a model and writes them in shards."""
+
+    def __init__(self, cache: ForecastCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.keys: List[str] = []
+        self.y_hats: List[np.ndarray] = []
+
+    def add(self, key: str, y_hat: np.ndarray) -> None:
+        self.keys.append(key)
+        self.y_hats.append(y_hat)
+        if len(self.keys) >= self.cache.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.cache.put(self.key, self.keys, self.y_hats)
+        self.keys, self.y_hats = [], []
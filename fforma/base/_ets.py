@@ -0,0 +1,640 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from itertools import product
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from numba import njit
+from scipy.optimize import minimize
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.utils.validation import check_is_fitted
+
+from ._theta import _seasonal_figure
+
+# Component codes and constants of forecast/src/etscalc.c
+_NONE, _ADD, _MULT = 0, 1, 2
+_COMPONENTS = {'N': _NONE, 'A': _ADD, 'M': _MULT}
+_TOL = 1e-10
+_HUGEN = 10e10
+_NA = -99999.0
+# Value of a non finite objective in the Nelder-Mead of R (optim.c)
+_BIG = 1.0e35
+
+# Usual bounds of alpha, beta, gamma and phi in forecast::ets
+_LOWER = np.array([1e-4, 1e-4, 1e-4, 0.8])
+_UPPER = np.array([0.9999, 0.9999, 0.9999, 0.98])
+
+
+######################################################################
+# STATE SPACE RECURSIONS
+######################################################################
+
+@njit(cache=True, nogil=True)
+def _etscalc(y, x, m, error, trend, season, alpha, beta, gamma, phi):
+    """Likelihood (-2 loglik up to a constant) and final state of an ets model.
+
+    Port of etscalc in forecast, x is the initial state
+    [l, b, s_0, ..., s_{m-1}] (b and s only if used).
+    """
+    n_b = 1 if trend != _NONE else 0
+    n_s = m if season != _NONE else 0
+    l = x[0]
+    b = x[1] if n_b else 0.
+    s = x[1 + n_b:1 + n_b + n_s].copy()
+    olds = s.copy()
+
+    lik = 0.
+    lik2 = 0.
+    for i in range(len(y)):
+        oldl = l
+        oldb = b
+        olds[:] = s
+
+        # One step forecast
+        if trend == _NONE:
+            phib = 0.
+            q = oldl
+        elif trend == _ADD:
+            phib = phi * oldb
+            q = oldl + phib
+        else:
+            if oldb < 0:
+                return _NA, x
+            phib = oldb if abs(phi - 1.) < _TOL else oldb ** phi
+            q = oldl * phib
+        if season == _NONE:
+            f = q
+        elif season == _ADD:
+            f = q + olds[m - 1]
+        else:
+            f = q * olds[m - 1]
+
+        if error == _ADD:
+            e = y[i] - f
+        else:
+            e = (y[i] - f) / f
+
+        # New level
+        if season == _NONE:
+            p = y[i]
+        elif season == _ADD:
+            p = y[i] - olds[m - 1]
+        else:
+            p = _HUGEN if abs(olds[m - 1]) < _TOL else y[i] / olds[m - 1]
+        l = q + alpha * (p - q)
+
+        # New growth
+        if trend != _NONE:
+            if trend == _ADD:
+                r = l - oldl
+            else:
+                r = _HUGEN if abs(oldl) < _TOL else l / oldl
+            b = phib + (beta / alpha) * (r - phib)
+
+        # New season
+        if season != _NONE:
+            if season == _ADD:
+                t = y[i] - q
+            else:
+                t = _HUGEN if abs(q) < _TOL else y[i] / q
+            s[0] = olds[m - 1] + gamma * (t - olds[m - 1])
+            s[1:] = olds[:-1]
+
+        lik += e * e
+        lik2 += np.log(abs(f))
+
+    lik = len(y) * np.log(lik)
+    if error == _MULT:
+        lik += 2 * lik2
+
+    state = np.empty(1 + n_b + n_s)
+    state[0] = l
+    if n_b:
+        state[1] = b
+    state[1 + n_b:] = s
+
+    return lik, state
+
+@njit(cache=True, nogil=True)
+def _ets_forecast(state, m, trend, season, phi, h):
+    """Point forecasts from the final state. Port of forecast in etscalc.c."""
+    n_b = 1 if trend != _NONE else 0
+    l = state[0]
+    b = state[1] if n_b else 0.
+    s = state[1 + n_b:]
+
+    f = np.empty(h)
+    phistar = phi
+    for i in range(h):
+        if trend == _NONE:
+            f[i] = l
+        elif trend == _ADD:
+            f[i] = l + phistar * b
+        elif b < 0:
+            f[i] = np.nan
+        else:
+            f[i] = l * b ** phistar
+        j = m - 1 - i
+        while j < 0:
+            j += m
+        if season == _ADD:
+            f[i] += s[j]
+        elif season == _MULT:
+            f[i] *= s[j]
+        # phistar of step i + 2 is phi + phi^2 + ... + phi^(i + 2)
+        if abs(phi - 1.) < _TOL:
+            phistar += 1.
+        else:
+            phistar += phi ** (i + 2)
+
+    return f
+
+@njit(cache=True, nogil=True)
+def _admissible(alpha, beta, gamma, phi, m, seasonal):
+    """Admissible parameter space of forecast::ets."""
+    if phi < 0 or phi > 1 + 1e-8:
+        return False
+    if not seasonal:
+        if alpha < 1 - 1 / phi or alpha > 1 + 1 / phi:
+            return False
+        if beta < alpha * (phi - 1) or beta > (1 + phi) * (2 - alpha):
+            return False
+    elif m > 1:
+        if gamma < max(1 - 1 / phi - alpha, 0.) or gamma > 1 + 1 / phi - alpha:
+            return False
+        if alpha < 1 - 1 / phi - gamma * (1 - m + phi + phi * m) / (2 * phi * m):
+            return False
+        if beta < -(1 - phi) * (gamma / m + alpha):
+            return False
+        # Characteristic equation
+        coefs = np.empty(m + 2)
+        coefs[0] = 1.
+        coefs[1] = alpha + beta - phi
+        coefs[2:m] = alpha + beta - alpha * phi
+        coefs[m] = alpha + beta - alpha * phi + gamma - 1
+        coefs[m + 1] = phi * (1 - alpha - gamma)
+        if not _roots_within(coefs, 1 + 1e-10):
+            return False
+
+    return True
+
+@njit(cache=True, nogil=True)
+def _roots_within(coefs, radius):
+    """Whether the roots of a monic polynomial (decreasing powers)
+    have modulus smaller than radius.
+
+    Schur-Cohn step-down test on the polynomial of z * radius, it
+    avoids computing the roots (as polyroot in R).
+    """
+    a = coefs / radius ** np.arange(len(coefs))
+    for order in range(len(a) - 1, 0, -1):
+        r = a[order] / a[0]
+        if abs(r) >= 1:
+            return False
+        a = (a[:order] - r * a[order:0:-1]) / (1 - r * r)
+
+    return True
+
+@njit(cache=True, nogil=True)
+def _ets_objective(par, y, m, error, trend, season, damped):
+    """Objective of the optimization of forecast::ets (opt.crit='lik').
+
+    par is [alpha, beta, gamma, phi, l, b, s_0, ..., s_{m-2}]
+    (only the components of the model).
+    """
+    alpha = par[0]
+    beta, gamma, phi = 0., 0., 1.
+    j = 1
+    if trend != _NONE:
+        beta = par[j]
+        j += 1
+    if season != _NONE:
+        gamma = par[j]
+        j += 1
+    if damped:
+        phi = par[j]
+        j += 1
+
+    if alpha < _LOWER[0] or alpha > _UPPER[0]:
+        return np.inf
+    if trend != _NONE and (beta < _LOWER[1] or beta > alpha or beta > _UPPER[1]):
+        return np.inf
+    if damped and (phi < _LOWER[3] or phi > _UPPER[3]):
+        return np.inf
+    if season != _NONE and (gamma < _LOWER[2] or gamma > 1 - alpha or gamma > _UPPER[2]):
+        return np.inf
+    if not _admissible(alpha, beta, gamma, phi, m, season != _NONE):
+        return np.inf
+
+    n_b = 1 if trend != _NONE else 0
+    n_s = m if season != _NONE else 0
+    x = np.empty(1 + n_b + n_s)
+    x[:len(par) - j] = par[j:]
+    if n_s:
+        # The last seasonal state is not a parameter
+        total = np.sum(x[1 + n_b:n_b + m])
+        x[-1] = -total if season == _ADD else m - total
+        if season == _MULT and np.min(x[1 + n_b:]) < 0:
+            return np.inf
+
+    lik, _ = _etscalc(y, x, m, error, trend, season, alpha, beta, gamma, phi)
+    # Avoid perfect fits
+    if lik < -1e10:
+        lik = -1e10
+    if np.isnan(lik) or abs(lik + 99999) < 1e-7:
+        return np.inf
+
+    return lik
+
+@njit(cache=True, nogil=True)
+def _nelder_mead(par, y, m, error, trend, season, damped,
+                 maxit=2000, reltol=1.4901161193847656e-08):
+    """Minimizes _ets_objective. Port of nmmin in R (src/appl/optim.c).
+
+    Returns the best parameters and objective.
+    """
+    n = len(par)
+    n1 = n + 1
+    # Columns are the vertices, the last row their objective,
+    # the last column the centroid
+    P = np.empty((n1, n + 2))
+    bvec = par.copy()
+
+    f = _ets_objective(bvec, y, m, error, trend, season, damped)
+    if not np.isfinite(f):
+        return bvec, np.inf
+    funcount = 1
+    convtol = reltol * (abs(f) + reltol)
+    P[n, 0] = f
+    P[:n, 0] = bvec
+
+    L = 0
+    step = 0.
+    for i in range(n):
+        step = max(step, 0.1 * abs(bvec[i]))
+    if step == 0.:
+        step = 0.1
+    size = 0.
+    for j in range(1, n1):
+        P[:n, j] = bvec
+        trystep = step
+        while P[j - 1, j] == bvec[j - 1]:
+            P[j - 1, j] = bvec[j - 1] + trystep
+            trystep *= 10
+        size += trystep
+    oldsize = size
+    calcvert = True
+
+    while True:
+        if calcvert:
+            for j in range(n1):
+                if j != L:
+                    f = _ets_objective(P[:n, j].copy(), y, m, error, trend, season, damped)
+                    P[n, j] = f if np.isfinite(f) else _BIG
+                    funcount += 1
+            calcvert = False
+
+        VL = P[n, L]
+        VH = VL
+        H = L
+        for j in range(n1):
+            if j != L:
+                f = P[n, j]
+                if f < VL:
+                    L = j
+                    VL = f
+                if f > VH:
+                    H = j
+                    VH = f
+
+        if VH <= VL + convtol:
+            break
+
+        for i in range(n):
+            P[i, n1] = (np.sum(P[i, :n1]) - P[i, H]) / n
+        bvec = 2. * P[:n, n1] - P[:n, H]
+        f = _ets_objective(bvec, y, m, error, trend, season, damped)
+        if not np.isfinite(f):
+            f = _BIG
+        funcount += 1
+        VR = f
+        if VR < VL:
+            # Extension
+            P[n, n1] = f
+            new = 2. * bvec - P[:n, n1]
+            P[:n, n1] = bvec
+            bvec = new
+            f = _ets_objective(bvec, y, m, error, trend, season, damped)
+            if not np.isfinite(f):
+                f = _BIG
+            funcount += 1
+            if f < VR:
+                P[:n, H] = bvec
+                P[n, H] = f
+            else:
+                P[:n, H] = P[:n, n1]
+                P[n, H] = VR
+        else:
+            # Reduction
+            if VR < VH:
+                P[:n, H] = bvec
+                P[n, H] = VR
+            bvec = 0.5 * P[:n, H] + 0.5 * P[:n, n1]
+            f = _ets_objective(bvec, y, m, error, trend, season, damped)
+            if not np.isfinite(f):
+                f = _BIG
+            funcount += 1
+            if f < P[n, H]:
+                P[:n, H] = bvec
+                P[n, H] = f
+            elif VR >= VH:
+                # Shrink
+                calcvert = True
+                size = 0.
+                for j in range(n1):
+                    if j != L:
+                        P[:n, j] = 0.5 * (P[:n, j] - P[:n, L]) + P[:n, L]
+                        size += np.sum(np.abs(P[:n, j] - P[:n, L]))
+                if size < oldsize:
+                    oldsize = size
+                else:
+                    break
+
+        if funcount > maxit:
+            break
+
+    return P[:n, L].copy(), P[n, L]
+
+@njit(cache=True, nogil=True)
+def _holt_winters_sse(y, alpha, beta, trend):
+    """SSE and final state of non seasonal HoltWintersZZ in forecast.
+
+    The initial state is y[0] (and y[1] - y[0] as growth).
+    """
+    level = y[0]
+    growth = y[1] - y[0] if trend else 0.
+    if not trend:
+        beta = 0.
+    sse = 0.
+    for i in range(len(y)):
+        y_hat = level + growth
+        sse += (y[i] - y_hat) ** 2
+        new_level = alpha * y[i] + (1 - alpha) * (level + growth)
+        growth = beta * (new_level - level) + (1 - beta) * growth
+        level = new_level
+
+    return sse, level, growth
+
+
+######################################################################
+# INITIALIZATION
+######################################################################
+
+def _initial_state(y: np.ndarray, m: int, trend: str, season: str) -> np.ndarray:
+    """Initial state of forecast::ets (initstate), l, b and s_0, ..., s_{m-2}."""
+    n = len(y)
+    init_season = np.empty(0)
+    y_sa = y
+    if season != 'N':
+        t = np.arange(1, n + 1)
+        if n < 3 * m:
+            # Simple Fourier model
+            fourier = [np.cos(2 * np.pi * t / m)]
+            if m > 2:
+                fourier.insert(0, np.sin(2 * np.pi * t / m))
+            design = np.column_stack([np.ones(n), t] + fourier)
+            coefs = np.linalg.lstsq(design, y, rcond=None)[0]
+            if season == 'A':
+                seasonal = y - coefs[0] - coefs[1] * t
+            else:
+                seasonal = y / (coefs[0] + coefs[1] * t)
+        else:
+            figure = _seasonal_figure(y[None], m, multiplicative=(season == 'M'))[0]
+            seasonal = figure[np.arange(n) % m]
+        init_season = seasonal[1:m][::-1]
+
+        if season == 'A':
+            y_sa = y - seasonal
+        else:
+            init_season = np.maximum(init_season, 1e-2)
+            if init_season.sum() > m:
+                init_season = init_season / np.sum(init_season + 1e-2)
+            y_sa = y / np.maximum(seasonal, 1e-2)
+    else:
+        m = 1
+
+    maxn = min(max(10, 2 * m), n)
+    if trend == 'N':
+        state = [np.mean(y_sa[:maxn])]
+    else:
+        t = np.arange(1, maxn + 1)
+        b0, l0 = np.polyfit(t, y_sa[:maxn], 1)
+        if abs(l0 + b0) < 1e-8:
+            l0, b0 = l0 * (1 + 1e-3), b0 * (1 - 1e-3)
+        state = [l0, b0]
+
+    return np.concatenate([state, init_season])
+
+def _initial_params(m: int, trend: str, season: str, damped: bool) -> np.ndarray:
+    """Initial smoothing parameters of forecast::ets (initparam)."""
+    lower, upper = _LOWER.copy(), _UPPER.copy()
+    alpha = lower[0] + 0.2 * (upper[0] - lower[0]) / m
+    if alpha > 1 or alpha < 0:
+        alpha = lower[0] + 2e-3
+    par = [alpha]
+    if trend != 'N':
+        upper[1] = min(upper[1], alpha)
+        beta = lower[1] + 0.1 * (upper[1] - lower[1])
+        if beta < 0 or beta > alpha:
+            beta = alpha - 1e-3
+        par.append(beta)
+    if season != 'N':
+        upper[2] = min(upper[2], 1 - alpha)
+        gamma = lower[2] + 0.05 * (upper[2] - lower[2])
+        if gamma < 0 or gamma > 1 - alpha:
+            gamma = 1 - alpha - 1e-3
+        par.append(gamma)
+    if damped:
+        phi = lower[3] + .99 * (upper[3] - lower[3])
+        if phi < 0 or phi > 1:
+            phi = upper[3] - 1e-3
+        par.append(phi)
+
+    return np.array(par)
+
+
+######################################################################
+# MODEL SEARCH
+######################################################################
+
+def _fit_ets_model(y: np.ndarray, m: int, error: str, trend: str,
+                   season: str, damped: bool) -> Optional[Dict]:
+    """Fits an ets model, None if it can not be fitted."""
+    m_model = m if season != 'N' else 1
+    par = np.concatenate([_initial_params(m_model, trend, season, damped),
+                          _initial_state(y, m_model, trend, season)])
+    n_par = len(par)
+    if n_par >= len(y) - 1:
+        return None
+
+    codes = (_COMPONENTS[error], _COMPONENTS[trend], _COMPONENTS[season])
+    par, lik = _nelder_mead(par, y, m_model, *codes, damped)
+    if not np.isfinite(lik):
+        return None
+
+    n_smooth = 1 + (trend != 'N') + (season != 'N') + damped
+    smooth = dict(zip(['alpha'] + ['beta'] * (trend != 'N')
+                      + ['gamma'] * (season != 'N') + ['phi'] * damped, par[:n_smooth]))
+    x = par[n_smooth:]
+    if season != 'N':
+        start = 1 + (trend != 'N')
+        last = -x[start:].sum() if season == 'A' else m_model - x[start:].sum()
+        x = np.append(x, last)
+    _, state = _etscalc(y, x, m_model, *codes, smooth['alpha'], smooth.get('beta', 0.),
+                        smooth.get('gamma', 0.), smooth.get('phi', 1.))
+
+    n_par += 1
+    n = len(y)
+    aic = lik + 2 * n_par
+    aicc = aic + 2 * n_par * (n_par + 1) / (n - n_par - 1) if n - n_par - 1 > 0 else np.inf
+
+    return {'components': (error, trend, season, damped), 'm': m_model,
+            'phi': smooth.get('phi', 1.), 'state': state, 'aicc': aicc,
+            'params': smooth}
+
+def _fit_holt_winters(y: np.ndarray, m: int, trend: bool) -> Optional[Dict]:
+    """Non seasonal HoltWintersZZ, used by forecast::ets on tiny series."""
+    if trend and len(y) < 2:
+        return None
+    alpha = 0.2 / m
+    start = [alpha, 0.1 * alpha] if trend else [alpha]
+
+    def sse(par):
+        return _holt_winters_sse(y, par[0], par[1] if trend else 0., trend)[0]
+
+    par = minimize(sse, start, method='L-BFGS-B', bounds=[(0, 1)] * len(start),
+                   options={'maxiter': 2000}).x
+    sse, level, growth = _holt_winters_sse(y, par[0], par[1] if trend else 0., trend)
+    state = np.array([level, growth]) if trend else np.array([level])
+
+    return {'components': ('A', 'A' if trend else 'N', 'N', False), 'm': 1,
+            'phi': 1., 'state': state, 'sigma2': sse / len(y),
+            'params': dict(zip(['alpha', 'beta'], par))}
+
+def ets_fit(y: np.ndarray, m: int) -> Dict:
+    """Automatic ets model of forecast::ets(y) (model='ZZZ').
+
+    Error, trend (not multiplicative) and season components
+    and damping are selected by AICc.
+
+    Parameters
+    ----------
+    y: numpy array
+        Time series.
+    m: int
+        Frequency of the time series.
+
+    Returns
+    -------
+    Dict
+        Components, parameters and final state of the selected model.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+
+    if np.all(y == y[0]):
+        return {'components': ('A', 'N', 'N', False), 'm': 1, 'phi': 1.,
+                'state': y[-1:].copy(), 'params': {'alpha': 0.99999}}
+
+    seasons = ['N', 'A', 'M']
+    if m < 2 or n <= m or m > 24:
+        m, seasons = 1, ['N']
+
+    # Not enough data to optimize (npars + 4 with npars of alpha and l0)
+    if n <= 6:
+        fits = [fit for fit in (_fit_holt_winters(y, m, trend=True),
+                                _fit_holt_winters(y, m, trend=False)) if fit is not None]
+        return min(fits, key=lambda fit: fit['sigma2'])
+
+    data_positive = np.min(y) > 0
+    best, best_ic = None, np.inf
+    for error, trend, season, damped in product('AM', 'NA', seasons, [True, False]):
+        if trend == 'N' and damped:
+            continue
+        if error == 'A' and season == 'M':
+            continue
+        if error == 'M' and not data_positive:
+            continue
+        if season == 'M' and not data_positive:
+            continue
+        fit = _fit_ets_model(y, m, error, trend, season, damped)
+        if fit is not None and fit['aicc'] < best_ic:
+            best, best_ic = fit, fit['aicc']
+
+    if best is None:
+        raise ValueError('No model able to be fitted')
+
+    return best
+
+def ets_predict(fit: Dict, h: int) -> np.ndarray:
+    """Point forecasts of a model of ets_fit."""
+    _, trend, season, _ = fit['components']
+
+    return _ets_forecast(fit['state'], fit['m'], _COMPONENTS[trend],
+                         _COMPONENTS[season], fit['phi'], h)
+
+
+class AutoETS(BaseEstimator, RegressorMixin):
+    """
+    Exponential smoothing state space model.
+    Native implementation of forecast::ets from R (default
+    automatic model selection by AICc). The recursions, the
+    likelihood and the Nelder-Mead optimizer are compiled with
+    numba and release the GIL, so series can be fitted in threads.
+
+    Parameters
+    ----------
+    seasonality: int
+        Seasonality of the time series.
+
+    Notes
+    -----
+    [1] Multiplicative trends are not considered (as the
+        default allow.multiplicative.trend=FALSE).
+    """
+
+    def __init__(self, seasonality):
+        self.seasonality = seasonality
+
+    def fit(self, X, y):
+        """
+        X: numpy array
+            time series covariates (for pipeline compatibility)
+        y: numpy array
+            train values of the time series
+        """
+        self.model_ = ets_fit(np.asarray(y, dtype=np.float64).ravel(),
+                              int(self.seasonality))
+
+        return self
+
+    def predict(self, X):
+        """
+        X: numpy array
+            time series covariates (for pipeline compatibility)
+        return
+        y_hat: numpy array
+            forecast for time horizon 'h' (len(X)).
+        """
+        check_is_fitted(self, 'model_')
+
+        return ets_predict(self.model_, len(X))
+
+    @property
+    def components_(self) -> str:
+        """Name of the selected model, ej. 'MAdN'."""
+        check_is_fitted(self, 'model_')
+        error, trend, season, damped = self.model_['components']
+
+        return error + trend + ('d' if damped else '') + season
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import pickle
+import select
+import signal
+from time import monotonic
+from typing import Any, Callable, Optional, Tuple
+
+
+def run_isolated(func: Callable, args: Tuple,
+                 timeout: Optional[float] = None) -> Tuple[str, Any]:
+    """Runs func(*args) in a forked process with a wall-clock budget.
+
+    A hard failure of the child (segfault, R crash, killed by the
+    timeout) does not affect the calling process.
+
+    Parameters
+    ----------
+    func: Callable
+        Function to run. Its result must be picklable.
+    args: tuple
+        Arguments of func.
+    timeout: float
+        Seconds to wait for the result. Default to None, no limit.
+
+    Returns
+    -------
+    status: str
+        One of 'ok', 'error', 'timeout' or 'crash'.
+    result: Any
+        Result of func if status is 'ok', otherwise a description
+        of the failure.
+
+    Notes
+    -----
+    [1] Uses os.fork directly so it also works inside daemonic
+        worker processes (dask processes scheduler). POSIX only.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            payload = ('ok', func(*args))
+        except BaseException as e:
+            payload = ('error', repr(e))
+        try:
+            data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            data = pickle.dumps(('error', f'Unpicklable result: {e!r}'))
+        with os.fdopen(write_fd, 'wb') as pipe:
+            pipe.write(data)
+        os._exit(0)
+
+    os.close(write_fd)
+    deadline = None if timeout is None else monotonic() + timeout
+    chunks, timed_out = [], False
+
+    try:
+        while True:
+            remaining = None if deadline is None else max(deadline - monotonic(), 0)
+            ready, _, _ = select.select([read_fd], [], [], remaining)
+            if not ready:
+                timed_out = True
+                break
+            chunk = os.read(read_fd, 1 << 20)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(read_fd)
+        if timed_out:
+            os.kill(pid, signal.SIGKILL)
+        _, exit_status = os.waitpid(pid, 0)
+
+    if timed_out:
+        return 'timeout', f'exceeded {timeout} seconds'
+
+    try:
+        return pickle.loads(b''.join(chunks))
+    except Exception:
+        return 'crash', f'process exited with status {exit_status}'
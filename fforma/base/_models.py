@@ -1,20 +1,32 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import threading
+import warnings
+from collections import OrderedDict
+
 import numpy as np
 import pandas as pd
 import cvxpy as cp
 
 from cvxpy.error import SolverError
-from math import sqrt
+from dask import delayed, compute
+from math import ceil, sqrt
+from multiprocessing import cpu_count
+from numba import njit
 from numpy.random import seed
 from sklearn.base import BaseEstimator, RegressorMixin, clone
 from scipy.optimize import minimize
-from statsmodels.regression.quantile_regression import QuantReg
 from sklearn.decomposition import PCA
 
+from ._quantreg import QuantRegFit, quantreg_fit
+
 seed(1)
 
+# Cells of the padded arrays of each chunk of deseasonalize_panel
+_CHUNK_CELLS = 1 << 22
+_GOLDEN = (sqrt(5) - 1) / 2
+
 ######################################################################
 # NAIVE2 UTILS
 ######################################################################
@@ -36,56 +48,75 @@ def deseasonalize(original_ts, ppy):
     :param ppy: periods per year
     :return:
     """
+    original_ts = np.asarray(original_ts, dtype=np.float64).ravel()
+
+    return deseasonalize_panel(original_ts, np.array([0, len(original_ts)]), ppy)[0]
+
+def deseasonalize_panel(values, indptr, ppy):
+    """Seasonal indices of deseasonalize for every series of a panel.
+
+    Series are sorted by length and processed in chunks of padded
+    arrays: the seasonality test, the moving averages (pandas rolling
+    over the columns of each chunk) and the indices of all the series
+    of a chunk are computed at once.
+
+    Parameters
+    ----------
+    values, indptr: numpy arrays
+        Panel in the values + offsets layout.
+    ppy: int
+        Periods per year.
+
+    Returns
+    -------
+    numpy array
+        Seasonal indices of shape (n_series, ppy), ones for
+        non seasonal series.
     """
-    # === get in-sample data
-    original_ts = original_ts[:-out_of_sample]
-    """
-    if seasonality_test(original_ts, ppy):
-        # ==== get moving averages
-        ma_ts = moving_averages(original_ts, ppy)
+    lengths = np.diff(indptr)
+    si = np.ones((len(lengths), ppy))
+    order = np.argsort(lengths, kind='stable')
+
+    start = 0
+    while start < len(order):
+        cells = np.arange(1, len(order) - start + 1) * lengths[order[start:]]
+        stop = start + max(np.searchsorted(cells, _CHUNK_CELLS, side='right'), 1)
+        rows, start = order[start:stop], stop
+
+        y = _gather_padded(values, indptr, rows)
+        seasonal = seasonality_test_panel(y, ppy)
+        if not seasonal.any():
+            continue
+        rows, y = rows[seasonal], y[seasonal].T
+        n = lengths[rows]
+
+        # ==== get moving averages (see moving_averages)
+        ts_ma = pd.DataFrame(y).rolling(ppy, center=True).mean().to_numpy()
+        even = n % 2 == 0
+        if even.any():
+            ma_even = pd.DataFrame(ts_ma[:, even]).rolling(2, center=True).mean().to_numpy()
+            # np.roll(ts_ma, -1) within each series
+            idx = (np.arange(len(y))[:, None] + 1) % n[even]
+            ts_ma[:, even] = np.take_along_axis(ma_even, idx, axis=0)
 
         # ==== get seasonality indices
-        le_ts = original_ts * 100 / ma_ts
-        le_ts = np.hstack((le_ts, np.full((ppy - (len(le_ts) % ppy)), np.nan)))
-        le_ts = np.reshape(le_ts, (-1, ppy))
-        si = np.nanmean(le_ts, 0)
-        norm = np.sum(si) / (ppy * 100)
-        si = si / norm
-    else:
-        si = np.ones(ppy)
+        le_ts = y * 100 / ts_ma
+        windows = len(y) // ppy + 1
+        le_ts = np.vstack((le_ts, np.full((windows * ppy - len(y), len(rows)), np.nan)))
+        le_ts = np.reshape(le_ts, (windows, ppy, len(rows)))
+        si_rows = np.ascontiguousarray(np.nanmean(le_ts, 0).T)
+        norm = np.sum(si_rows, 1) / (ppy * 100)
+        si[rows] = si_rows / norm[:, None]
 
     return si
 
-def ses(a, x, h, job):
-    y = np.empty(x.size + 1)
-    y[0] = x[0]
-
-    for i, val in enumerate(x):
-        y[i+1] = a * val + (1-a) * y[i]
-
-    fitted = y[:-1]
-    forecast = np.repeat(y[-1], h)
-    if job == 'train':
-        return np.mean((fitted - x)**2)
-    if job == 'fit':
-        return fitted
-    return {'fitted': fitted, 'mean': forecast}
-
-def demand(x):
-    return x[x > 0]
-
-def intervals(x):
-    y = []
-
-    ctr = 1
-    for i, val in enumerate(x):
-        if val == 0:
-            ctr += 1
-        else:
-            y.append(ctr)
-            ctr = 1
+def _gather_padded(values, indptr, rows):
+    """Series rows of a panel as rows of a left aligned array padded with NaNs."""
+    lengths = indptr[rows + 1] - indptr[rows]
+    mask = np.arange(lengths.max(initial=0)) < lengths[:, None]
+    y = np.full(mask.shape, np.nan)
+    y[mask] = values[(indptr[rows][:, None] + np.arange(mask.shape[1]))[mask]]
 
-    y = np.array(y)
     return y
 
 def moving_averages(ts_init, window):
@@ -122,16 +153,21 @@ def seasonality_test(original_ts, ppy):
     :param ppy: periods per year
     :return: boolean value: whether the TS is seasonal
     """
-    s = acf(original_ts, 1)
-    for i in range(2, ppy):
-        s = s + (acf(original_ts, i) ** 2)
+    original_ts = np.asarray(original_ts, dtype=np.float64).ravel()
 
-    if (1 + 2 * s) > 0:
-        limit = 1.645 * (sqrt((1 + 2 * s) / len(original_ts)))
-    else:
-        limit = 0
+    return seasonality_test_panel(original_ts[None], ppy)[0]
+
+def seasonality_test_panel(y, ppy):
+    """Seasonality test of each row of y (padded with NaNs)."""
+    r = acf_panel(y, ppy)
+    lengths = (~np.isnan(y)).sum(1)
+    s = r[:, 0] + np.sum(r[:, 1:ppy - 1] ** 2, 1)
 
-    return (abs(acf(original_ts, ppy))) > limit
+    with np.errstate(invalid='ignore'):
+        limit = np.where(1 + 2 * s > 0,
+                         1.645 * np.sqrt(np.maximum(1 + 2 * s, 0) / lengths), 0)
+
+        return np.abs(r[:, ppy - 1]) > limit
 
 def acf(data, k):
     """
@@ -140,21 +176,63 @@ def acf(data, k):
     :param k: lag
     :return:
     """
-    m = np.mean(data)
-    s1 = 0
-    for i in range(k, len(data)):
-        s1 = s1 + ((data[i] - m) * (data[i - k] - m))
+    data = np.asarray(data, dtype=np.float64).ravel()
+    dev = data - np.mean(data)
+
+    return float(np.dot(dev[k:], dev[:len(dev) - k]) / np.dot(dev, dev))
+
+def acf_panel(y, max_lag):
+    """Autocorrelations (lags 1, ..., max_lag) of each row of y padded with NaNs.
+
+    All the lags of all the rows are computed at once
+    from the periodogram of the zero padded rows (FFT).
+    """
+    mask = ~np.isnan(y)
+    dev = np.where(mask, y - np.nanmean(y, axis=1, keepdims=True), 0.)
+    n_fft = 1 << int(max(2 * y.shape[1] - 1, y.shape[1] + max_lag)).bit_length()
+    spectrum = np.fft.rfft(dev, n_fft, axis=1)
+    acov = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n_fft, axis=1)
 
-    s2 = 0
-    for i in range(0, len(data)):
-        s2 = s2 + ((data[i] - m) ** 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = acov[:, 1:max_lag + 1] / acov[:, :1]
+    # Lags not shorter than the series are exactly zero, as acf
+    r[np.arange(1, max_lag + 1) >= mask.sum(1)[:, None]] = 0
 
-    return float(s1 / s2)
+    return r
 
 ######################################################################
 # PANEL MODEL CLASS
 ######################################################################
 
+def _group_offsets(index):
+    """Stable order of a ('unique_id', 'ds') index grouped by unique_id.
+
+    Returns the order, the sorted unique_ids and the offsets of each
+    unique_id in the sorted index (rows of the i-th unique_id are
+    order[offsets[i]:offsets[i + 1]]).
+    """
+    uids = index.get_level_values('unique_id')
+    if uids.is_monotonic_increasing:
+        order = np.arange(len(uids))
+    else:
+        order = np.argsort(uids.values, kind='mergesort')
+    uids = uids.values[order]
+
+    starts = np.flatnonzero(np.r_[True, uids[1:] != uids[:-1]]) if len(uids) \
+             else np.empty(0, dtype=np.int64)
+    offsets = np.append(starts, len(uids))
+
+    return order, uids[starts], offsets
+
+def _fit_blocks(model, blocks, fill_na):
+    """Fits a clone of model on each (X, y) block."""
+    models, means = [], []
+    for X_uid, y_uid in blocks:
+        models.append(clone(model).fit(X_uid, y_uid))
+        means.append(np.nanmean(y_uid) if fill_na else None)
+
+    return models, means
+
 class PanelModel:
     """
     Panel model class.
@@ -163,12 +241,23 @@ class PanelModel:
     for full panel data. The panel dataframe is defined by the each series
     unique_id and their datestamps.
     """
-    def __init__(self, model, fill_na=True):
+    def __init__(self, model, fill_na=True, scheduler='synchronous', partitions=None):
         """
         model: sklearn BaseEstimator class
+        fill_na: bool
+            Replace missing predictions by the mean of the series.
+        scheduler: str
+            Dask scheduler used to fit the partitions, default to
+            'synchronous' (one after the other in the calling thread).
+            Use 'threads' to fit them in parallel.
+        partitions: int
+            Number of partitions of the series, default to None,
+            number of cores minus 1.
         """
         self.model = model
         self.fill_na = fill_na
+        self.scheduler = scheduler
+        self.partitions = partitions
 
     def fit(self, X, y):
         """
@@ -180,20 +269,27 @@ class PanelModel:
         """
         assert X.index.names == ['unique_id', 'ds']
         assert y.index.names == ['unique_id', 'ds']
-        uids = y.index.get_level_values('unique_id').unique()
-        X_uids = X.index.get_level_values('unique_id').unique()
-        assert all(uids == X_uids), "not same u_ids"
-
-        self.model_ = {}
-        self.mean_ = {}
-
-        for uid in uids:
-            X_uid = X.loc[uid].values
-            y_uid = y.loc[uid].values
-            self.model_[uid] = clone(self.model)
-            self.model_[uid].fit(X_uid, y_uid)
-            if self.fill_na:
-                self.mean_[uid] = np.nanmean(y_uid)
+        X_order, X_uids, X_offsets = _group_offsets(X.index)
+        y_order, uids, y_offsets = _group_offsets(y.index)
+        assert len(uids) == len(X_uids) and all(uids == X_uids), "not same u_ids"
+
+        # Contiguous blocks of each series, sliced by position
+        X_values = X.values[X_order]
+        y_values = y.values[y_order]
+        blocks = [(X_values[X_offsets[i]:X_offsets[i + 1]],
+                   y_values[y_offsets[i]:y_offsets[i + 1]]) for i in range(len(uids))]
+
+        partitions = max(cpu_count() - 1, 1) if self.partitions is None else self.partitions
+        n = max(ceil(len(blocks) / partitions), 1)
+        tasks = [delayed(_fit_blocks)(self.model, blocks[i:i + n], self.fill_na)
+                 for i in range(0, len(blocks), n)]
+        results = compute(*tasks, scheduler=self.scheduler)
+
+        models = [model for models, _ in results for model in models]
+        means = [mean for _, means in results for mean in means]
+        self.model_ = dict(zip(uids, models))
+        self.mean_ = dict(zip(uids, means)) if self.fill_na else {}
+
         return self
 
     def predict(self, X):
@@ -203,17 +299,20 @@ class PanelModel:
         """
         assert X.index.names == ['unique_id', 'ds']
 
-        idxs, preds = [], []
-        for uid, X_uid in X.groupby('unique_id'):
-            y_hat_uid = self.model_[uid].predict(X_uid.values)
+        order, uids, offsets = _group_offsets(X.index)
+        X_values = X.values[order]
+        preds = np.empty(len(X_values))
+
+        for i, uid in enumerate(uids):
+            start, end = offsets[i], offsets[i + 1]
+            y_hat_uid = np.asarray(self.model_[uid].predict(X_values[start:end]),
+                                   dtype=np.float64).ravel()
+            assert len(y_hat_uid) == end - start, "Predictions length mismatch"
             if self.fill_na:
                 y_hat_uid[np.isnan(y_hat_uid)] = self.mean_[uid]
-            assert len(y_hat_uid)==len(X_uid), "Predictions length mismatch"
-            idxs.extend(X_uid.index)
-            preds.extend(y_hat_uid)
+            preds[start:end] = y_hat_uid
 
-        idxs = pd.MultiIndex.from_tuples(idxs, names=('unique_id', 'ds'))
-        preds = pd.Series(preds, index=idxs)
+        preds = pd.Series(preds, index=X.index[order])
         return preds
 
 ######################################################################
@@ -487,7 +586,7 @@ class FQRA(BaseEstimator, RegressorMixin):
 
         X = self.pca.transform(X)
         X = np.hstack([X, np.ones((len(X),1))])
-        self.qr = QuantReg(y, X).fit(self.tau)
+        self.qr = QuantRegFit(quantreg_fit(X, y, self.tau), X, y, self.tau)
 
         return self
 
@@ -497,6 +596,98 @@ class FQRA(BaseEstimator, RegressorMixin):
         preds = self.qr.predict(X)
         return preds
 
+class _QRAL1Problem:
+    """
+    Parameterized (DPP) problem of QRAL1 for a shape of X.
+
+    The pinball loss is written as a linear program, so X, y, tau and
+    the penalty are parameters: the problem is canonicalized once and
+    each solve only feeds new values.
+    """
+    def __init__(self, n_obs, n_features):
+        self.average_weights = np.ones(n_features) / n_features
+        self.X = cp.Parameter((n_obs, n_features))
+        self.y = cp.Parameter(n_obs)
+        self.tau = cp.Parameter(nonneg=True)
+        self.penalty = cp.Parameter(nonneg=True)
+
+        self.beta = cp.Variable(n_features)
+        # Positive and negative parts of the residuals y - X @ beta
+        over, under = cp.Variable(n_obs, nonneg=True), cp.Variable(n_obs, nonneg=True)
+        pinball = self.tau * cp.sum(over) + (1 - self.tau) * cp.sum(under)
+        l1 = cp.norm1(self.beta - self.average_weights)
+        self.problem = cp.Problem(cp.Minimize(pinball + self.penalty * l1),
+                                  [self.X @ self.beta + over - under == self.y])
+
+    def set_data(self, X, y):
+        self.X.value = np.asarray(X, dtype=np.float64)
+        self.y.value = np.asarray(y, dtype=np.float64)
+        self.y_mean = self.y.value.mean()
+
+    def solve(self, tau, lambd):
+        self.tau.value = tau
+        self.penalty.value = lambd * self.y_mean
+        try:
+            self.problem.solve(warm_start=True)
+            return self.beta.value
+        except SolverError:
+            warnings.warn('SolverError, using average weights as optimal.')
+            return self.average_weights
+
+# Problems of QRAL1 by shape, per thread (a problem holds its parameter values).
+# Only the _QRAL1_MAX_PROBLEMS most recently used shapes are kept.
+_QRAL1_PROBLEMS = threading.local()
+_QRAL1_MAX_PROBLEMS = 16
+
+def _qral1_problem(n_obs, n_features):
+    """Cached QRAL1 problem of the thread for the shape (n_obs, n_features)."""
+    if not hasattr(_QRAL1_PROBLEMS, 'problems'):
+        _QRAL1_PROBLEMS.problems = OrderedDict()
+    problems = _QRAL1_PROBLEMS.problems
+    shape = (n_obs, n_features)
+    if shape in problems:
+        problems.move_to_end(shape)
+    else:
+        problems[shape] = _QRAL1Problem(n_obs, n_features)
+        if len(problems) > _QRAL1_MAX_PROBLEMS:
+            problems.popitem(last=False)
+
+    return problems[shape]
+
+def qral1_grid(X, y, taus, lambds):
+    """QRAL1 weights for every (tau, lambd) of a grid.
+
+    Successive solves reuse the canonicalized problem and
+    start from the previous solution.
+
+    Parameters
+    ----------
+    X: numpy array
+        Forecasts to average, shape (n_obs, n_features).
+    y: numpy array
+        Target, shape (n_obs,).
+    taus, lambds: Sequence[float]
+        Quantiles and penalties of the grid.
+
+    Returns
+    -------
+    numpy array
+        Weights of shape (len(taus), len(lambds), n_features).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    assert X.shape[0] == len(y)
+    problem = _qral1_problem(*X.shape)
+    problem.set_data(X, y)
+
+    betas = np.full((len(taus), len(lambds), X.shape[1]), np.nan)
+    for i, tau in enumerate(taus):
+        for j, lambd in enumerate(lambds):
+            beta = problem.solve(tau, lambd)
+            if beta is not None:
+                betas[i, j] = beta
+
+    return betas
+
 class QRAL1(BaseEstimator, RegressorMixin):
     """
     Quantile Regression Averaging with Lasso Regularization:
@@ -504,50 +695,27 @@ class QRAL1(BaseEstimator, RegressorMixin):
     The penalized linear quantile regression
     refines selection of important features
     at different quantile levels.
+    The problem of each shape of X is built once and
+    reused (see qral1_grid for a whole grid of tau and lambd).
     """
     def __init__(self, tau=0.5, lambd=1):
         self.tau = tau
         self.lambd = lambd
 
-    def _pinball(self, X, y, beta, tau):
-        y_hat = X @ beta
-        delta_y = y - y_hat
-        pinball = cp.maximum(tau * delta_y, (tau-1) * delta_y)
-        pinball = cp.sum(pinball)
-        return pinball
-
-    def _l1(self, beta):
-        return cp.norm1(beta-self.average_weights)
-
     def _y_hat(self, X):
         y_hat = X @ self.beta
         return y_hat
 
-    def objective_fn(self, X, y, beta, tau, lambd):
-        return self._pinball(X, y, beta, tau) + lambd * y.mean() * self._l1(beta)
-
     def fit(self, X, y):
         n = X.shape[1]
         assert X.shape[0]==len(y)
         self.average_weights = (1 / n) * np.ones(n)
-        beta = cp.Variable(n)
 
-        # Optimize
-        tau = cp.Parameter(nonneg=True)
-        lambd = cp.Parameter(nonneg=True)
-
-        tau.value = self.tau
-        lambd.value = self.lambd
-
-        obj_fn = self.objective_fn(X=X, y=y, beta=beta,
-                                   tau=tau, lambd=lambd)
-        problem = cp.Problem(cp.Minimize(obj_fn))
-        try:
-            problem.solve()
-            self.beta = beta.value
-        except SolverError:
-            print('SolverError, using average weights as optimal.')
-            self.beta = self.average_weights
+        problem = _qral1_problem(*np.shape(X))
+        problem.set_data(X, y)
+        self.beta = problem.solve(self.tau, self.lambd)
+        if self.beta is not None:
+            self.beta = self.beta.copy()
         return self
 
     def predict(self, X):
@@ -566,30 +734,228 @@ def chunks(lst, n):
             yield values
 
 
+@njit(cache=True, nogil=True)
+def _ses_levels(a, x):
+    """Levels of simple exponential smoothing started at x[0]."""
+    y = np.empty(x.size + 1)
+    y[0] = x[0]
+    for i in range(x.size):
+        y[i + 1] = a * x[i] + (1 - a) * y[i]
+
+    return y
+
+@njit(cache=True, nogil=True)
+def _tsb_grid(y, p, z0, alphas, betas):
+    """One step ahead fits of TSB for every (alpha, beta) of the grid.
+
+    The grid is evaluated in a single pass over y, rows of the
+    result follow the order of product(alphas, betas).
+    """
+    n, n_betas = y.size, betas.size
+    n_params = alphas.size * n_betas
+    yfit = np.empty((n_params, n))
+    pfit = np.empty(n_params)
+    zfit = np.empty(n_params)
+    for k in range(n_params):
+        pfit[k] = p[0]
+        zfit[k] = z0
+        yfit[k, 0] = pfit[k] * zfit[k]
+
+    for i in range(1, n):
+        for k in range(n_params):
+            pfit[k] = pfit[k] + alphas[k // n_betas] * (p[i] - pfit[k])
+            if p[i] != 0:
+                zfit[k] = zfit[k] + betas[k % n_betas] * (y[i] - zfit[k])
+            yfit[k, i] = pfit[k] * zfit[k]
+
+    return yfit
+
+@njit(cache=True, nogil=True)
+def _ses_mse_panel(values, indptr, alphas):
+    """MSE (as ses_mse) and last level of SES for each series and alpha.
+
+    alphas has shape (n_series, n_alphas), the i-th row is evaluated on
+    the series values[indptr[i]:indptr[i + 1]]. Empty series give NaN.
+    """
+    n_series, n_alphas = alphas.shape
+    mse = np.full((n_series, n_alphas), np.nan)
+    level = np.full((n_series, n_alphas), np.nan)
+    for i in range(n_series):
+        start, end = indptr[i], indptr[i + 1]
+        if end == start:
+            continue
+        for j in range(n_alphas):
+            a = alphas[i, j]
+            y, sse = values[start], 0.
+            for t in range(start, end):
+                error = values[t] - y
+                sse += error * error
+                y = a * values[t] + (1 - a) * y
+            mse[i, j] = sse / (end - start)
+            level[i, j] = y
+
+    return mse, level
+
+def ses_bounded_panel(values, indptr, bounds=(0.1, 0.3), n_grid=11, n_iter=30):
+    """SES forecasts of every series of a panel with alpha minimizing the MSE.
+
+    Same model as sexps: alpha is searched within bounds on a grid and
+    refined by golden section search, for all the series at once.
+
+    Parameters
+    ----------
+    values, indptr: numpy arrays
+        Panel in the values + offsets layout.
+    bounds: tuple
+        Bounds of alpha.
+
+    Returns
+    -------
+    alpha: numpy array
+        Smoothing parameter of each series.
+    level: numpy array
+        Last level, the point forecast of each series (NaN if empty).
+    """
+    low, high = bounds
+    grid = np.linspace(low, high, n_grid)
+    mse, _ = _ses_mse_panel(values, indptr, np.tile(grid, (len(indptr) - 1, 1)))
+    best = np.argmin(np.where(np.isnan(mse), np.inf, mse), axis=1)
+    step = grid[1] - grid[0] if n_grid > 1 else 0.
+    a = np.maximum(grid[best] - step, low)
+    b = np.minimum(grid[best] + step, high)
+
+    for _ in range(n_iter):
+        c = b - _GOLDEN * (b - a)
+        d = a + _GOLDEN * (b - a)
+        mse, _ = _ses_mse_panel(values, indptr, np.column_stack([c, d]))
+        # Ties keep the lower alpha, as L-BFGS-B started at the lower bound
+        left = mse[:, 0] <= mse[:, 1]
+        b = np.where(left, d, b)
+        a = np.where(left, a, c)
+
+    alpha = (a + b) / 2
+    _, level = _ses_mse_panel(values, indptr, alpha[:, None])
+
+    return alpha, level[:, 0]
+
+def _aggregate_panel(values, indptr, series, levels):
+    """Temporal aggregation of a panel, as chunks.
+
+    The p-th aggregated series holds the sums of consecutive blocks of
+    levels[p] values of the series series[p], aligned with its end (the
+    first len % level values are lost). Blocks with NaNs are dropped.
+    """
+    starts = indptr[series]
+    lengths = indptr[series + 1] - starts
+    n_blocks = lengths // levels
+    first = starts + lengths % levels
+
+    # Block starts of each aggregated series followed by its end, so every
+    # block is a segment of np.add.reduceat (the ends are discarded)
+    counts = n_blocks + 1
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    k = np.arange(counts.sum()) - offsets
+    idx = np.repeat(first, counts) + k * np.repeat(levels, counts)
+    sums = np.add.reduceat(np.append(values, 0.), idx)
+    is_block = k < np.repeat(n_blocks, counts)
+    sums, pairs = sums[is_block], np.repeat(np.arange(len(series)), n_blocks)
+
+    valid = ~np.isnan(sums)
+    agg_indptr = np.zeros(len(series) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs[valid], minlength=len(series)), out=agg_indptr[1:])
+
+    return sums[valid], agg_indptr
+
+def mean_intervals(values, indptr):
+    """Mean interval between non zero values of each series (NaN if none).
+
+    Same as intervals(y).mean() for every series of a panel, the
+    average demand interval (ADI) of intermittent demand.
+    """
+    lengths = np.diff(indptr)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    nonzero = values != 0
+    n_nonzero = np.bincount(segments, weights=nonzero, minlength=len(lengths))
+    # Intervals add up to the position of the last non zero value plus one
+    last = np.zeros(len(lengths))
+    np.maximum.at(last, segments[nonzero], (np.arange(len(values)) - indptr[segments])[nonzero] + 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n_nonzero > 0, last / n_nonzero, np.nan)
+
+def _aggregation_levels(values, indptr):
+    """Rounded mean interval between non zero values of each series (0 if none)."""
+    adi = mean_intervals(values, indptr)
+
+    return np.where(np.isnan(adi), 0, np.round(adi)).astype(np.int64)
+
+def adida_panel(values, indptr):
+    """ADIDA forecasts of every series of a panel.
+
+    Parameters
+    ----------
+    values, indptr: numpy arrays
+        Panel in the values + offsets layout.
+
+    Returns
+    -------
+    numpy array
+        Forecast of each series (constant over the horizon).
+    """
+    levels = _aggregation_levels(values, indptr)
+    forecasts = np.zeros(len(levels))
+    series, = np.nonzero(levels)
+    agg_values, agg_indptr = _aggregate_panel(values, indptr, series, levels[series])
+    _, level = ses_bounded_panel(agg_values, agg_indptr)
+    forecasts[series] = level / levels[series]
+
+    return forecasts
+
+def imapa_panel(values, indptr):
+    """iMAPA forecasts of every series of a panel.
+
+    All the aggregation levels (1, ..., ADIDA level) of all
+    the series are smoothed together.
+
+    Parameters
+    ----------
+    values, indptr: numpy arrays
+        Panel in the values + offsets layout.
+
+    Returns
+    -------
+    forecasts: numpy array
+        Forecast of each series (constant over the horizon).
+    level_forecasts: List[numpy array]
+        Forecast of each aggregation level of each series.
+    """
+    max_levels = _aggregation_levels(values, indptr)
+    series = np.repeat(np.arange(len(max_levels)), max_levels)
+    levels = np.arange(len(series)) - np.repeat(np.cumsum(max_levels) - max_levels, max_levels) + 1
+    agg_values, agg_indptr = _aggregate_panel(values, indptr, series, levels)
+    _, level = ses_bounded_panel(agg_values, agg_indptr)
+
+    level_forecasts = np.split(level / levels, np.cumsum(max_levels)[:-1])
+    forecasts = np.array([np.mean(frc) if len(frc) else 0. for frc in level_forecasts])
+
+    return forecasts, level_forecasts
+
 def ses_mse(a, x):
     """SES but only gets the mse"""
-    y = np.empty(x.size)
-    y[0] = x[0]
-    for i, val in enumerate(x[:-1]):
-        y[i + 1] = a * val + (1 - a) * y[i]
-    mse = np.mean((y - x) ** 2)
+    fitted = _ses_levels(float(np.asarray(a).item()), np.asarray(x, dtype=np.float64))[:-1]
+    mse = np.mean((fitted - x) ** 2)
     return mse
 
 
 def sexps(x):
     """Searches for the optimal alpha and then runs SES"""
-    a = minimize(fun=ses_mse, x0=0, args=(np.array(x)),
-                 bounds=[(0.1, 0.3)], method='L-BFGS-B').x[0]
-    forecast = ses(a=a, x=x, h=1, job="")["mean"]
+    x = np.asarray(x, dtype=np.float64)
+    _, forecast = ses_bounded_panel(x, np.array([0, len(x)]))
     return forecast
 
 
 def ses(a, x, h, job):
-    y = np.empty(x.size + 1)
-    y[0] = x[0]
-
-    for i, val in enumerate(x):
-        y[i+1] = a * val + (1-a) * y[i]
+    y = _ses_levels(float(np.asarray(a).item()), np.asarray(x, dtype=np.float64))
 
     fitted = y[:-1]
     forecast = np.repeat(y[-1], h)
@@ -606,18 +972,10 @@ def probability(x):
     return (x != 0).astype(int).flatten()
 
 def intervals(x):
-    y = []
+    """Number of periods between consecutive non zero values (first from the start)."""
+    nonzero = np.flatnonzero(np.asarray(x) != 0)
 
-    ctr = 1
-    for i, val in enumerate(x):
-        if val == 0:
-            ctr += 1
-        else:
-            y.append(ctr)
-            ctr = 1
-
-    y = np.array(y)
-    return y
+    return np.diff(nonzero, prepend=-1)
 
 class Croston(BaseEstimator, RegressorMixin):
     """
@@ -670,11 +1028,10 @@ class Croston(BaseEstimator, RegressorMixin):
         self.fitted = np.empty(len(y))
         self.intervals = np.empty(len(y))
 
-        val_ant=0
-        for i, val in enumerate(yi.cumsum()):
-            self.fitted[val_ant:val] = fitted[i]
-            self.intervals[val_ant:val] = yi[i]
-            val_ant =val
+        # Each fit holds until the next non zero value
+        n_covered = yi.sum()
+        self.fitted[:n_covered] = np.repeat(fitted, yi)
+        self.intervals[:n_covered] = np.repeat(yi, yi)
 
         return self
 
@@ -701,7 +1058,6 @@ class TSB(BaseEstimator, RegressorMixin):
         pass
 
     def fit(self, X, y):
-        n = len(y)
         p = probability(y)
         z = demand(y)
 
@@ -712,34 +1068,16 @@ class TSB(BaseEstimator, RegressorMixin):
         a = np.array([0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.5, 0.8])
         b = np.array([0.01,0.02,0.03,0.05,0.1,0.2,0.3])
 
-        forecast, fitted, MSE = [], [], []
-
-        for atemp in a:
-            for btemp in b:
-                zfit = np.empty(n)
-                pfit = np.empty(n)
-                zfit[0] = z[0]
-                pfit[0] = p[0]
-
-                for i in range(1, n):
-                    pfit[i] = pfit[i-1] + atemp*(p[i]-pfit[i-1])
-                    if p[i] == 0:
-                        zfit[i] = zfit[i-1]
-                    else:
-                        zfit[i] = zfit[i-1] + btemp*(y[i]-zfit[i-1])
+        y = np.asarray(y, dtype=np.float64).flatten()
+        yfit = _tsb_grid(y, p.astype(np.float64), float(z[0]), a, b)
 
-                yfit = pfit * zfit
+        forecast = list(yfit[:, -1])
+        fitted = np.roll(yfit, 1, axis=1)
+        fitted[:, 0] = np.nan
 
-                forecast.append(yfit[-1])
-                yfit = np.roll(yfit, 1)
-                yfit[0] = np.nan
+        MSE = np.nanmean((fitted - y)**2, axis=1)
 
-                fitted.append(yfit)
-
-                mse = np.nanmean((yfit-y.flatten())**2)
-                MSE.append(mse)
-
-        self.MSE = np.array(MSE)
+        self.MSE = MSE
         self.forecast = forecast
         self.fitted = fitted[self.MSE.argmin()]
         self.pred_ = forecast[self.MSE.argmin()]
@@ -766,17 +1104,8 @@ class ADIDA(BaseEstimator, RegressorMixin):
         pass
 
     def fit(self, X, y):
-
-        inters = intervals(y)
-        if inters.size == 0:
-            self.al_ = 0
-            return self
-
-        al = int(round(inters.mean()))
-        lost_remainder_data = len(y) % al
-        AS = [sum(equal_sized_chunk) for equal_sized_chunk \
-              in chunks(y[lost_remainder_data:], al)]
-        self.al_ = sexps(np.array(AS)) / al
+        y = np.asarray(y, dtype=np.float64).ravel()
+        self.al_ = adida_panel(y, np.array([0, len(y)]))
 
         return self
 
@@ -797,20 +1126,9 @@ class iMAPA(BaseEstimator, RegressorMixin):
         pass
 
     def fit(self, X, y):
-        inters = intervals(y)
-        if inters.size == 0:
-            self.frc_ = 0
-            return self
-
-        mal = int(round(inters.mean()))
-        frc = []
-        for al in range(1, mal + 1):
-            lost_remainder_data = len(y) % al
-            AS = [sum(equal_sized_chunk) for equal_sized_chunk \
-                  in chunks(y[lost_remainder_data:], al)]
-            frc.append((sexps(np.array(AS)) / al)[0])
-
-        self.frc_ = frc
+        y = np.asarray(y, dtype=np.float64).ravel()
+        _, (frc,) = imapa_panel(y, np.array([0, len(y)]))
+        self.frc_ = list(frc) if len(frc) else 0
 
         return self
 
@@ -3,17 +3,16 @@
 
 import pandas as pd
 import numpy as np
-import rpy2.robjects as robjects
 
 from copy import deepcopy
+from functools import lru_cache
 from sklearn.base import BaseEstimator, RegressorMixin
 from sklearn.utils.validation import check_is_fitted
-from rpy2.robjects.packages import importr
-from rpy2.robjects import pandas2ri, numpy2ri
-from rpy2.robjects.vectors import IntVector, FloatVector
 
-forecast = importr('forecast')
-stats = importr('stats')
+from ._rworker import RExpression, _R_FULL_FORECAST, active_r_pool, full_forecast_array
+
+# rpy2 is imported on the first call to R, so processes
+# that send their batches to an RWorkerPool do not embed R.
 
 
 def forecast_object_to_dict(forecast_object):
@@ -26,13 +25,71 @@ def forecast_object_to_dict(forecast_object):
 
 def get_forecast(fitted_model, h):
     """Calculates forecast from a fitted model."""
-    y_hat = forecast.forecast(fitted_model, h=h)
-    y_hat = forecast_object_to_dict(y_hat)
+    rfunc = _r_function('function(fitted_model, h) forecast::forecast(fitted_model, h=h)')
+    y_hat = forecast_object_to_dict(rfunc(fitted_model, int(h)))
     y_hat = np.array(y_hat['mean'])
 
     return y_hat
 
-def fit_forecast_model(y, freq, model, **kwargs):
+def get_full_forecast(fitted_model, h, level=(80, 95)):
+    """Forecast object of a fitted model as a structured array.
+
+    Mean, prediction intervals, fitted values, residuals and information
+    criteria are extracted from R in a single call. See forecast_dtype.
+    """
+    rstring = """
+     function(fitted_model, h, level){
+         suppressMessages(library(forecast))
+         %s
+         full_forecast(fitted_model, h, level)
+     }
+    """ % (_R_FULL_FORECAST)
+
+    from rpy2.robjects.vectors import FloatVector
+
+    rfunc = _r_function(rstring)
+    full = forecast_object_to_dict(rfunc(fitted_model, int(h), FloatVector(level)))
+    full = {name: np.array(column) for name, column in full.items()}
+    dims = (1, h, len(level), len(full['fitted']))
+
+    return full_forecast_array(dims, full['mean'], full['lower'], full['upper'],
+                               full['fitted'], full['residuals'], full['ic'])[0]
+
+@lru_cache(maxsize=None)
+def _r_function(rstring):
+    """Compiles an R function once per process."""
+    import rpy2.robjects as robjects
+
+    return robjects.r(rstring)
+
+def _to_r(value):
+    """Converts an argument of an R function explicitly.
+
+    No global converter (pandas2ri, numpy2ri) is active, so numpy
+    scalars become python scalars and sequences (lists, tuples,
+    numpy arrays) become R vectors of their type. RExpression
+    arguments are evaluated.
+    """
+    from rpy2.robjects.vectors import BoolVector, FloatVector, IntVector, StrVector
+
+    if isinstance(value, RExpression):
+        return _r_function(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple, np.ndarray)):
+        values = np.asarray(value)
+        vectors = {'b': BoolVector, 'i': IntVector, 'u': IntVector,
+                   'f': FloatVector, 'U': StrVector}
+        if values.dtype.kind in vectors:
+            return vectors[values.dtype.kind](values.ravel().tolist())
+
+    return value
+
+def _r_kwargs(kwargs):
+    """Converts the arguments of an R function (see _to_r)."""
+    return {name: _to_r(value) for name, value in kwargs.items()}
+
+def fit_forecast_model(y, freq, model_name, **kwargs):
     """Wrapper of the following flow:
         - Load _forecast_ package.
         - Transform data into a ts object.
@@ -40,7 +97,7 @@ def fit_forecast_model(y, freq, model, **kwargs):
 
     Parameters
     ----------
-    model: str
+    model_name: str
         Name of a model included in the
         _forecast_ package. Ej. 'auto.arima'.
     freq: int or iterable
@@ -48,15 +105,14 @@ def fit_forecast_model(y, freq, model, **kwargs):
         Can be multiple seasonalities. (Last seasonality
         considered as frequency.)
     kwargs:
-        Arguments of the model function.
+        Arguments of the model function, model= is
+        a fitted model to apply without estimating it again.
 
     Returns
     -------
     rpy2 object
         Fitted model
     """
-    pandas2ri.activate()
-
     freq = deepcopy(freq)
 
     rstring = """
@@ -66,14 +122,146 @@ def fit_forecast_model(y, freq, model, **kwargs):
          fitted_model<-%s(y_ts, ...)
          fitted_model
      }
-    """ % (model)
+    """ % (model_name)
+
+    from rpy2.robjects.vectors import FloatVector
 
-    rfunc = robjects.r(rstring)
+    rfunc = _r_function(rstring)
 
-    fitted = rfunc(FloatVector(y), freq, **kwargs)
+    fitted = rfunc(FloatVector(y), _to_r(freq), **_r_kwargs(kwargs))
 
     return fitted
 
+def fit_predict_forecast_batch(ys, freq, fit_expression, h, **kwargs):
+    """Fits and forecasts a list of series in a single call to R.
+
+    The series are sent as an R list and the model is applied with
+    lapply, so the rpy2 boundary is crossed once per batch instead
+    of once per series. Inside use_r_pool the batch is sent to a
+    worker of the RWorkerPool instead.
+
+    Parameters
+    ----------
+    ys: Sequence of numpy arrays
+        Time series.
+    freq: int or iterable
+        Frequency of the time series.
+    fit_expression: str
+        R expression that fits the model on y_ts with the list
+        of arguments args, the horizon h and the levels level.
+        Ej. 'do.call(auto.arima, c(list(y_ts), args))'.
+    h: Sequence of int
+        Forecast horizon of each series.
+    kwargs:
+        Arguments of the model function.
+
+    Returns
+    -------
+    y_hat: numpy array
+        Forecasts of shape (n_series, max(h)) padded with NaNs.
+    errors: List[Optional[str]]
+        Error message of each series, None if the model succeeded.
+    """
+    rstring = """
+     function(ys, freq, hs, ...){
+         suppressMessages(library(forecast))
+         args <- list(...)
+         max_h <- max(hs)
+         level <- c(80, 95)
+         y_hat <- matrix(NA_real_, nrow=length(ys), ncol=max_h)
+         errors <- rep("", length(ys))
+         for (i in seq_along(ys)) {
+             h <- hs[i]
+             result <- tryCatch({
+                 y_ts <- msts(ys[[i]], seasonal.periods=freq)
+                 fitted_model <- %s
+                 as.numeric(forecast(fitted_model, h=h)$mean)
+             }, error=function(e) conditionMessage(e))
+             if (is.character(result)) {
+                 errors[i] <- paste0("Error: ", result)
+             } else {
+                 y_hat[i, seq_len(h)] <- result[seq_len(h)]
+             }
+         }
+         list(as.numeric(t(y_hat)), errors)
+     }
+    """ % (fit_expression)
+
+    r_pool = active_r_pool()
+    if r_pool is not None:
+        return r_pool.fit_predict(fit_expression, ys, freq, h, **kwargs)
+
+    from rpy2.robjects.vectors import IntVector, FloatVector, ListVector
+
+    rfunc = _r_function(rstring)
+
+    h = np.asarray(h, dtype=int)
+    ys = ListVector([(str(i), FloatVector(y)) for i, y in enumerate(ys)])
+    y_hat, errors = rfunc(ys, _to_r(deepcopy(freq)), IntVector(h.tolist()), **_r_kwargs(kwargs))
+
+    y_hat = np.array(y_hat).reshape(len(h), -1)
+    errors = [error if error else None for error in errors]
+
+    return y_hat, errors
+
+def fit_predict_forecast_full_batch(ys, freq, fit_expression, h, level=(80, 95), **kwargs):
+    """Full forecasts of a list of series in a single call to R.
+
+    Same as fit_predict_forecast_batch but the whole forecast object
+    of each fit is returned (see forecast_dtype): prediction intervals,
+    fitted values, residuals and information criteria come from the
+    same fit as the mean, so they do not need to be fitted again.
+
+    Parameters
+    ----------
+    ys: Sequence of numpy arrays
+        Time series.
+    freq: int or iterable
+        Frequency of the time series.
+    fit_expression: str
+        R expression that fits the model on y_ts with the list
+        of arguments args, the horizon h and the levels level.
+    h: Sequence of int
+        Forecast horizon of each series.
+    level: Sequence of float
+        Confidence levels of the prediction intervals.
+    kwargs:
+        Arguments of the model function.
+
+    Returns
+    -------
+    full: numpy structured array
+        Full forecast of each series, padded to max(h) steps and
+        to the length of the longest series.
+    errors: List[Optional[str]]
+        Error message of each series, None if the model succeeded.
+    """
+    r_pool = active_r_pool()
+    if r_pool is not None:
+        return r_pool.fit_predict_full(fit_expression, ys, freq, h, level, **kwargs)
+
+    rstring = """
+     function(ys, freq, hs, level, ...){
+         suppressMessages(library(forecast))
+         %s
+         full_forecast_batch(quote(%s), list(...), ys, freq, hs, level)
+     }
+    """ % (_R_FULL_FORECAST, fit_expression)
+
+    from rpy2.robjects.vectors import IntVector, FloatVector, ListVector
+
+    rfunc = _r_function(rstring)
+
+    ys = ListVector([(str(i), FloatVector(y)) for i, y in enumerate(ys)])
+    full = rfunc(ys, _to_r(deepcopy(freq)), IntVector(np.asarray(h, dtype=int).tolist()),
+                 FloatVector(level), **_r_kwargs(kwargs))
+    full = forecast_object_to_dict(full)
+    errors = [error if error else None for error in full['errors']]
+    full = full_forecast_array(*(np.array(full[name]) for name in
+                                 ['dims', 'mean', 'lower', 'upper', 'fitted', 'residuals', 'ic']))
+
+    return full, errors
+
 class ForecastModel(BaseEstimator, RegressorMixin):
     """Wrapper for models in the R package _forecast_ that returns a model.
 
@@ -89,6 +277,11 @@ class ForecastModel(BaseEstimator, RegressorMixin):
     kwargs:
         Arguments of the model function.
     """
+    # Function of the _forecast_ package that applies a fitted
+    # model to new data without estimating it again (model= argument).
+    refit_model = None
+    # Arguments of kwargs that refit_model accepts, None for all of them
+    refit_args = None
 
     def __init__(self, model, freq, **kwargs):
         self.freq = freq
@@ -100,6 +293,24 @@ class ForecastModel(BaseEstimator, RegressorMixin):
 
         return self
 
+    def update(self, X, y):
+        """Fits the model on y, the whole history extended with new values.
+
+        If refit_model is defined, the structure and parameters of
+        the fitted model are reused instead of searching them again.
+        The arguments of kwargs accepted by refit_model (refit_args)
+        are passed again, so the refit keeps the settings of the fit.
+        """
+        if self.refit_model is None or not hasattr(self, 'fitted_model_'):
+            return self.fit(X, y)
+
+        kwargs = {name: value for name, value in self.kwargs.items()
+                  if self.refit_args is None or name in self.refit_args}
+        self.fitted_model_ = fit_forecast_model(y, self.freq, self.refit_model,
+                                                model=self.fitted_model_, **kwargs)
+
+        return self
+
     def predict(self, X):
         check_is_fitted(self, 'fitted_model_')
 
@@ -108,6 +319,48 @@ class ForecastModel(BaseEstimator, RegressorMixin):
 
         return y_hat
 
+    def predict_full(self, X, level=(80, 95)):
+        """Full forecast of the fitted model (see forecast_dtype).
+
+        Prediction intervals, fitted values, residuals and information
+        criteria are extracted together with the mean in a single call.
+        """
+        check_is_fitted(self, 'fitted_model_')
+
+        return get_full_forecast(self.fitted_model_, len(X), level)
+
+    def _fit_expression(self):
+        """R expression that fits the model on y_ts."""
+        return 'do.call(%s, c(list(y_ts), args))' % self.model
+
+    def fit_predict_batch(self, ys, h):
+        """Fits and forecasts a list of series in a single call to R.
+
+        Parameters
+        ----------
+        ys: Sequence of numpy arrays
+            Time series.
+        h: Sequence of int
+            Forecast horizon of each series.
+
+        Returns
+        -------
+        y_hat: numpy array
+            Forecasts of shape (n_series, max(h)) padded with NaNs.
+        errors: List[Optional[str]]
+            Error message of each series, None if the model succeeded.
+        """
+        return fit_predict_forecast_batch(ys, self.freq, self._fit_expression(), h,
+                                          **self.kwargs)
+
+    def fit_predict_full_batch(self, ys, h, level=(80, 95)):
+        """Fits a list of series in a single call to R and returns their full forecasts.
+
+        See fit_predict_forecast_full_batch.
+        """
+        return fit_predict_forecast_full_batch(ys, self.freq, self._fit_expression(), h,
+                                               level, **self.kwargs)
+
 class ForecastObject(BaseEstimator, RegressorMixin):
     """Wrapper for models in the R package _forecast_ that returns an object.
 
@@ -145,6 +398,36 @@ class ForecastObject(BaseEstimator, RegressorMixin):
 
         return y_hat
 
+    def predict_full(self, X, level=(80, 95)):
+        """Full forecast of the series (see forecast_dtype)."""
+        check_is_fitted(self, 'y_ts_')
+
+        full, errors = self.fit_predict_full_batch([self.y_ts_], [len(X)], level)
+        if errors[0] is not None:
+            raise RuntimeError(errors[0])
+
+        return full[0]
+
+    def _fit_expression(self):
+        """R expression that fits the model on y_ts."""
+        return 'do.call(%s, c(list(y_ts, h=h, level=level), args))' % self.model
+
+    def fit_predict_batch(self, ys, h):
+        """Fits and forecasts a list of series in a single call to R.
+
+        See ForecastModel.fit_predict_batch.
+        """
+        return fit_predict_forecast_batch(ys, self.freq, self._fit_expression(), h,
+                                          **self.kwargs)
+
+    def fit_predict_full_batch(self, ys, h, level=(80, 95)):
+        """Fits a list of series in a single call to R and returns their full forecasts.
+
+        See fit_predict_forecast_full_batch.
+        """
+        return fit_predict_forecast_full_batch(ys, self.freq, self._fit_expression(), h,
+                                               level, **self.kwargs)
+
 class ARIMA(ForecastModel):
     """Wrapper of forecast::auto.arima from R.
 
@@ -156,6 +439,10 @@ class ARIMA(ForecastModel):
         considered as frequency.)
     """
 
+    refit_model = 'Arima'
+    # Settings of the search (stepwise, approximation, ...) do not apply
+    refit_args = ('xreg', 'lambda', 'biasadj', 'method')
+
     def __init__(self, freq, **kwargs):
         super().__init__(model='auto.arima', freq=freq, **kwargs)
 
@@ -170,6 +457,8 @@ class ETS(ForecastModel):
         considered as frequency.)
     """
 
+    refit_model = 'ets'
+
     def __init__(self, freq, **kwargs):
         super().__init__(model='ets', freq=freq, **kwargs)
 
@@ -245,7 +534,8 @@ class STLMFFORMA(ForecastModel):
 
     def __init__(self, freq, **kwargs):
         if freq > 1:
-            super().__init__(model='stlm', freq=freq, modelfunction=stats.ar, **kwargs)
+            super().__init__(model='stlm', freq=freq,
+                             modelfunction=RExpression('stats::ar'), **kwargs)
         else:
             super().__init__(model='auto.arima', freq=freq, d=0, D=0)
 
@@ -257,6 +547,10 @@ class STLMFFORMA(ForecastModel):
 
         return self
 
+    def _fit_expression(self):
+        return 'tryCatch(%s, error=function(e) auto.arima(y_ts, d=0, D=0))' \
+               % super()._fit_expression()
+
 ##############################################################################
 ######## FORECAST OBJECTS ####################################################
 #############################################################################
@@ -270,6 +564,11 @@ class RandomWalk(ForecastObject):
         Frequency of the time series.
         Can be multiple seasonalities. (Last seasonality
         considered as frequency.)
+
+    Notes
+    -----
+    [1] BaseModelsTrainer forecasts it with a NumPy panel engine
+        (if drift is the only argument), R is not called. See fforma.base._panel.
     """
 
     def __init__(self, freq, **kwargs):
@@ -284,6 +583,11 @@ class ThetaF(ForecastObject):
         Frequency of the time series.
         Can be multiple seasonalities. (Last seasonality
         considered as frequency.)
+
+    Notes
+    -----
+    [1] BaseModelsTrainer forecasts it with a NumPy panel engine,
+        R is not called. See fforma.base._panel.
     """
 
     def __init__(self, freq, **kwargs):
@@ -298,6 +602,11 @@ class NaiveR(ForecastObject):
         Frequency of the time series.
         Can be multiple seasonalities. (Last seasonality
         considered as frequency.)
+
+    Notes
+    -----
+    [1] BaseModelsTrainer forecasts it with a NumPy panel engine,
+        R is not called. See fforma.base._panel.
     """
 
     def __init__(self, freq, **kwargs):
@@ -312,6 +621,11 @@ class SeasonalNaiveR(ForecastObject):
         Frequency of the time series.
         Can be multiple seasonalities. (Last seasonality
         considered as frequency.)
+
+    Notes
+    -----
+    [1] BaseModelsTrainer forecasts it with a NumPy panel engine,
+        R is not called. See fforma.base._panel.
     """
 
     def __init__(self, freq, **kwargs):
@@ -0,0 +1,563 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from functools import partial
+from typing import Callable, Dict, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from ._models import (Naive, SeasonalNaive, Naive2, RandomWalkDrift, Average,
+                      MovingAverage, SeasonalMovingAverage,
+                      Croston, TSB, ADIDA, iMAPA, deseasonalize_panel,
+                      adida_panel, imapa_panel)
+from ._models_r import RandomWalk, ThetaF, NaiveR, SeasonalNaiveR
+from ._theta import theta_fit, theta_predict
+
+######################################################################
+# PANEL LAYOUT
+######################################################################
+
+def to_panel(y: Union[np.ndarray, Sequence[np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Builds the values + offsets layout of a panel.
+
+    Parameters
+    ----------
+    y: numpy array or sequence of numpy arrays
+        Either a sequence of univariate time series or a 2-D
+        array with one series per row padded with NaNs.
+
+    Returns
+    -------
+    values: numpy array
+        Concatenated values of all the series (float64).
+    indptr: numpy array
+        Offsets of each series in values, the i-th series is
+        values[indptr[i]:indptr[i + 1]].
+    """
+    if isinstance(y, np.ndarray) and y.ndim == 2:
+        y = np.asarray(y, dtype=np.float64)
+        mask = ~np.isnan(y)
+        values = y[mask]
+        lengths = mask.sum(1)
+    else:
+        lengths = np.array([len(y_i) for y_i in y], dtype=np.int64)
+        values = np.concatenate([np.asarray(y_i, dtype=np.float64).ravel() for y_i in y]) \
+                 if len(y) else np.empty(0)
+
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+
+    return values, indptr
+
+def append_panel(values: np.ndarray, indptr: np.ndarray,
+                 new_values: np.ndarray, new_indptr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Appends new observations at the end of each series of a panel.
+
+    Parameters
+    ----------
+    values, indptr: numpy arrays
+        Panel in the values + offsets layout. See to_panel.
+    new_values, new_indptr: numpy arrays
+        New observations of each series in the same layout,
+        series without new observations have empty segments.
+
+    Returns
+    -------
+    values, indptr: numpy arrays
+        Extended panel.
+    """
+    lengths = np.diff(indptr)
+    new_lengths = np.diff(new_indptr)
+
+    out_indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths + new_lengths, out=out_indptr[1:])
+
+    out_values = np.empty(out_indptr[-1])
+    old_pos = np.arange(len(values)) + np.repeat(out_indptr[:-1] - indptr[:-1], lengths)
+    new_pos = np.arange(len(new_values)) \
+              + np.repeat(out_indptr[:-1] + lengths - new_indptr[:-1], new_lengths)
+    out_values[old_pos] = values
+    out_values[new_pos] = new_values
+
+    return out_values, out_indptr
+
+def take_panel(values: np.ndarray, indptr: np.ndarray,
+               pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Panel with the series in positions pos.
+
+    Parameters
+    ----------
+    values, indptr: numpy arrays
+        Panel in the values + offsets layout. See to_panel.
+    pos: numpy array
+        Positions of the series to keep.
+
+    Returns
+    -------
+    values, indptr: numpy arrays
+        Panel of the selected series.
+    """
+    lengths = np.diff(indptr)[pos]
+
+    out_indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=out_indptr[1:])
+    idx = np.arange(out_indptr[-1]) + np.repeat(indptr[:-1][pos] - out_indptr[:-1], lengths)
+
+    return values[idx], out_indptr
+
+def _check_panel(values: np.ndarray, indptr: np.ndarray) -> None:
+    """Validates the values + offsets layout."""
+    assert indptr[0] == 0 and indptr[-1] == len(values), 'indptr does not match values'
+    if np.any(np.diff(indptr) <= 0):
+        raise ValueError('Panel mode does not support empty time series')
+
+def _window_means(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Means of values[starts[i]:ends[i]] for each window i.
+
+    Windows of the same size are gathered into a 2-D array and
+    reduced row-wise, which is bit-identical to np.mean over each slice.
+    """
+    sizes = ends - starts
+    means = np.empty(len(sizes))
+
+    for size in np.unique(sizes):
+        rows, = np.where(sizes == size)
+        gathered = values[starts[rows, None] + np.arange(size)]
+        means[rows] = gathered.mean(axis=1)
+
+    return means
+
+def _tails(values: np.ndarray, indptr: np.ndarray, size: int) -> np.ndarray:
+    """Last min(length, size) values of each series.
+
+    Values are left aligned in an array of shape (n_series, size)
+    padded with NaNs.
+    """
+    n_tail = np.minimum(np.diff(indptr), size)
+    cols = np.arange(size)
+    mask = cols < n_tail[:, None]
+    idx = indptr[1:, None] - n_tail[:, None] + cols
+    tails = np.full((len(n_tail), size), np.nan)
+    tails[mask] = values[idx[mask]]
+
+    return tails
+
+def _extend_tails(tails: np.ndarray, n_tail: np.ndarray,
+                  values: np.ndarray, indptr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Panel of the first n_tail values of each row of tails followed by new values."""
+    mask = np.arange(tails.shape[1]) < n_tail[:, None]
+    tail_indptr = np.zeros(len(n_tail) + 1, dtype=np.int64)
+    np.cumsum(n_tail, out=tail_indptr[1:])
+
+    return append_panel(tails[mask], tail_indptr, values, indptr)
+
+def _r_frequency(freq) -> int:
+    """Frequency of msts(y, seasonal.periods=freq) in R."""
+    return int(np.floor(np.max(freq)))
+
+def _segment_sums(values: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """Sums of each segment, empty segments sum 0."""
+    lengths = np.diff(indptr)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+
+    return np.bincount(segments, weights=values, minlength=len(lengths))
+
+######################################################################
+# PANEL ENGINES
+######################################################################
+
+def _naive_fit(model: Naive, values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    return {'last': values[indptr[1:] - 1]}
+
+def _naive_update(model: Naive, state: Dict[str, np.ndarray],
+                  values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    updated = np.diff(indptr) > 0
+    last = state['last'].copy()
+    last[updated] = values[indptr[1:][updated] - 1]
+
+    return {'last': last}
+
+def _naive_predict(model: Naive, state: Dict[str, np.ndarray], h: int) -> np.ndarray:
+    return np.repeat(state['last'][:, None], h, axis=1)
+
+def _last_season(values: np.ndarray, indptr: np.ndarray,
+                 seasonality: int) -> Dict[str, np.ndarray]:
+    lengths = np.diff(indptr)
+    # Series shorter than the seasonality repeat the whole series
+    period = np.minimum(lengths, seasonality)
+    idx = indptr[1:, None] - period[:, None] + np.arange(seasonality) % period[:, None]
+
+    return {'season': values[idx], 'period': period}
+
+def _seasonal_naive_fit(model: SeasonalNaive, values: np.ndarray,
+                        indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    return _last_season(values, indptr, model.seasonality)
+
+def _seasonal_naive_update(model: SeasonalNaive, state: Dict[str, np.ndarray],
+                           values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    # The first period values of season are the last observations
+    seasonality = state['season'].shape[1]
+    values, indptr = _extend_tails(state['season'], state['period'], values, indptr)
+
+    return _last_season(values, indptr, seasonality)
+
+def _seasonal_naive_predict(model: SeasonalNaive, state: Dict[str, np.ndarray],
+                            h: int) -> np.ndarray:
+    idx = np.arange(h)[None, :] % state['period'][:, None]
+
+    return np.take_along_axis(state['season'], idx, axis=1)
+
+def _naive2_fit(model: Naive2, values: np.ndarray,
+                indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    seasonality = model.seasonality
+    si = deseasonalize_panel(values, indptr, seasonality)
+    lengths = np.diff(indptr)
+    # Last period seasonal indices, as the seasonal naive of s_hat
+    period = np.minimum(lengths, seasonality)
+    phases = (lengths[:, None] - period[:, None] + np.arange(seasonality) % period[:, None]) \
+             % seasonality
+    season = np.take_along_axis(si, phases, axis=1)
+    last = values[indptr[1:] - 1] / si[np.arange(len(lengths)), (lengths - 1) % seasonality]
+
+    return {'season': season, 'period': period, 'last': last}
+
+def _adida_fit(model: ADIDA, values: np.ndarray,
+               indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    return {'level': adida_panel(values, indptr)}
+
+def _imapa_fit(model: iMAPA, values: np.ndarray,
+               indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    return {'level': imapa_panel(values, indptr)[0]}
+
+def _random_walk_drift_fit(model: RandomWalkDrift, values: np.ndarray,
+                           indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    length = np.diff(indptr)
+    if np.any(length < 2):
+        # As RandomWalkDrift.fit and rwf(drift=TRUE), the drift needs two observations
+        raise ValueError(f'Random walk with drift needs at least 2 observations, '
+                         f'{np.sum(length < 2)} series have fewer.')
+    first = values[indptr[:-1]]
+    last = values[indptr[1:] - 1]
+    drift = (last - first) / (length - 1)
+
+    return {'last': last, 'drift': drift, 'first': first, 'length': length}
+
+def _random_walk_drift_update(model: RandomWalkDrift, state: Dict[str, np.ndarray],
+                              values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    last = _naive_update(model, state, values, indptr)['last']
+    length = state['length'] + np.diff(indptr)
+    drift = (last - state['first']) / (length - 1)
+
+    return {'last': last, 'drift': drift, 'first': state['first'], 'length': length}
+
+def _random_walk_drift_predict(model: RandomWalkDrift, state: Dict[str, np.ndarray],
+                               h: int) -> np.ndarray:
+    steps = np.arange(1, h + 1)
+
+    return state['last'][:, None] + state['drift'][:, None] * steps
+
+def _average_fit(model: Average, values: np.ndarray,
+                 indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    average = _window_means(values, indptr[:-1], indptr[1:])
+
+    return {'average': average, 'length': np.diff(indptr)}
+
+def _average_update(model: Average, state: Dict[str, np.ndarray],
+                    values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    length = state['length'] + np.diff(indptr)
+    average = (state['average'] * state['length'] + _segment_sums(values, indptr)) / length
+
+    return {'average': average, 'length': length}
+
+def _average_predict(model: Average, state: Dict[str, np.ndarray], h: int) -> np.ndarray:
+    return np.repeat(state['average'][:, None], h, axis=1)
+
+def _moving_average_fit(model: MovingAverage, values: np.ndarray,
+                        indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    starts = np.maximum(indptr[:-1], indptr[1:] - model.n_obs)
+    moving_average = _window_means(values, starts, indptr[1:])
+
+    return {'average': moving_average, 'window': _tails(values, indptr, model.n_obs),
+            'length': np.diff(indptr)}
+
+def _window_update(fit_fn: Callable, size: int, model, state: Dict[str, np.ndarray],
+                   values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    """Refits a model that only depends on the last size observations."""
+    length = state['length'] + np.diff(indptr)
+    values, indptr = _extend_tails(state['window'], np.minimum(state['length'], size),
+                                   values, indptr)
+    state = fit_fn(model, values, indptr)
+    state['length'] = length
+
+    return state
+
+def _moving_average_update(model: MovingAverage, state: Dict[str, np.ndarray],
+                           values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    return _window_update(_moving_average_fit, model.n_obs, model, state, values, indptr)
+
+def _seasonal_moving_average_fit(model: SeasonalMovingAverage, values: np.ndarray,
+                                 indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    seasonality = model.seasonality
+    n_obs = seasonality * model.n_seasons
+    lengths = np.diff(indptr)
+    window = np.minimum(lengths, n_obs)
+    season_vals = np.empty((len(lengths), seasonality))
+
+    # Series are grouped by window size and seasons by number of
+    # observations, so each group is a row-wise mean of a gathered array.
+    for size in np.unique(window):
+        rows, = np.where(window == size)
+        starts = indptr[rows + 1] - size
+        counts = np.array([len(range(i, size, seasonality))
+                           for i in range(seasonality)])
+        for count in np.unique(counts):
+            seasons, = np.where(counts == count)
+            if count == 0:
+                season_vals[rows[:, None], seasons] = np.nan
+                continue
+            idx = seasons[:, None] + seasonality * np.arange(count)
+            gathered = values[starts[:, None, None] + idx[None]]
+            season_vals[rows[:, None], seasons] = gathered.mean(axis=2)
+
+    return {'season_vals': season_vals, 'window': _tails(values, indptr, n_obs),
+            'length': lengths}
+
+def _seasonal_moving_average_update(model: SeasonalMovingAverage,
+                                    state: Dict[str, np.ndarray],
+                                    values: np.ndarray,
+                                    indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    n_obs = model.seasonality * model.n_seasons
+
+    return _window_update(_seasonal_moving_average_fit, n_obs, model, state, values, indptr)
+
+def _seasonal_moving_average_predict(model: SeasonalMovingAverage,
+                                     state: Dict[str, np.ndarray],
+                                     h: int) -> np.ndarray:
+    idxs = np.arange(h) % model.seasonality
+
+    return state['season_vals'][:, idxs]
+
+def _snaive_r_fit(model: SeasonalNaiveR, values: np.ndarray,
+                  indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    return _last_season(values, indptr, _r_frequency(model.freq))
+
+def _rwf_fit(model: RandomWalk, values: np.ndarray,
+             indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    if model.kwargs.get('drift', False):
+        return _random_walk_drift_fit(model, values, indptr)
+
+    return _naive_fit(model, values, indptr)
+
+def _rwf_update(model: RandomWalk, state: Dict[str, np.ndarray],
+                values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    if 'drift' in state:
+        return _random_walk_drift_update(model, state, values, indptr)
+
+    return _naive_update(model, state, values, indptr)
+
+def _rwf_predict(model: RandomWalk, state: Dict[str, np.ndarray], h: int) -> np.ndarray:
+    if 'drift' in state:
+        return _random_walk_drift_predict(model, state, h)
+
+    return _naive_predict(model, state, h)
+
+def _thetaf_fit(model: ThetaF, values: np.ndarray,
+                indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    return theta_fit(values, indptr, _r_frequency(model.freq))
+
+def _thetaf_predict(model: ThetaF, state: Dict[str, np.ndarray], h: int) -> np.ndarray:
+    return theta_predict(state, h)
+
+######################################################################
+# PANEL STATES
+######################################################################
+
+def _naive2_state(model: Naive2) -> Dict[str, np.ndarray]:
+    seasonality = model.seasonality
+    period = min(len(model.s_hat), seasonality)
+    season = model.s_hat[-period:][np.arange(seasonality) % period]
+
+    return {'season': season, 'period': period, 'last': float(model.ts_des[-1])}
+
+def _naive2_predict(model: Naive2, state: Dict[str, np.ndarray], h: int) -> np.ndarray:
+    s_hat = _seasonal_naive_predict(model, state, h)
+
+    return s_hat * state['last'][:, None]
+
+def _level_state(model, attr: str) -> Dict[str, np.ndarray]:
+    return {'level': float(np.mean(getattr(model, attr)))}
+
+def _level_predict(model, state: Dict[str, np.ndarray], h: int) -> np.ndarray:
+    return np.repeat(state['level'][:, None], h, axis=1)
+
+_PANEL_ENGINES: Dict[type, Callable] = {
+    Naive: _naive_fit,
+    SeasonalNaive: _seasonal_naive_fit,
+    Naive2: _naive2_fit,
+    ADIDA: _adida_fit,
+    iMAPA: _imapa_fit,
+    RandomWalkDrift: _random_walk_drift_fit,
+    Average: _average_fit,
+    MovingAverage: _moving_average_fit,
+    SeasonalMovingAverage: _seasonal_moving_average_fit,
+    NaiveR: _naive_fit,
+    SeasonalNaiveR: _snaive_r_fit,
+    RandomWalk: _rwf_fit,
+    ThetaF: _thetaf_fit,
+}
+
+# Arguments of the R models supported by their panel engines
+_PANEL_KWARGS: Dict[type, Set[str]] = {
+    RandomWalk: {'drift'},
+}
+
+_PANEL_UPDATES: Dict[type, Callable] = {
+    Naive: _naive_update,
+    SeasonalNaive: _seasonal_naive_update,
+    RandomWalkDrift: _random_walk_drift_update,
+    Average: _average_update,
+    MovingAverage: _moving_average_update,
+    SeasonalMovingAverage: _seasonal_moving_average_update,
+    NaiveR: _naive_update,
+    SeasonalNaiveR: _seasonal_naive_update,
+    RandomWalk: _rwf_update,
+}
+
+_PANEL_STATES: Dict[type, Callable] = {
+    Naive2: _naive2_state,
+    Croston: partial(_level_state, attr='pred_'),
+    TSB: partial(_level_state, attr='pred_'),
+    ADIDA: partial(_level_state, attr='al_'),
+    iMAPA: partial(_level_state, attr='frc_'),
+}
+
+_PANEL_PREDICTORS: Dict[type, Callable] = {
+    Naive: _naive_predict,
+    SeasonalNaive: _seasonal_naive_predict,
+    Naive2: _naive2_predict,
+    RandomWalkDrift: _random_walk_drift_predict,
+    Average: _average_predict,
+    MovingAverage: _average_predict,
+    SeasonalMovingAverage: _seasonal_moving_average_predict,
+    NaiveR: _naive_predict,
+    SeasonalNaiveR: _seasonal_naive_predict,
+    RandomWalk: _rwf_predict,
+    ThetaF: _thetaf_predict,
+    Croston: _level_predict,
+    TSB: _level_predict,
+    ADIDA: _level_predict,
+    iMAPA: _level_predict,
+}
+
+def has_panel_engine(model) -> bool:
+    """Whether the model can be fitted for a whole panel at once.
+
+    Wrappers of R models only have a panel engine if
+    their arguments are supported by it.
+    """
+    if type(model) not in _PANEL_ENGINES:
+        return False
+    kwargs = getattr(model, 'kwargs', {})
+
+    return set(kwargs) <= _PANEL_KWARGS.get(type(model), set())
+
+def has_panel_update(model) -> bool:
+    """Whether the panel engine of the model can be updated
+    without the whole history. See update_panel.
+    """
+    return type(model) in _PANEL_UPDATES
+
+def has_panel_state(model) -> bool:
+    """Whether a fitted model can be stored as typed parameters.
+
+    These models are fitted series by series but forecasted
+    for the whole panel at once.
+    """
+    return type(model) in _PANEL_STATES
+
+def get_panel_state(model) -> Dict[str, np.ndarray]:
+    """Learned parameters of a model fitted on a single series."""
+    return _PANEL_STATES[type(model)](model)
+
+def fit_panel(model, values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    """Fits model on every series of the panel in one vectorized call.
+
+    Parameters
+    ----------
+    model: BaseEstimator
+        Instantiated model with a panel engine. See has_panel_engine.
+    values: numpy array
+        Concatenated values of the series.
+    indptr: numpy array
+        Offsets of each series in values. See to_panel.
+
+    Returns
+    -------
+    Dict[str, numpy array]
+        Learned parameters, the first axis of each array
+        indexes the series.
+    """
+    if not has_panel_engine(model):
+        raise ValueError(f'{type(model).__name__} has no panel engine')
+
+    values = np.asarray(values, dtype=np.float64)
+    indptr = np.asarray(indptr, dtype=np.int64)
+    _check_panel(values, indptr)
+    fit_fn = _PANEL_ENGINES[type(model)]
+
+    return fit_fn(model, values, indptr)
+
+def update_panel(model, state: Dict[str, np.ndarray],
+                 values: np.ndarray, indptr: np.ndarray) -> Dict[str, np.ndarray]:
+    """Updates the parameters of fit_panel with new observations.
+
+    The cost is proportional to the number of new observations
+    (plus the window of the moving averages), the whole history
+    is not needed.
+
+    Parameters
+    ----------
+    model: BaseEstimator
+        Model used in fit_panel.
+    state: Dict[str, numpy array]
+        Output of fit_panel (or update_panel).
+    values: numpy array
+        Concatenated new observations of the series.
+    indptr: numpy array
+        Offsets of the new observations of each series in values,
+        series without new observations have empty segments.
+
+    Returns
+    -------
+    Dict[str, numpy array]
+        Learned parameters, same as fit_panel on the extended panel.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    indptr = np.asarray(indptr, dtype=np.int64)
+    assert indptr[0] == 0 and indptr[-1] == len(values), 'indptr does not match values'
+    if not len(values):
+        return state
+    update_fn = _PANEL_UPDATES[type(model)]
+
+    return update_fn(model, state, values, indptr)
+
+def predict_panel(model, state: Dict[str, np.ndarray], h: int) -> np.ndarray:
+    """Forecasts every series of a fitted panel.
+
+    Parameters
+    ----------
+    model: BaseEstimator
+        Model used in fit_panel.
+    state: Dict[str, numpy array]
+        Output of fit_panel or stacked outputs of get_panel_state.
+    h: int
+        Forecast horizon.
+
+    Returns
+    -------
+    numpy array
+        Forecasts of shape (n_series, h).
+    """
+    predict_fn = _PANEL_PREDICTORS[type(model)]
+
+    return predict_fn(model, state, h)
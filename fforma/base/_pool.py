@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import importlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Optional, Sequence
+
+# rpy2 and the R forecast package are loaded on the first R call
+# of each worker and kept for the life of the pool.
+_DEFAULT_MODULES = ('pandas', 'statsmodels.api', 'fforma.base')
+
+
+def _warm_up(modules: Sequence[str]) -> None:
+    """Initializer of each worker, imports modules once."""
+    for module in modules:
+        importlib.import_module(module)
+
+def _ping() -> None:
+    pass
+
+
+class WorkerPool:
+    """
+    Long-lived pool of processes shared by several trainers.
+
+    Each worker imports modules (pandas, statsmodels and fforma.base
+    by default) once when it starts, so successive
+    BaseModelsTrainer calls (rolling cutoffs, groups, ...) do not pay
+    the start up of the processes again.
+
+    Parameters
+    ----------
+    n_workers: int
+        Number of processes. Default to None, number of cores minus 1.
+    modules: Sequence[str]
+        Modules imported by each worker when it starts.
+    context: str
+        Multiprocessing start method. Default to 'spawn', forking
+        a process with an embedded R is not safe.
+
+    Examples
+    --------
+    with WorkerPool() as pool:
+        for cutoff in cutoffs:
+            BaseModelsTrainer(models, pool=pool).fit_predict(None, train, test)
+    """
+
+    def __init__(self, n_workers: Optional[int] = None,
+                 modules: Sequence[str] = _DEFAULT_MODULES,
+                 context: str = 'spawn'):
+        self.n_workers = max(mp.cpu_count() - 1, 1) if n_workers is None else n_workers
+        self.modules = tuple(modules)
+        self.context = context
+        self.executor_ = None
+
+    def start(self) -> 'WorkerPool':
+        """Starts the workers and waits until all of them are warmed up."""
+        if self.executor_ is None:
+            self.executor_ = ProcessPoolExecutor(self.n_workers,
+                                                 mp_context=mp.get_context(self.context),
+                                                 initializer=_warm_up,
+                                                 initargs=(self.modules,))
+            wait([self.executor_.submit(_ping) for _ in range(self.n_workers)])
+
+        return self
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Executor of the pool, starts it if needed."""
+        return self.start().executor_
+
+    def shutdown(self) -> None:
+        if self.executor_ is not None:
+            self.executor_.shutdown()
+            self.executor_ = None
+
+    def __enter__(self) -> 'WorkerPool':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+
+    def __getstate__(self):
+        # Processes are not pickled, a copy starts its own workers
+        state = self.__dict__.copy()
+        state['executor_'] = None
+
+        return state
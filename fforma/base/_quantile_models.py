@@ -4,15 +4,15 @@
 from itertools import count
 from numbers import Number
 from sys import float_info
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
+from numba import njit
 from sklearn.utils.validation import check_is_fitted
-from statsmodels.regression.linear_model import RegressionResultsWrapper
-from statsmodels.regression.quantile_regression import QuantReg
 from statsmodels.tsa.stattools import adfuller
 
 from fforma.base import Naive
+from fforma.base._quantreg import QuantRegFit, fit_quantiles
 
 
 def embed(x: np.array, p: int) -> np.array:
@@ -46,6 +46,201 @@ def embed(x: np.array, p: int) -> np.array:
 
     return x
 
+def _stationary(y: np.ndarray, max_diffs: int) -> Tuple[np.ndarray, int]:
+    """Differences y until the Dicky-Fuller test rejects a unit root."""
+    differences = 0
+    for _ in range(max_diffs):
+        _, pval, *_ = adfuller(y)
+        if pval < 0.05:
+            break
+        y = np.diff(y, 1)
+        differences += 1
+
+    return y, differences
+
+def _lagged_design(y: np.ndarray, ar_terms: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Target and ar_terms lags of y, same as embed(y, [0] + ar_terms).
+
+    The target is a view of y and the lags are gathered with a
+    single fancy index, without rolling copies of the whole series.
+    """
+    max_ar = np.max(ar_terms)
+    rows = np.arange(max_ar, len(y))
+
+    return y[max_ar:], y[rows[:, None] - np.asarray(ar_terms)]
+
+def _drop_constant_columns(X: np.ndarray, ar_terms: Sequence[int],
+                           adjust_ar_terms: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Removes the ar terms of X with constant columns."""
+    idx, = np.where(X.std(0) == 0)
+
+    if not adjust_ar_terms and len(idx):
+        raise Exception(f'AR terms [{", ".join([str(i) for i in idx])}] '
+                        'generate constant '
+                        'columns; try removing this terms or '
+                        'using others.')
+
+    return np.delete(X, idx, 1), np.delete(ar_terms, idx)
+
+def _add_regressors(X: np.ndarray, add_constant: bool, add_trend: bool,
+                    last_len_y: int) -> np.ndarray:
+    """Adds the constant and the trend (time index) to the lags."""
+    if add_constant:
+        X = np.hstack([X, np.ones((len(X), 1))])
+
+    if add_trend:
+        trend = np.arange(last_len_y - len(X), last_len_y).reshape(-1, 1)
+        X = np.hstack([X, trend])
+
+    if np.linalg.cond(X) > 1 / float_info.epsilon:
+        raise Exception('X matrix is ill-conditioned '
+                        'try reducing number of ar_terms '
+                        'or setting add_constant=False.')
+
+    return X
+
+def _naive_forecast(fittedvalues: np.ndarray, seasonality: int, horizon: int) -> np.ndarray:
+    """Seasonal naive of the last seasonality fitted values."""
+    repetitions = int(np.ceil(horizon / seasonality))
+    y_hat = np.tile(fittedvalues[-seasonality:], repetitions)
+
+    return y_hat[:horizon]
+
+@njit(cache=True, nogil=True)
+def _ar_recursion(history, lags, coefs, constant, trend, trend_start, h):
+    """Recursive forecasts of autoregressions with the same lags.
+
+    The last max(lags) values of each series are kept in a ring
+    buffer, the value of step s is stored at s % max(lags).
+    Steps are grouped in blocks of min(lags) values and the trend
+    of block b starts at trend_start + max(lags) * b.
+    """
+    n_series, max_ar = history.shape
+    min_ar = lags.min()
+    y_hat = np.empty((n_series, h))
+    buffer = np.empty(max_ar)
+    for i in range(n_series):
+        buffer[:] = history[i]
+        for s in range(h):
+            y = 0.
+            for j in range(lags.size):
+                y += coefs[i, j] * buffer[(s - lags[j]) % max_ar]
+            y += constant[i]
+            y += trend[i] * (trend_start[i] + max_ar * (s // min_ar) + s % min_ar)
+            buffer[s % max_ar] = y
+            y_hat[i, s] = y
+
+    return y_hat
+
+def recursive_forecast_batch(params: np.ndarray, histories: np.ndarray,
+                             ar_terms: Sequence[int], add_constant: bool,
+                             add_trend: bool, last_len_y: np.ndarray,
+                             horizon: int) -> np.ndarray:
+    """Recursive forecasts of quantile autoregressions sharing ar_terms.
+
+    Each step only reads the last max(ar_terms) values, so the
+    cost is O(horizon) whatever the length of the series.
+
+    Parameters
+    ----------
+    params: numpy array
+        Coefficients of shape (n_series, n_params) ordered as the
+        design matrix of QuantileAutoRegression: ar_terms, constant
+        (if add_constant) and trend (if add_trend).
+    histories: numpy array
+        Last max(ar_terms) values of the (differenced) training
+        series, shape (n_series, max(ar_terms)).
+    ar_terms: Sequence[int]
+        Autorregresive terms of every series.
+    add_constant, add_trend: bool
+        Regressors of the models.
+    last_len_y: numpy array
+        Length of each original series (start of the trend).
+    horizon: int
+        Number of steps to forecast.
+
+    Returns
+    -------
+    numpy array
+        Forecasts of shape (n_series, horizon).
+    """
+    params = np.asarray(params, dtype=np.float64)
+    lags = np.asarray(ar_terms, dtype=np.int64)
+    n_series, n_lags = len(params), len(lags)
+    zeros = np.zeros(n_series)
+    constant = params[:, n_lags] if add_constant else zeros
+    trend = params[:, -1] if add_trend else zeros
+
+    return _ar_recursion(np.asarray(histories, dtype=np.float64), lags,
+                         np.ascontiguousarray(params[:, :n_lags]),
+                         constant, trend,
+                         np.asarray(last_len_y, dtype=np.float64) * np.ones(n_series),
+                         horizon)
+
+def _recursive_forecast(models: List[QuantRegFit], last_values: np.ndarray,
+                        ar_terms: Sequence[int], add_constant: bool, add_trend: bool,
+                        last_len_y: int, horizon: int) -> np.ndarray:
+    """Recursive forecasts of regressions of the same series, shape (len(models), horizon).
+
+    last_values are the last values of the whole (differenced) training
+    series, y_train lacks the first max(ar_terms) of them.
+    """
+    history = _history(last_values, ar_terms)
+    params = np.array([model.params for model in models])
+
+    return recursive_forecast_batch(params, np.tile(history, (len(models), 1)), ar_terms,
+                                    add_constant, add_trend, last_len_y, horizon)
+
+def _history(last_values: np.ndarray, ar_terms: Sequence[int]) -> np.ndarray:
+    """Last max(ar_terms) values of a training series, the lags of the first forecast."""
+    max_ar = np.max(ar_terms)
+    if len(last_values) < max_ar:
+        raise Exception(f'{max_ar} observations are needed to forecast '
+                        f'ar_terms {list(ar_terms)}, the series has {len(last_values)}.')
+
+    return last_values[-max_ar:]
+
+def qar_predict_batch(models: List['QuantileAutoRegression'], horizon: int) -> np.ndarray:
+    """Forecasts of fitted QuantileAutoRegression models of several series.
+
+    Models with the same ar_terms and regressors are forecasted
+    in a single recursion.
+
+    Returns
+    -------
+    numpy array
+        Forecasts of shape (len(models), horizon).
+    """
+    y_hats = np.empty((len(models), horizon))
+    groups = {}
+    for i, model in enumerate(models):
+        check_is_fitted(model)
+        if model.is_constant or model.naive_forecasts:
+            y_hats[i] = model.predict(np.empty(horizon))
+            continue
+        key = (tuple(model.ar_terms), model.add_constant, model.add_trend)
+        groups.setdefault(key, []).append(i)
+
+    for (ar_terms, add_constant, add_trend), idx in groups.items():
+        group = [models[i] for i in idx]
+        y_hat = recursive_forecast_batch([model.model_.params for model in group],
+                                         [_history(model.last_values, ar_terms)
+                                          for model in group],
+                                         ar_terms, add_constant, add_trend,
+                                         [model.last_len_y for model in group], horizon)
+        for i, model, y_hat_i in zip(idx, group, y_hat):
+            y_hats[i] = _integrate(y_hat_i, model.differences, model.last_y_train)
+
+    return y_hats
+
+def _integrate(y_hat: np.ndarray, differences: int, last_y: float) -> np.ndarray:
+    """Undoes the differences of forecasts of a differenced series."""
+    if differences:
+        for _ in range(differences): y_hat = y_hat.cumsum()
+        y_hat += last_y
+
+    return y_hat
+
 class QuantileAutoRegression:
     """
     Perform Quantile Regression on a time series using lags.
@@ -112,7 +307,8 @@ class QuantileAutoRegression:
         self.last_y_train: Number
         self.last_len_y: int
         self.y_train: np.ndarray
-        self.model_: RegressionResultsWrapper
+        self.last_values: np.ndarray
+        self.model_: QuantRegFit
 
     def _check_X(self, X):
         """
@@ -121,16 +317,7 @@ class QuantileAutoRegression:
         if self.is_constant:
             return X
 
-        idx, = np.where(X.std(0) == 0)
-
-        if not self.adjust_ar_terms and idx:
-            raise Exception(f'AR terms [{", ".join([str(i) for i in idx])}] '
-                            'generate constant '
-                            'columns; try removing this terms or '
-                            'using others.')
-
-        X = np.delete(X, idx, 1)
-        self.ar_terms = np.delete(self.ar_terms, idx)
+        X, self.ar_terms = _drop_constant_columns(X, self.ar_terms, self.adjust_ar_terms)
 
         return X
 
@@ -148,32 +335,16 @@ class QuantileAutoRegression:
         # Convert y to an stationary process
         self.differences = 0
         if not self.add_trend:
-            for _ in range(self.max_diffs):
-                _, pval, *_ = adfuller(y)
-                if pval < 0.05:
-                    break
-                y = np.diff(y, 1)
-                self.differences += 1
+            y, self.differences = _stationary(y, self.max_diffs)
 
-        design_mat = embed(y, [0] + self.ar_terms)
-        self.y_train, X_train = design_mat[:, 0], design_mat[:, 1:]
+        self.y_train, X_train = _lagged_design(y, self.ar_terms)
+        self.last_values = y[-self.max_ar:]
 
         X_train = self._check_X(X_train)
+        X_train = _add_regressors(X_train, self.add_constant, self.add_trend,
+                                  self.last_len_y)
 
-        if self.add_constant:
-            X_train = np.hstack([X_train, np.ones((len(X_train), 1))])
-
-        if self.add_trend:
-            trend = np.arange(self.last_len_y - len(X_train),
-                              self.last_len_y).reshape(-1, 1)
-            X_train = np.hstack([X_train, trend])
-
-        if np.linalg.cond(X_train) > 1 / float_info.epsilon:
-            raise Exception('X matrix is ill-conditioned '
-                            'try reducing number of ar_terms '
-                            'or setting add_constant=False.')
-
-        self.model_ = QuantReg(self.y_train, X_train).fit(self.tau)
+        self.model_, = fit_quantiles(X_train, self.y_train, [self.tau])
 
         return self
 
@@ -186,40 +357,143 @@ class QuantileAutoRegression:
         horizon = len(X)
 
         if self.naive_forecasts:
-            seasonality = self.ar_terms[0]
-            repetitions = int(np.ceil(horizon / seasonality))
-            y_hat = self.model_.fittedvalues[-seasonality:]
-            y_hat = np.tile(y_hat, repetitions)
-            y_hat = y_hat[:horizon]
-
+            y_hat = _naive_forecast(self.model_.fittedvalues, self.ar_terms[0], horizon)
         else:
-            y_hat = self.y_train
-            len_train = self.y_train.size
-            forecast_size = len_train + horizon
+            y_hat, = _recursive_forecast([self.model_], self.last_values, self.ar_terms,
+                                         self.add_constant, self.add_trend,
+                                         self.last_len_y, horizon)
 
-            counter = 0
-            while y_hat.size < forecast_size:
-                y_hat_placeholder = np.zeros(self.min_ar)
-                y_hat = np.concatenate([y_hat, y_hat_placeholder])
+        return _integrate(y_hat, self.differences, self.last_y_train)
 
-                X_test = embed(y_hat, self.ar_terms)[-self.min_ar:]
+# (add_trend, naive_forecasts) and suffix of the output names of each variant
+_QAR_VARIANTS = {'ar': (False, False, ''),
+                 'naive': (False, True, '_naive'),
+                 'trend': (True, False, '_trend'),
+                 'naive_trend': (True, True, '_naive_trend')}
 
-                if self.add_constant and not self.is_constant:
-                    X_test = np.hstack([X_test, np.ones((len(X_test), 1))])
+class MultiQuantileAutoRegression:
+    """
+    Quantile autoregressions of several taus and variants at once.
 
-                if self.add_trend and not self.is_constant:
-                    delta = self.max_ar * counter
-                    trend = np.arange(self.last_len_y + delta,
-                                      self.last_len_y + len(X_test) + delta).reshape(-1, 1)
-                    X_test = np.hstack([X_test, trend])
+    Equivalent to a QuantileAutoRegression for each tau and each
+    variant, but the differences (Dicky-Fuller tests), the design
+    matrix and its conditioning are computed once per series and
+    every tau is fitted in a single call. Variants with and
+    without naive_forecasts share the fitted regressions.
 
-                y_hat[-self.min_ar:] = self.model_.predict(X_test)
-                counter += 1
+    Parameters
+    ----------
+    taus: List[float]
+        Quantiles to predict between (0, 1).
+    ar_terms: list[int]
+        List of autorregresive terms to add.
+    add_constant: bool
+        Wheter add + c to the model.
+    max_diffs: int
+        Max number of differences to apply (variants without trend).
+    adjust_ar_terms: bool
+        If some ar term results in a constant column
+        adjust_ar_terms = True removes this ar_term in the
+        analysis. If adjust_ar_terms = False raises an Exception.
+    variants: List[str]
+        Variants to predict: 'ar', 'naive' (naive_forecasts=True),
+        'trend' (add_trend=True) and 'naive_trend' (both).
+
+    Notes
+    -----
+    [1] predict returns an array of shape (h, len(output_names)).
+        BaseModelsTrainer names the column of each output
+        '{model_name}_{output_name}', for example q_ar_0.9_naive.
+    [2] If y is constant, every output is the Naive model.
+
+    Examples
+    --------
+    The 16 models of the four variants of four taus for daily data:
+        model = MultiQuantileAutoRegression([0.3, 0.5, 0.7, 0.9],
+                                            ar_terms=[7, 14, 28], max_diffs=0)
+    """
 
-            y_hat = y_hat[len_train:forecast_size]
+    def __init__(self, taus: List[float],
+                 ar_terms: List[int],
+                 add_constant: bool = True,
+                 max_diffs: int = 10,
+                 adjust_ar_terms: bool = True,
+                 variants: Sequence[str] = ('ar', 'naive', 'trend', 'naive_trend')):
+        self.taus = taus
+        self.ar_terms = ar_terms
+        self.add_constant = add_constant
+        self.max_diffs = max_diffs
+        self.adjust_ar_terms = adjust_ar_terms
+        self.variants = variants
+
+    @property
+    def output_names(self) -> List[str]:
+        """Name of each output, '{tau}{suffix of the variant}'."""
+        return [f'{tau}{_QAR_VARIANTS[variant][2]}'
+                for tau in self.taus for variant in self.variants]
 
-        if self.differences:
-            for _ in range(self.differences): y_hat = y_hat.cumsum()
-            y_hat += self.last_y_train
+    def fit(self, X: np.ndarray, y: np.ndarray) -> 'MultiQuantileAutoRegression':
+        y = np.array(y, dtype=np.float64)
+        self.last_y_train_ = y[-1]
+        self.last_len_y_ = len(y)
+        self.is_constant_ = np.var(y) == 0
+
+        if self.is_constant_:
+            self.models_ = Naive().fit(None, y)
+
+            return self
+
+        trends = sorted({_QAR_VARIANTS[variant][0] for variant in self.variants})
+        # Trend variants are not differenced, without differences all use y
+        differences = 0
+        if False in trends:
+            y_diff, differences = _stationary(y, self.max_diffs)
+        y_train, X_lags = _lagged_design(y, self.ar_terms)
+        if differences:
+            y_train_diff, X_lags_diff = _lagged_design(y_diff, self.ar_terms)
+
+        # Regressions of each design (with and without trend)
+        self.models_ = {}
+        for add_trend in trends:
+            y_fit, X_fit, diffs, last_values = y_train, X_lags, 0, y
+            if not add_trend and differences:
+                y_fit, X_fit, diffs, last_values = (y_train_diff, X_lags_diff,
+                                                    differences, y_diff)
+            X_fit, ar_terms = _drop_constant_columns(X_fit, self.ar_terms,
+                                                     self.adjust_ar_terms)
+            X_fit = _add_regressors(X_fit, self.add_constant, add_trend, self.last_len_y_)
+            self.models_[add_trend] = {'models': fit_quantiles(X_fit, y_fit, self.taus),
+                                       'y_train': y_fit, 'ar_terms': ar_terms,
+                                       'last_values': last_values[-np.max(self.ar_terms):],
+                                       'differences': diffs}
+
+        return self
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        check_is_fitted(self, 'models_')
+        horizon = len(X)
 
-        return y_hat
+        if self.is_constant_:
+            y_hat = self.models_.predict(X)
+            return np.tile(np.asarray(y_hat)[:, None], (1, len(self.output_names)))
+
+        # Recursive forecasts of every tau of each design in a single recursion
+        recursive = {}
+        for add_trend, fit in self.models_.items():
+            recursive[add_trend] = _recursive_forecast(fit['models'], fit['last_values'],
+                                                       fit['ar_terms'], self.add_constant,
+                                                       add_trend, self.last_len_y_, horizon)
+
+        y_hats = []
+        for i in range(len(self.taus)):
+            for variant in self.variants:
+                add_trend, naive_forecasts, _ = _QAR_VARIANTS[variant]
+                fit = self.models_[add_trend]
+                if naive_forecasts:
+                    y_hat = _naive_forecast(fit['models'][i].fittedvalues,
+                                            fit['ar_terms'][0], horizon)
+                else:
+                    y_hat = recursive[add_trend][i]
+                y_hats.append(_integrate(y_hat, fit['differences'], self.last_y_train_))
+
+        return np.column_stack(y_hats)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import warnings
+from typing import List, Sequence, Union
+
+import numpy as np
+from statsmodels.tools.sm_exceptions import ConvergenceWarning, IterationLimitWarning
+
+# Residuals closer to zero are clipped in the weights of IRLS
+_MIN_RESID = 1e-6
+
+
+def quantreg_fit(X: np.ndarray, y: np.ndarray,
+                 taus: Union[float, Sequence[float]],
+                 max_iter: int = 1000,
+                 p_tol: float = 1e-6) -> np.ndarray:
+    """Linear quantile regression of several taus and series at once.
+
+    Same iteratively reweighted least squares as
+    statsmodels QuantReg.fit, vectorized over the taus and
+    over series with design matrices of the same shape.
+    Each (series, tau) problem stops iterating on its own.
+
+    Parameters
+    ----------
+    X: numpy array
+        Design matrix of shape (n_obs, n_features) or a batch
+        of shape (n_series, n_obs, n_features).
+    y: numpy array
+        Target of shape (n_obs,) or (n_series, n_obs).
+    taus: float or Sequence[float]
+        Quantiles between (0, 1).
+    max_iter: int
+        Maximum number of iterations.
+    p_tol: float
+        Tolerance of the change of the parameters.
+
+    Returns
+    -------
+    numpy array
+        Parameters of shape (n_taus, n_features) or
+        (n_series, n_taus, n_features) for a batch.
+        The taus axis is dropped if taus is a float.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    scalar_tau = np.ndim(taus) == 0
+    taus = np.atleast_1d(np.asarray(taus, dtype=np.float64))
+    if np.any((taus <= 0) | (taus >= 1)):
+        raise Exception('q must be strictly between 0 and 1')
+
+    batch = X.ndim == 3
+    if not batch:
+        X, y = X[None], y[None]
+    n_series, _, n_features = X.shape
+    n_taus = len(taus)
+
+    # Problems are the (series, tau) pairs
+    series = np.repeat(np.arange(n_series), n_taus)
+    q = np.tile(taus, n_series)
+    params = np.ones((len(q), n_features))
+    xtx = np.einsum('snk,snl->skl', X, X)[series]
+    xty = np.einsum('snk,sn->sk', X, y)[series]
+
+    active = np.arange(len(q))
+    history: List[np.ndarray] = []
+    n_iter = 0
+    while n_iter < max_iter and len(active):
+        n_iter += 1
+        beta = np.einsum('pkl,pl->pk', np.linalg.pinv(xtx), xty)
+        X_active, y_active = X[series[active]], y[series[active]]
+        resid = y_active - np.einsum('pnk,pk->pn', X_active, beta)
+
+        resid = np.where(np.abs(resid) < _MIN_RESID,
+                         np.where(resid >= 0, _MIN_RESID, -_MIN_RESID), resid)
+        resid = np.abs(np.where(resid < 0, q[active, None] * resid,
+                                (1 - q[active, None]) * resid))
+        xstar = X_active / resid[:, :, None]
+        diff = np.max(np.abs(beta - params[active]), axis=1)
+        params[active] = beta
+
+        history.append(params.copy())
+        history = history[-10:]
+        done = diff <= p_tol
+        if n_iter >= 300 and n_iter % 100 == 0:
+            # Convergence cycles, should not happen
+            cycle = np.zeros(len(active), dtype=bool)
+            for past in history[-9:-1]:
+                cycle |= np.all(past[active] == beta, axis=1)
+            if np.any(cycle):
+                warnings.warn('Convergence cycle detected', ConvergenceWarning)
+            done |= cycle
+
+        keep = ~done
+        active = active[keep]
+        xtx = np.einsum('pnk,pnl->pkl', xstar[keep], X_active[keep])
+        xty = np.einsum('pnk,pn->pk', xstar[keep], y_active[keep])
+
+    if len(active):
+        warnings.warn(f'Maximum number of iterations ({max_iter}) reached.',
+                      IterationLimitWarning)
+
+    params = params.reshape(n_series, n_taus, n_features)
+    if scalar_tau:
+        params = params[:, 0]
+
+    return params if batch else params[0]
+
+class QuantRegFit:
+    """
+    Fitted linear quantile regression of quantreg_fit.
+
+    Drop-in for the predict and fittedvalues of the
+    results of statsmodels QuantReg.
+
+    Parameters
+    ----------
+    params: numpy array
+        Coefficients of the regression.
+    X: numpy array
+        Design matrix.
+    y: numpy array
+        Target.
+    tau: float
+        Quantile of the regression.
+    """
+
+    def __init__(self, params: np.ndarray, X: np.ndarray, y: np.ndarray, tau: float):
+        self.params = params
+        self.exog = X
+        self.endog = y
+        self.q = tau
+
+    @property
+    def fittedvalues(self) -> np.ndarray:
+        return self.exog @ self.params
+
+    @property
+    def resid(self) -> np.ndarray:
+        return self.endog - self.fittedvalues
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(X) @ self.params
+
+def fit_quantiles(X: np.ndarray, y: np.ndarray,
+                  taus: Sequence[float], **kwargs) -> List[QuantRegFit]:
+    """Quantile regressions of every tau on the same design matrix.
+
+    Parameters
+    ----------
+    X: numpy array
+        Design matrix of shape (n_obs, n_features).
+    y: numpy array
+        Target of shape (n_obs,).
+    taus: Sequence[float]
+        Quantiles between (0, 1).
+    kwargs:
+        Arguments of quantreg_fit.
+
+    Returns
+    -------
+    List[QuantRegFit]
+        Fitted regression of each tau.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    params = quantreg_fit(X, y, list(taus), **kwargs)
+
+    return [QuantRegFit(params[i], X, y, tau) for i, tau in enumerate(taus)]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from typing import Callable, Dict, Sequence
+
+import numpy as np
+
+from ._models import Croston, TSB, ADIDA, iMAPA, mean_intervals
+
+# Demand classes of classify_demand
+TRIVIAL_CLASSES = ('zero', 'constant', 'short')
+INTERMITTENT_CLASSES = ('intermittent', 'lumpy')
+CONTINUOUS_CLASSES = ('smooth', 'erratic')
+
+
+def classify_demand(values: np.ndarray, indptr: np.ndarray,
+                    adi_threshold: float = 1.32,
+                    cv2_threshold: float = 0.49,
+                    min_length: int = 10) -> np.ndarray:
+    """Demand class of every series of a panel.
+
+    Series are first checked for trivial cases: all zero ('zero'),
+    constant ('constant') and fewer than min_length observations ('short').
+    The rest are classified as in Syntetos, Boylan and Croston (2005)
+    with the average demand interval (ADI) and the squared coefficient
+    of variation of the non zero demands (CV²):
+    'smooth' (low ADI, low CV²), 'erratic' (low ADI, high CV²),
+    'intermittent' (high ADI, low CV²) and 'lumpy' (high ADI, high CV²).
+
+    Parameters
+    ----------
+    values, indptr: numpy arrays
+        Panel in the values + offsets layout.
+    adi_threshold: float
+        Cut-off of the ADI.
+    cv2_threshold: float
+        Cut-off of the CV².
+    min_length: int
+        Series shorter than min_length are 'short'.
+
+    Returns
+    -------
+    numpy array
+        Demand class of each series.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lengths = np.diff(indptr)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    valid = ~np.isnan(values)
+    demand = valid & (values != 0)
+
+    def segment_sums(weights):
+        return np.bincount(segments, weights=weights, minlength=len(lengths))
+
+    n_demand = segment_sums(demand)
+    sizes = np.where(demand, values, 0.)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = segment_sums(sizes) / n_demand
+        var = segment_sums(np.where(demand, (values - mean[segments]) ** 2, 0.)) / (n_demand - 1)
+        cv2 = np.where(n_demand > 1, var / mean ** 2, 0.)
+    adi = mean_intervals(np.where(valid, values, 0.), indptr)
+
+    first = np.zeros(len(lengths))
+    first[lengths > 0] = values[indptr[:-1][lengths > 0]]
+    constant = segment_sums(valid & (values != first[segments])) == 0
+
+    classes = np.where(adi < adi_threshold,
+                       np.where(cv2 < cv2_threshold, 'smooth', 'erratic'),
+                       np.where(cv2 < cv2_threshold, 'intermittent', 'lumpy')).astype(object)
+    classes[lengths < min_length] = 'short'
+    classes[constant] = 'constant'
+    classes[n_demand == 0] = 'zero'
+
+    return classes
+
+
+class DemandRouter:
+    """
+    Routes each series only to the models suited to its demand.
+
+    Series are classified with classify_demand. Intermittent and
+    lumpy series are fitted only with the intermittent demand
+    models, smooth and erratic series only with the rest of the
+    models and trivial series (all zero, constant or short) with
+    none: every model forecasts them in closed form.
+
+    Parameters
+    ----------
+    adi_threshold: float
+        Cut-off of the average demand interval. See classify_demand.
+    cv2_threshold: float
+        Cut-off of the squared coefficient of variation of the demands.
+    min_length: int
+        Series shorter than min_length use the closed form forecasts.
+    intermittent_models: Sequence[type]
+        Types of the intermittent demand models.
+        Default to Croston, TSB, ADIDA and iMAPA.
+
+    Notes
+    -----
+    [1] Closed form forecasts are 0 for zero series, the value of
+        constant series and the last value (naive) of short series.
+    [2] Models not routed to a series have no forecast for it (NaN).
+    """
+
+    def __init__(self, adi_threshold: float = 1.32,
+                 cv2_threshold: float = 0.49,
+                 min_length: int = 10,
+                 intermittent_models: Sequence[type] = (Croston, TSB, ADIDA, iMAPA)):
+        self.adi_threshold = adi_threshold
+        self.cv2_threshold = cv2_threshold
+        self.min_length = min_length
+        self.intermittent_models = intermittent_models
+
+    def classify(self, values: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+        """Demand class of every series of a panel. See classify_demand."""
+        return classify_demand(values, indptr, self.adi_threshold,
+                               self.cv2_threshold, self.min_length)
+
+    def routes(self, models: Dict[str, Callable],
+               classes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Series fitted by each model.
+
+        Parameters
+        ----------
+        models: Dict[str, Callable]
+            Models to route.
+        classes: numpy array
+            Demand class of each series (output of classify).
+
+        Returns
+        -------
+        Dict[str, numpy array]
+            Boolean mask of the series of each model by model name.
+        """
+        intermittent = np.isin(classes, INTERMITTENT_CLASSES)
+        continuous = np.isin(classes, CONTINUOUS_CLASSES)
+
+        return {model_name: intermittent if isinstance(model, tuple(self.intermittent_models))
+                            else continuous
+                for model_name, model in models.items()}
+
+    def trivial_forecasts(self, values: np.ndarray, indptr: np.ndarray,
+                          classes: np.ndarray, h: int) -> np.ndarray:
+        """Closed form forecasts of shape (n_series, h), NaN for routed series."""
+        trivial = np.isin(classes, TRIVIAL_CLASSES)
+        last = np.full(len(classes), np.nan)
+        # Last value of constant and short series, zero series forecast 0
+        last[trivial] = values[indptr[1:][trivial] - 1]
+        last[classes == 'zero'] = 0.
+
+        return np.repeat(last[:, None], h, axis=1)
@@ -0,0 +1,623 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import json
+import math
+import multiprocessing as mp
+import os
+import queue
+import secrets
+import socket
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from time import monotonic
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Commands of a request
+_QUIT, _FIT_PREDICT, _FIT_PREDICT_FULL = 0, 1, 2
+# Token sent back by each worker when it connects
+_TOKEN_BYTES = 16
+# Information criteria returned by full forecasts
+_IC = ('aic', 'aicc', 'bic')
+
+# Forecast object of a fitted model (mean, prediction intervals,
+# fitted values, residuals and information criteria) as flat vectors
+# padded to max_h steps and max_n observations. Used by the workers
+# and by fit_predict_forecast_full_batch.
+_R_FULL_FORECAST = r"""
+full_forecast <- function(fitted_model, h, level, max_h=h, max_n=NA) {
+    fc <- forecast(fitted_model, h=h, level=level)
+    if (is.na(max_n)) max_n <- length(fc$fitted)
+    pad <- function(x, n) {
+        x <- as.numeric(x)
+        length(x) <- n
+        x
+    }
+    bounds <- function(x) {
+        full <- matrix(NA_real_, max_h, length(level))
+        if (!is.null(x)) {
+            x <- matrix(as.numeric(x), ncol=length(level))
+            rows <- seq_len(min(h, nrow(x)))
+            full[rows, ] <- x[rows, ]
+        }
+        as.numeric(t(full))
+    }
+    ic <- function(name) {
+        value <- tryCatch(fitted_model[[name]], error=function(e) NULL)
+        if (is.null(value)) value <- tryCatch(fitted_model[[toupper(name)]], error=function(e) NULL)
+        if (is.numeric(value) && length(value) == 1) value else NA_real_
+    }
+    list(mean=pad(head(as.numeric(fc$mean), h), max_h),
+         lower=bounds(fc$lower), upper=bounds(fc$upper),
+         fitted=pad(fc$fitted, max_n), residuals=pad(fc$residuals, max_n),
+         ic=c(ic("aic"), ic("aicc"), ic("bic")))
+}
+
+full_forecast_batch <- function(fit, args, ys, freq, hs, level) {
+    n <- length(ys)
+    max_h <- if (n > 0) max(hs) else 0
+    max_n <- if (n > 0) max(lengths(ys)) else 0
+    empty <- list(mean=rep(NA_real_, max_h), lower=rep(NA_real_, max_h * length(level)),
+                  upper=rep(NA_real_, max_h * length(level)), fitted=rep(NA_real_, max_n),
+                  residuals=rep(NA_real_, max_n), ic=rep(NA_real_, 3))
+    errors <- rep("", n)
+    results <- vector("list", n)
+    for (i in seq_len(n)) {
+        env <- new.env(parent=globalenv())
+        env$args <- args
+        env$h <- hs[i]
+        env$level <- level
+        result <- tryCatch({
+            env$y_ts <- msts(ys[[i]], seasonal.periods=freq)
+            full_forecast(eval(fit, env), hs[i], level, max_h, max_n)
+        }, error=function(e) conditionMessage(e))
+        if (is.character(result)) {
+            errors[i] <- paste0("Error: ", result)
+            result <- empty
+        }
+        results[[i]] <- result
+    }
+    columns <- lapply(names(empty), function(name) as.numeric(unlist(lapply(results, `[[`, name))))
+    names(columns) <- names(empty)
+
+    c(columns, list(errors=errors, dims=c(n, max_h, length(level), max_n)))
+}
+"""
+
+# Server loop run by each Rscript process. Frames are little endian:
+#   request: command, then fit expression, arguments expression, freq,
+#            levels (only _FIT_PREDICT_FULL), number of series, lengths,
+#            horizons and the values of every series one after the other.
+#   response: dimensions, float64 arrays (row major padded with NaN) and
+#             the error message of each series. _FIT_PREDICT returns the
+#             forecasts, _FIT_PREDICT_FULL the columns of full_forecast_batch.
+# Strings are sent as their length in bytes (int32) followed by the bytes.
+_SERVER_SCRIPT = _R_FULL_FORECAST + r"""
+cli <- commandArgs(trailingOnly=TRUE)
+for (package in strsplit(cli[3], ",")[[1]]) {
+    suppressMessages(library(package, character.only=TRUE))
+}
+con <- socketConnection(host="127.0.0.1", port=as.integer(cli[1]), open="r+b",
+                        blocking=TRUE, timeout=2147483)
+
+read_int <- function(n=1) readBin(con, "integer", n, size=4, endian="little")
+read_double <- function(n) readBin(con, "double", n, size=8, endian="little")
+read_string <- function() {
+    n <- read_int()
+    if (n == 0) return("")
+    rawToChar(readBin(con, "raw", n))
+}
+write_int <- function(x) writeBin(as.integer(x), con, size=4, endian="little")
+write_double <- function(x) writeBin(as.numeric(x), con, size=8, endian="little")
+write_errors <- function(errors) {
+    errors <- enc2utf8(errors)
+    write_int(nchar(errors, type="bytes"))
+    for (error in errors[nzchar(errors)]) writeBin(charToRaw(error), con)
+}
+
+mean_forecast_batch <- function(fit, args, ys, freq, hs) {
+    n <- length(ys)
+    y_hat <- matrix(NA_real_, nrow=n, ncol=if (n > 0) max(hs) else 0)
+    errors <- rep("", n)
+    for (i in seq_len(n)) {
+        env <- new.env(parent=globalenv())
+        env$args <- args
+        env$h <- hs[i]
+        env$level <- c(80, 95)
+        result <- tryCatch({
+            env$y_ts <- msts(ys[[i]], seasonal.periods=freq)
+            as.numeric(forecast(eval(fit, env), h=hs[i])$mean)
+        }, error=function(e) conditionMessage(e))
+        if (is.character(result)) {
+            errors[i] <- paste0("Error: ", result)
+        } else {
+            y_hat[i, seq_len(hs[i])] <- result[seq_len(hs[i])]
+        }
+    }
+    list(y_hat=y_hat, errors=errors)
+}
+
+writeBin(charToRaw(cli[2]), con)
+flush(con)
+
+repeat {
+    command <- read_int()
+    if (length(command) == 0 || command == 0) break
+
+    fit <- read_string()
+    args_expression <- read_string()
+    freq <- read_double(read_int())
+    if (command == 2) level <- read_double(read_int())
+    n <- read_int()
+    sizes <- read_int(n)
+    hs <- read_int(n)
+    values <- read_double(sum(as.numeric(sizes)))
+    ends <- cumsum(as.numeric(sizes))
+    ys <- lapply(seq_len(n), function(i) values[(ends[i] - sizes[i] + 1):ends[i]])
+
+    # An invalid request makes every series fail with its message
+    parsed <- tryCatch(list(fit=parse(text=fit)[[1]],
+                            args=eval(parse(text=args_expression)[[1]])),
+                       error=function(e) list(fit=call("stop", conditionMessage(e)),
+                                              args=list()))
+
+    if (command == 1) {
+        result <- mean_forecast_batch(parsed$fit, parsed$args, ys, freq, hs)
+        write_int(dim(result$y_hat))
+        write_double(t(result$y_hat))
+    } else {
+        result <- full_forecast_batch(parsed$fit, parsed$args, ys, freq, hs, level)
+        write_int(result$dims)
+        for (name in c("mean", "lower", "upper", "fitted", "residuals", "ic")) {
+            write_double(result[[name]])
+        }
+    }
+    write_errors(result$errors)
+    flush(con)
+}
+close(con)
+"""
+
+_ACTIVE_POOL = None
+# Wall-clock budget in seconds of each series of the batches sent to _ACTIVE_POOL
+_SERIES_TIMEOUT = None
+
+
+class RExpression(str):
+    """Argument of an R model passed as R code instead of a value.
+
+    Ej. STLM(freq, modelfunction=RExpression('stats::ar')).
+    """
+
+def r_literal(value) -> str:
+    """R code of a python value (argument of an R model)."""
+    if isinstance(value, RExpression):
+        return str(value)
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (bool, np.bool_)):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, np.integer)):
+        return '%dL' % value
+    if isinstance(value, (float, np.floating)):
+        if math.isnan(value):
+            return 'NA_real_'
+        if math.isinf(value):
+            return 'Inf' if value > 0 else '-Inf'
+        return repr(float(value))
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, dict):
+        return 'list(%s)' % _r_arguments(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return 'c(%s)' % ', '.join(r_literal(item) for item in value)
+
+    raise TypeError(f'{type(value).__name__} can not be sent to an R worker, '
+                    'use RExpression to pass R code.')
+
+def _r_arguments(kwargs: dict) -> str:
+    return ', '.join('`%s`=%s' % (name, r_literal(value)) for name, value in kwargs.items())
+
+def active_r_pool() -> Optional['RWorkerPool']:
+    """RWorkerPool used by the R models of this process, None if rpy2 is used."""
+    return _ACTIVE_POOL
+
+@contextmanager
+def use_r_pool(pool: Optional['RWorkerPool'],
+               timeout: Optional[float] = None) -> Iterator[None]:
+    """Sends the batches of R models (fit_predict_batch) to pool.
+
+    timeout is the wall-clock budget in seconds of each series,
+    a batch of n series gets n * timeout (capped by the timeout of pool).
+    Does nothing if pool is None.
+    """
+    global _ACTIVE_POOL, _SERIES_TIMEOUT
+
+    if pool is None:
+        yield
+        return
+
+    previous = _ACTIVE_POOL, _SERIES_TIMEOUT
+    _ACTIVE_POOL, _SERIES_TIMEOUT = pool.start(), timeout
+    try:
+        yield
+    finally:
+        _ACTIVE_POOL, _SERIES_TIMEOUT = previous
+
+def _recv_exact(sock: socket.socket, n_bytes: int) -> bytearray:
+    buffer = bytearray(n_bytes)
+    view, received = memoryview(buffer), 0
+    while received < n_bytes:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError('R worker closed the connection')
+        received += n
+
+    return buffer
+
+def forecast_dtype(h: int, n_levels: int, length: int) -> np.dtype:
+    """Structured dtype of the full forecast of a series.
+
+    Fields are mean (h,), lower and upper (h, n_levels) bounds of the
+    prediction intervals, in-sample fitted values and residuals (length,)
+    and the information criteria aic, aicc and bic. Shorter horizons and
+    series are padded with NaNs, missing elements are NaN.
+    """
+    return np.dtype([('mean', np.float64, (h,)),
+                     ('lower', np.float64, (h, n_levels)),
+                     ('upper', np.float64, (h, n_levels)),
+                     ('fitted', np.float64, (length,)),
+                     ('residuals', np.float64, (length,))] +
+                    [(ic, np.float64) for ic in _IC])
+
+def full_forecast_array(dims: Sequence[int], mean: np.ndarray, lower: np.ndarray,
+                        upper: np.ndarray, fitted: np.ndarray, residuals: np.ndarray,
+                        ic: np.ndarray) -> np.ndarray:
+    """Structured array (forecast_dtype) of the flat columns returned by R."""
+    n, h, n_levels, length = (int(dim) for dim in dims)
+    full = np.empty(n, dtype=forecast_dtype(h, n_levels, length))
+    full['mean'] = np.reshape(mean, (n, h))
+    full['lower'] = np.reshape(lower, (n, h, n_levels))
+    full['upper'] = np.reshape(upper, (n, h, n_levels))
+    full['fitted'] = np.reshape(fitted, (n, length))
+    full['residuals'] = np.reshape(residuals, (n, length))
+    for name, values in zip(_IC, np.reshape(ic, (n, len(_IC))).T):
+        full[name] = values
+
+    return full
+
+def _set_row(batch: np.ndarray, i: int, result: np.ndarray) -> None:
+    """Copies the response of a single series into row i of a padded batch."""
+    for name in batch.dtype.names or [None]:
+        column, value = (batch, result) if name is None else (batch[name], result[name])
+        column[(i,) + tuple(slice(0, n) for n in value.shape[1:])] = value[0]
+
+def _encode_string(string: str) -> bytes:
+    data = string.encode('utf-8')
+
+    return np.int32(len(data)).tobytes() + data
+
+def _encode_doubles(values: np.ndarray) -> bytes:
+    return np.int32(len(values)).tobytes() + values.astype('<f8').tobytes()
+
+def _encode_request(command: int, fit_expression: str, kwargs: dict, freq: np.ndarray,
+                    ys: Sequence[np.ndarray], h: np.ndarray,
+                    level: Optional[np.ndarray] = None) -> List[bytes]:
+    lengths = np.array([len(y) for y in ys], dtype='<i4')
+    header = b''.join([np.int32(command).tobytes(),
+                       _encode_string(fit_expression),
+                       _encode_string('list(%s)' % _r_arguments(kwargs)),
+                       _encode_doubles(freq),
+                       b'' if level is None else _encode_doubles(level),
+                       np.int32(len(ys)).tobytes(),
+                       lengths.tobytes(),
+                       h.astype('<i4').tobytes()])
+    values = np.concatenate([np.asarray(y, dtype='<f8') for y in ys]) if len(ys) else np.empty(0)
+
+    return [header, values.tobytes()]
+
+def _recv_ints(sock: socket.socket, n: int) -> np.ndarray:
+    return np.frombuffer(_recv_exact(sock, 4 * n), dtype='<i4').astype(np.int64)
+
+def _recv_doubles(sock: socket.socket, n: int) -> np.ndarray:
+    return np.frombuffer(_recv_exact(sock, 8 * n), dtype='<f8').astype(np.float64)
+
+def _recv_errors(sock: socket.socket, n: int) -> List[Optional[str]]:
+    sizes = _recv_ints(sock, n)
+    data = bytes(_recv_exact(sock, int(sizes.sum())))
+
+    ends = np.cumsum(sizes)
+
+    return [data[end - size:end].decode('utf-8', 'replace') if size else None
+            for size, end in zip(sizes, ends)]
+
+def _decode_response(sock: socket.socket) -> Tuple[np.ndarray, List[Optional[str]]]:
+    n, max_h = _recv_ints(sock, 2)
+    y_hat = _recv_doubles(sock, n * max_h).reshape(n, max_h)
+
+    return y_hat, _recv_errors(sock, n)
+
+def _decode_full_response(sock: socket.socket) -> Tuple[np.ndarray, List[Optional[str]]]:
+    dims = _recv_ints(sock, 4)
+    n, max_h, n_levels, max_n = dims
+    sizes = [max_h, max_h * n_levels, max_h * n_levels, max_n, max_n, len(_IC)]
+    columns = [_recv_doubles(sock, n * size) for size in sizes]
+
+    return full_forecast_array(dims, *columns), _recv_errors(sock, n)
+
+
+class _RWorker:
+    """Rscript process running the server loop and its connection."""
+
+    def __init__(self, process: subprocess.Popen, sock: socket.socket):
+        self.process = process
+        self.sock = sock
+
+    def close(self, timeout: float = 5.) -> None:
+        try:
+            self.sock.sendall(np.int32(_QUIT).tobytes())
+        except OSError:
+            pass
+        self.sock.close()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+    def kill(self) -> None:
+        self.sock.close()
+        self.process.kill()
+        self.process.wait()
+
+
+class RWorkerPool:
+    """
+    Pool of persistent Rscript processes with _forecast_ loaded.
+
+    Batches of series are sent to the workers through local sockets
+    in a binary columnar format (lengths, horizons and the values of
+    all the series as float64) and the forecasts come back as a single
+    matrix, so python processes do not embed R (rpy2). A worker that
+    crashes is restarted and the series of its batch are sent again
+    one by one, so only the series that crash R are lost.
+
+    Parameters
+    ----------
+    n_workers: int
+        Number of Rscript processes. Default to None, number of cores minus 1.
+    rscript: str or Sequence[str]
+        Command that runs an R script. Default to 'Rscript'.
+    packages: Sequence[str]
+        R packages loaded by each worker when it starts.
+    start_timeout: float
+        Seconds to wait for a worker to load its packages and connect.
+    timeout: float
+        Wall-clock budget in seconds of each batch. The worker of a batch
+        that exceeds it is killed and restarted and the series of the batch
+        are sent again one by one, series that exceed it alone are returned
+        as errors. Default to None, no limit.
+        The timeout of use_r_pool (the timeout of BaseModelsTrainer)
+        also limits each batch, the smallest budget is used.
+
+    Notes
+    -----
+    [1] Activate it with use_r_pool (BaseModelsTrainer does it with its r_pool
+        argument): fit_predict_batch of R models is sent to the workers
+        instead of the embedded R of the calling process.
+    [2] Calls are thread safe, each one takes an idle worker, so threads
+        of the calling process keep the workers busy.
+
+    Examples
+    --------
+    with RWorkerPool() as r_pool:
+        BaseModelsTrainer(models, r_pool=r_pool).fit_predict(None, train, test)
+    """
+
+    def __init__(self, n_workers: Optional[int] = None,
+                 rscript: Union[str, Sequence[str]] = 'Rscript',
+                 packages: Sequence[str] = ('forecast',),
+                 start_timeout: float = 60.,
+                 timeout: Optional[float] = None):
+        self.n_workers = max(mp.cpu_count() - 1, 1) if n_workers is None else n_workers
+        self.rscript = rscript
+        self.packages = tuple(packages)
+        self.start_timeout = start_timeout
+        self.timeout = timeout
+        self.idle_ = None
+
+    def start(self) -> 'RWorkerPool':
+        """Starts the workers and waits until all of them are connected."""
+        if self.idle_ is not None:
+            return self
+
+        fd, self.script_ = tempfile.mkstemp(suffix='.R', prefix='fforma_worker_')
+        with os.fdopen(fd, 'w') as file:
+            file.write(_SERVER_SCRIPT)
+
+        self.listener_ = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener_.bind(('127.0.0.1', 0))
+        self.listener_.listen(self.n_workers)
+        self.lock_ = threading.Lock()
+        self.workers_ = []
+        self.idle_ = queue.Queue()
+
+        try:
+            self._add_workers(self.n_workers)
+        except BaseException:
+            self.shutdown()
+            raise
+
+        return self
+
+    def _add_workers(self, n_workers: int) -> None:
+        """Launches n_workers Rscript processes and waits for their connections."""
+        rscript = [self.rscript] if isinstance(self.rscript, str) else list(self.rscript)
+        port = str(self.listener_.getsockname()[1])
+        pending = {}
+        for _ in range(n_workers):
+            token = secrets.token_hex(_TOKEN_BYTES // 2).encode()
+            pending[token] = subprocess.Popen(rscript + [self.script_, port, token.decode(),
+                                                         ','.join(self.packages)],
+                                              stdin=subprocess.DEVNULL,
+                                              stdout=subprocess.DEVNULL)
+
+        # Workers load their packages concurrently, connections
+        # of other processes are rejected by the token
+        deadline = monotonic() + self.start_timeout
+        try:
+            while pending:
+                self.listener_.settimeout(max(deadline - monotonic(), 1e-3))
+                sock, _ = self.listener_.accept()
+                sock.settimeout(self.start_timeout)
+                try:
+                    process = pending.pop(bytes(_recv_exact(sock, _TOKEN_BYTES)), None)
+                except OSError:
+                    process = None
+                if process is None:
+                    sock.close()
+                    continue
+
+                sock.settimeout(self.timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                worker = _RWorker(process, sock)
+                self.workers_.append(worker)
+                self.idle_.put(worker)
+        except OSError as e:
+            for process in pending.values():
+                process.kill()
+                process.wait()
+            raise RuntimeError(f'R workers did not start in {self.start_timeout} seconds, '
+                               'check that rscript and the packages are installed.') from e
+
+    def _replace_worker(self, worker: _RWorker) -> None:
+        worker.kill()
+        # Launches are serialized, the listener is shared
+        with self.lock_:
+            self.workers_.remove(worker)
+            self._add_workers(1)
+
+    def fit_predict(self, fit_expression: str, ys: Sequence[np.ndarray], freq,
+                    h: Sequence[int], **kwargs) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """Fits and forecasts a list of series in one of the workers.
+
+        See fit_predict_forecast_batch, the arguments are the same.
+        """
+        freq = np.atleast_1d(np.asarray(freq, dtype=np.float64))
+
+        def encode(ys, h):
+            return _encode_request(_FIT_PREDICT, fit_expression, kwargs, freq, ys, h)
+
+        def failed(ys, h):
+            return np.full((len(h), h.max(initial=0)), np.nan)
+
+        return self._request(encode, _decode_response, failed, ys, np.asarray(h, dtype=int))
+
+    def fit_predict_full(self, fit_expression: str, ys: Sequence[np.ndarray], freq,
+                         h: Sequence[int], level: Sequence[float],
+                         **kwargs) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """Full forecasts of a list of series in one of the workers.
+
+        See fit_predict_forecast_full_batch, the arguments are the same.
+        """
+        freq = np.atleast_1d(np.asarray(freq, dtype=np.float64))
+        level = np.asarray(level, dtype=np.float64)
+
+        def encode(ys, h):
+            return _encode_request(_FIT_PREDICT_FULL, fit_expression, kwargs, freq, ys, h,
+                                   level)
+
+        def failed(ys, h):
+            full = np.empty(len(h), dtype=forecast_dtype(h.max(initial=0), len(level),
+                                                         max((len(y) for y in ys), default=0)))
+            for name in full.dtype.names:
+                full[name] = np.nan
+
+            return full
+
+        return self._request(encode, _decode_full_response, failed, ys,
+                             np.asarray(h, dtype=int))
+
+    def _request(self, encode: Callable, decode: Callable, failed: Callable,
+                 ys: Sequence[np.ndarray], h: np.ndarray) -> Tuple[np.ndarray,
+                                                                   List[Optional[str]]]:
+        """Sends the request of ys to an idle worker and decodes its response.
+
+        If the worker of a batch of several series crashes or times out,
+        the series are sent again one by one, so only the series that
+        make R hang or crash are returned as errors.
+        """
+        try:
+            return self._send(encode(ys, h), decode, len(ys))
+        except (OSError, ValueError) as e:
+            if len(ys) > 1:
+                return self._request_each(encode, decode, failed, ys, h)
+            reason = 'timeout' if isinstance(e, socket.timeout) else repr(e)
+
+            return failed(ys, h), [f'Error: R worker failed ({reason})'] * len(ys)
+
+    def _request_each(self, encode: Callable, decode: Callable, failed: Callable,
+                      ys: Sequence[np.ndarray], h: np.ndarray) -> Tuple[np.ndarray,
+                                                                        List[Optional[str]]]:
+        """Sends each series of ys in its own request, see _request."""
+        result, errors = failed(ys, h), []
+        for i, y in enumerate(ys):
+            result_i, errors_i = self._request(encode, decode, failed, [y], h[i:i + 1])
+            _set_row(result, i, result_i)
+            errors.extend(errors_i)
+
+        return result, errors
+
+    def _send(self, request: List[bytes], decode: Callable,
+              n_series: int) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """Sends request to an idle worker and decodes its response.
+
+        A worker that fails (crash or timeout) is replaced and the error raised.
+        """
+        self.start()
+        worker = self.idle_.get()
+        try:
+            worker.sock.settimeout(self._batch_timeout(n_series))
+            for frame in request:
+                worker.sock.sendall(frame)
+            result, errors = decode(worker.sock)
+        except (OSError, ValueError):
+            self._replace_worker(worker)
+            raise
+
+        worker.sock.settimeout(self.timeout)
+        self.idle_.put(worker)
+
+        return result, errors
+
+    def _batch_timeout(self, n_series: int) -> Optional[float]:
+        """Timeout of a batch of n_series, see use_r_pool."""
+        if _SERIES_TIMEOUT is None:
+            return self.timeout
+        timeout = _SERIES_TIMEOUT * max(n_series, 1)
+
+        return timeout if self.timeout is None else min(timeout, self.timeout)
+
+    def shutdown(self) -> None:
+        if self.idle_ is None:
+            return
+
+        for worker in self.workers_:
+            worker.close()
+        self.listener_.close()
+        os.remove(self.script_)
+        self.idle_ = None
+
+    def __enter__(self) -> 'RWorkerPool':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+
+    def __getstate__(self):
+        # Processes are not pickled, a copy starts its own workers
+        return {key: value for key, value in self.__dict__.items()
+                if not key.endswith('_')}
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import heapq
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Rough cost in seconds of fitting each model on a
+# series of 100 observations with seasonality 1.
+_PRIOR_COSTS = {
+    'ARIMA': 1.0,
+    'AutoARIMA': 0.2,
+    'TBATS': 2.0,
+    'NNETAR': 1.0,
+    'ETS': 0.3,
+    'STLM': 0.2,
+    'STLMFFORMA': 0.2,
+    'ThetaF': 0.02,
+    'RandomWalk': 0.01,
+    'NaiveR': 0.01,
+    'SeasonalNaiveR': 0.01,
+    'QuantileAutoRegression': 0.05,
+    'MultiQuantileAutoRegression': 0.3,
+    'FQRA': 0.05,
+    'QRAL1': 0.1,
+    'TSB': 0.01,
+    'iMAPA': 0.01,
+    'ADIDA': 0.005,
+    'Croston': 0.005,
+}
+_DEFAULT_PRIOR_COST = 1e-3
+
+
+def get_seasonality(model) -> int:
+    """Seasonality of a model (1 if the model has none)."""
+    freq = getattr(model, 'freq', getattr(model, 'seasonality', None))
+    if freq is None:
+        return 1
+
+    return max(int(np.max(freq)), 1)
+
+def _prior_cost(model) -> float:
+    """Prior cost of a model on a series of 100 observations."""
+    cost = _PRIOR_COSTS.get(type(model).__name__, _DEFAULT_PRIOR_COST)
+    kwargs = getattr(model, 'kwargs', {})
+    # Exhaustive search of auto.arima
+    if not kwargs.get('stepwise', True):
+        cost *= 10
+
+    return cost
+
+
+class TaskCostModel:
+    """
+    Estimates the cost (seconds) of fitting a model on a series.
+
+    For each model name the log cost is modeled as
+        log c = w_0 + w_1 log n + w_2 log s
+    where n is the length of the series and s the seasonality of
+    the model. Weights start at a prior given by the model type and
+    are calibrated with observed timings (ridge regression shrunk
+    towards the prior).
+
+    Parameters
+    ----------
+    prior_strength: float
+        Weight of the prior, in number of observations.
+
+    Notes
+    -----
+    [1] Reusing the same instance across trainers (rolling cutoffs,
+        groups) keeps calibrating it.
+    """
+
+    def __init__(self, prior_strength: float = 10.):
+        self.prior_strength = prior_strength
+        self.xtx_: Dict[str, np.ndarray] = {}
+        self.xty_: Dict[str, np.ndarray] = {}
+
+    def _prior(self, model) -> np.ndarray:
+        return np.array([np.log(_prior_cost(model)) - np.log(100), 1., .5])
+
+    def _weights(self, model_name: str, model) -> np.ndarray:
+        prior = self._prior(model)
+        if model_name not in self.xtx_:
+            return prior
+
+        penalty = self.prior_strength * np.eye(3)
+        xtx = self.xtx_[model_name] + penalty
+        xty = self.xty_[model_name] + penalty @ prior
+
+        return np.linalg.solve(xtx, xty)
+
+    @staticmethod
+    def _design(lengths: np.ndarray, seasonality: int) -> np.ndarray:
+        lengths = np.maximum(np.asarray(lengths, dtype=np.float64), 1)
+        design = np.column_stack([np.ones_like(lengths),
+                                  np.log(lengths),
+                                  np.full_like(lengths, np.log(seasonality))])
+
+        return design
+
+    def estimate(self, model_name: str, model, lengths: np.ndarray) -> np.ndarray:
+        """Estimated cost in seconds of fitting model on series of lengths."""
+        design = self._design(lengths, get_seasonality(model))
+
+        return np.exp(design @ self._weights(model_name, model))
+
+    def update(self, timings: pd.DataFrame,
+               models: Dict[str, Callable]) -> 'TaskCostModel':
+        """Calibrates the cost model with observed timings.
+
+        Parameters
+        ----------
+        timings: pandas df
+            Pandas DataFrame with columns ['model', 'length', 'time'].
+        models: Dict[str, Callable]
+            Models used to obtain timings.
+        """
+        for model_name, timings_model in timings.groupby('model'):
+            design = self._design(timings_model['length'].values,
+                                  get_seasonality(models[model_name]))
+            log_time = np.log(np.maximum(timings_model['time'].values, 1e-6))
+
+            self.xtx_[model_name] = self.xtx_.get(model_name, 0) + design.T @ design
+            self.xty_[model_name] = self.xty_.get(model_name, 0) + design.T @ log_time
+
+        return self
+
+
+def pack_tasks(costs: np.ndarray, n_bins: int) -> np.ndarray:
+    """Longest processing time first bin packing.
+
+    Tasks are sorted by decreasing cost and each one is assigned
+    to the bin with the lowest load so far.
+
+    Parameters
+    ----------
+    costs: numpy array
+        Estimated cost of each task.
+    n_bins: int
+        Number of bins.
+
+    Returns
+    -------
+    numpy array
+        Bin of each task.
+    """
+    bins = np.empty(len(costs), dtype=np.int64)
+    loads = [(0., b) for b in range(n_bins)]
+
+    for task in np.argsort(-costs, kind='stable'):
+        load, b = heapq.heappop(loads)
+        bins[task] = b
+        heapq.heappush(loads, (load + costs[task], b))
+
+    return bins
+
+def schedule_tasks(panel_df: pd.DataFrame,
+                   lengths: pd.Series,
+                   models: Dict[str, Callable],
+                   cost_model: TaskCostModel,
+                   n_bins: int,
+                   tasks: Optional[Dict[str, np.ndarray]] = None) -> list:
+    """Distributes (series, model) tasks in balanced partitions.
+
+    Parameters
+    ----------
+    panel_df: pandas df
+        Wide panel indexed by unique_id.
+    lengths: pandas Series
+        Length of each series indexed by unique_id.
+    models: Dict[str, Callable]
+        Models to fit.
+    cost_model: TaskCostModel
+        Cost model used to estimate the cost of each task.
+    n_bins: int
+        Number of partitions.
+    tasks: Dict[str, numpy array]
+        Positions (in panel_df) of the series to fit by model name.
+        Default to None, every series for every model.
+
+    Returns
+    -------
+    list
+        Partitions of panel_df with the extra column 'models',
+        the names of the models to fit for each series in the partition.
+        Partitions are sorted by decreasing estimated load.
+    """
+    lengths = lengths.reindex(panel_df.index).values
+    n_series = len(panel_df)
+    model_names = list(models.keys())
+    positions = [np.arange(n_series) if tasks is None else tasks[model_name]
+                 for model_name in model_names]
+
+    costs = np.concatenate([cost_model.estimate(model_name, models[model_name], lengths[pos])
+                            for model_name, pos in zip(model_names, positions)])
+    bins = pack_tasks(costs, n_bins)
+
+    tasks = pd.DataFrame({'bin': bins,
+                          'pos': np.concatenate(positions),
+                          'model': np.repeat(model_names, [len(pos) for pos in positions]),
+                          'cost': costs})
+    loads = tasks.groupby('bin')['cost'].sum().sort_values(ascending=False)
+    tasks = tasks.groupby(['bin', 'pos'], sort=True)['model'].agg(tuple)
+
+    parts = []
+    for b in loads.index:
+        tasks_bin = tasks.loc[b]
+        part = panel_df.iloc[tasks_bin.index.values].copy()
+        part['models'] = tasks_bin.values
+        parts.append(part)
+
+    return parts
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+
+def _default_directory() -> Optional[str]:
+    """RAM backed directory if available (Linux)."""
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class SharedPanel:
+    """
+    Panel in the values + offsets layout shared by worker processes.
+
+    The offsets and the values are written once into a single
+    memory-mapped file. Pickling a SharedPanel only sends the path
+    of the file, each worker maps it read-only, so series are never
+    serialized nor copied between processes.
+
+    Parameters
+    ----------
+    values: numpy array
+        Concatenated values of the series.
+    indptr: numpy array
+        Offsets of each series in values.
+    directory: str
+        Directory of the file. Default to None, /dev/shm if
+        available, otherwise the temporary directory.
+
+    Examples
+    --------
+    with SharedPanel(values, indptr) as panel:
+        y = panel.series(0)
+    """
+
+    def __init__(self, values: np.ndarray, indptr: np.ndarray,
+                 directory: Optional[str] = None):
+        directory = _default_directory() if directory is None else directory
+        fd, self.path = tempfile.mkstemp(prefix='fforma-panel-', suffix='.bin',
+                                         dir=directory)
+        os.close(fd)
+
+        self.n_series = len(indptr) - 1
+        self.n_values = len(values)
+        self._owner = True
+
+        buffer = np.memmap(self.path, dtype=np.float64, mode='w+',
+                           shape=(self.n_series + 1 + self.n_values,))
+        buffer[:self.n_series + 1] = indptr
+        buffer[self.n_series + 1:] = values
+        buffer.flush()
+        del buffer
+
+        self._attach()
+
+    def _attach(self) -> None:
+        buffer = np.memmap(self.path, dtype=np.float64, mode='r',
+                           shape=(self.n_series + 1 + self.n_values,))
+        self.indptr = buffer[:self.n_series + 1].astype(np.int64)
+        self.values = buffer[self.n_series + 1:]
+
+    def __len__(self) -> int:
+        return self.n_series
+
+    def series(self, pos: int) -> np.ndarray:
+        """Read-only view of the series in position pos."""
+        return self.values[self.indptr[pos]:self.indptr[pos + 1]]
+
+    def close(self) -> None:
+        """Removes the file, only the process that created it does it."""
+        if self._owner and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self) -> 'SharedPanel':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __getstate__(self):
+        return {'path': self.path, 'n_series': self.n_series,
+                'n_values': self.n_values}
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._owner = False
+        self._attach()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class FittedModels:
+    """Fitted models of a panel.
+
+    Models with a panel predictor keep their learned parameters
+    (last values, drifts, seasonal indices, smoothing levels, ...)
+    in typed numpy arrays whose first axis indexes the series.
+    The rest of the models (R models, regressions, ...) are kept
+    as object arrays of fitted estimators.
+
+    Parameters
+    ----------
+    uids: pandas Index
+        unique_id of each series. Position i of every
+        array corresponds to uids[i].
+    states: Dict[str, Dict[str, numpy array]]
+        Learned parameters by model name.
+    objects: Dict[str, numpy array]
+        Object arrays of fitted estimators by model name.
+
+    Notes
+    -----
+    [1] When pickled, the arrays in states are packed into
+        one contiguous buffer per dtype.
+    """
+
+    def __init__(self, uids: pd.Index,
+                 states: Optional[Dict[str, Dict[str, np.ndarray]]] = None,
+                 objects: Optional[Dict[str, np.ndarray]] = None):
+        self.uids = pd.Index(uids, name='unique_id')
+        self.states = {} if states is None else states
+        self.objects = {} if objects is None else objects
+
+    @classmethod
+    def from_lists(cls, uids: Sequence,
+                   states: Dict[str, List[Dict]],
+                   objects: Dict[str, List]) -> 'FittedModels':
+        """Builds the store from per series states and estimators."""
+        stacked_states = {}
+        for model_name, model_states in states.items():
+            keys = model_states[0].keys() if model_states else []
+            stacked_states[model_name] = {key: np.stack([state[key] for state in model_states])
+                                          for key in keys}
+
+        object_arrays = {}
+        for model_name, fitted_models in objects.items():
+            object_arrays[model_name] = np.empty(len(fitted_models), dtype=object)
+            object_arrays[model_name][:] = fitted_models
+
+        return cls(uids, stacked_states, object_arrays)
+
+    @property
+    def models(self) -> List[str]:
+        return list(self.states) + list(self.objects)
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    def add_state(self, model_name: str, state: Dict[str, np.ndarray]) -> None:
+        """Adds the learned parameters of a model fitted on the whole panel."""
+        assert all(len(value) == len(self) for value in state.values()), \
+            f'State of {model_name} does not match the number of series'
+        self.states[model_name] = state
+
+    def to_frame(self) -> pd.DataFrame:
+        """Fitted estimators as a DataFrame indexed by unique_id."""
+        return pd.DataFrame(self.objects, index=self.uids)
+
+    def __getstate__(self) -> Dict:
+        layout, buffers = [], {}
+        for model_name, state in self.states.items():
+            for key, value in state.items():
+                value = np.asarray(value)
+                dtype = value.dtype.str
+                chunks = buffers.setdefault(dtype, [])
+                offset = sum(chunk.size for chunk in chunks)
+                chunks.append(value.ravel())
+                layout.append((model_name, key, dtype, value.shape, offset))
+
+        buffers = {dtype: np.concatenate(chunks) for dtype, chunks in buffers.items()}
+
+        return {'uids': self.uids, 'layout': layout,
+                'buffers': buffers, 'objects': self.objects}
+
+    def __setstate__(self, packed: Dict) -> None:
+        self.uids = packed['uids']
+        self.objects = packed['objects']
+        self.states = {}
+        for model_name, key, dtype, shape, offset in packed['layout']:
+            size = int(np.prod(shape))
+            value = packed['buffers'][dtype][offset:offset + size].reshape(shape)
+            self.states.setdefault(model_name, {})[key] = value
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Bounds of alpha in forecast::ets ("usual" bounds)
+_ALPHA_BOUNDS = (1e-4, 0.9999)
+# qnorm(0.95)
+_Z_95 = 1.6448536269514722
+_GOLDEN = (np.sqrt(5) - 1) / 2
+
+
+def _padded(values: np.ndarray, indptr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Series as rows of a left aligned array padded with NaNs and its mask."""
+    lengths = np.diff(indptr)
+    mask = np.arange(lengths.max(initial=0)) < lengths[:, None]
+    y = np.full(mask.shape, np.nan)
+    y[mask] = values
+
+    return y, mask
+
+def _acf(y: np.ndarray, mask: np.ndarray, max_lag: int) -> np.ndarray:
+    """Autocorrelations (lags 1, ..., max_lag) of each row, as stats::acf."""
+    lengths = mask.sum(1)
+    dev = np.where(mask, y - np.nanmean(y, axis=1, keepdims=True), 0.)
+    denom = (dev ** 2).sum(1)
+    acf = np.empty((len(y), max_lag))
+    for k in range(1, max_lag + 1):
+        acf[:, k - 1] = (dev[:, k:] * dev[:, :-k]).sum(1) / denom
+    acf[lengths <= max_lag] = np.nan
+
+    return acf
+
+def _seasonal_figure(y: np.ndarray, m: int, multiplicative: bool = True) -> np.ndarray:
+    """Seasonal indices of stats::decompose.
+
+    Rows must have at least 2 * m observations.
+    """
+    if m % 2:
+        weights = np.full(m, 1 / m)
+    else:
+        weights = np.r_[.5, np.ones(m - 1), .5] / m
+    half = len(weights) // 2
+
+    # Windows by fancy indexing (sliding_window_view needs numpy >= 1.20)
+    windows = np.arange(y.shape[1] - len(weights) + 1)[:, None] + np.arange(len(weights))
+    trend = np.full(y.shape, np.nan)
+    trend[:, half:y.shape[1] - half] = y[:, windows] @ weights
+    season = y / trend if multiplicative else y - trend
+
+    figure = np.empty((len(y), m))
+    for i in range(m):
+        figure[:, i] = np.nanmean(season[:, i::m], axis=1)
+
+    if multiplicative:
+        return figure / figure.mean(1, keepdims=True)
+
+    return figure - figure.mean(1, keepdims=True)
+
+def _ses_stats(y: np.ndarray, mask: np.ndarray,
+               alpha: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """SSE and last level of simple exponential smoothing.
+
+    For each alpha the initial level minimizing the SSE is found
+    in closed form: the errors are linear in the initial level.
+    alpha has shape (n_series,) or (n_series, n_alphas).
+    """
+    beta = 1 - alpha
+    expand = (slice(None),) + (None,) * (alpha.ndim - 1)
+    level = np.zeros_like(alpha)
+    weight = np.ones_like(alpha)
+    s_aa, s_aw, s_ww = np.zeros_like(alpha), np.zeros_like(alpha), np.zeros_like(alpha)
+
+    for t in range(y.shape[1]):
+        valid = mask[:, t][expand]
+        error = np.where(valid, y[:, t][expand] - level, 0.)
+        s_aa += error * error
+        s_aw += error * weight
+        s_ww += np.where(valid, weight * weight, 0.)
+        level = np.where(valid, level + alpha * error, level)
+        weight = np.where(valid, weight * beta, weight)
+
+    l0 = s_aw / s_ww
+    sse = np.maximum(s_aa - s_aw * l0, 0.)
+
+    return sse, level + weight * l0
+
+def ses_optimal(y: np.ndarray, mask: np.ndarray,
+                n_grid: int = 50, n_iter: int = 30) -> Tuple[np.ndarray, np.ndarray]:
+    """Simple exponential smoothing minimizing the mean squared error.
+
+    Equivalent to forecast::ses (ets model 'ANN', opt.crit='mse')
+    up to the optimizer: alpha is searched on a grid and refined
+    by golden section search.
+
+    Parameters
+    ----------
+    y: numpy array
+        Series as rows padded with NaNs.
+    mask: numpy array
+        Valid observations of y.
+
+    Returns
+    -------
+    alpha: numpy array
+        Smoothing parameter of each series.
+    level: numpy array
+        Last level, the point forecast of each series.
+    """
+    # SES is translation equivariant, centering improves the precision of the SSE
+    center = np.nanmean(y, axis=1, keepdims=True)
+    y = np.where(mask, y - center, 0.)
+
+    low, high = _ALPHA_BOUNDS
+    grid = np.linspace(low, high, n_grid)
+    sse, _ = _ses_stats(y, mask, np.tile(grid, (len(y), 1)))
+    best = np.argmin(sse, axis=1)
+    step = grid[1] - grid[0]
+    a = np.maximum(grid[best] - step, low)
+    b = np.minimum(grid[best] + step, high)
+
+    c = b - _GOLDEN * (b - a)
+    d = a + _GOLDEN * (b - a)
+    sse_c, _ = _ses_stats(y, mask, c)
+    sse_d, _ = _ses_stats(y, mask, d)
+    for _ in range(n_iter):
+        left = sse_c < sse_d
+        b = np.where(left, d, b)
+        a = np.where(left, a, c)
+        # One of the inner points is reused, the other one is evaluated
+        c, d = (np.where(left, b - _GOLDEN * (b - a), d),
+                np.where(left, c, a + _GOLDEN * (b - a)))
+        sse_new, _ = _ses_stats(y, mask, np.where(left, c, d))
+        sse_c, sse_d = np.where(left, sse_new, sse_d), np.where(left, sse_c, sse_new)
+
+    alpha = (a + b) / 2
+    _, level = _ses_stats(y, mask, alpha)
+
+    return alpha, level + center[:, 0]
+
+def _slopes(y: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Slope of the least squares line of each row against 0, ..., n - 1."""
+    lengths = mask.sum(1)
+    t = np.arange(y.shape[1], dtype=np.float64)
+    t_dev = np.where(mask, t - (lengths[:, None] - 1) / 2, 0.)
+    y_dev = np.where(mask, y - np.nanmean(y, axis=1, keepdims=True), 0.)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slopes = (t_dev * y_dev).sum(1) / (t_dev ** 2).sum(1)
+
+    return np.where(lengths > 1, slopes, 0.)
+
+def theta_fit(values: np.ndarray, indptr: np.ndarray, m: int) -> Dict[str, np.ndarray]:
+    """Theta method of forecast::thetaf for every series of a panel.
+
+    Parameters
+    ----------
+    values, indptr: numpy arrays
+        Panel in the values + offsets layout.
+    m: int
+        Frequency of the series.
+
+    Returns
+    -------
+    Dict[str, numpy array]
+        level, alpha and drift of the theta line, length of
+        each series and multiplicative seasonal indices (season)
+        of the next m steps.
+    """
+    y, mask = _padded(values, indptr)
+    lengths = mask.sum(1)
+    n_series = len(lengths)
+
+    season = np.ones((n_series, m))
+    seasonal = np.zeros(n_series, dtype=bool)
+    if m > 1:
+        constant = np.nanmax(y, axis=1) == np.nanmin(y, axis=1)
+        eligible, = np.where(~constant & (lengths > 2 * m))
+        if len(eligible):
+            r = _acf(y[eligible], mask[eligible], m)
+            stat = np.sqrt((1 + 2 * (r[:, :-1] ** 2).sum(1)) / lengths[eligible])
+            tested = eligible[np.abs(r[:, -1]) / stat > _Z_95]
+            figure = _seasonal_figure(y[tested], m)
+            # Seasonal indexes equal to zero use the non seasonal method
+            valid = ~np.any(np.abs(figure) < 1e-10, axis=1)
+            tested, figure = tested[valid], figure[valid]
+            seasonal[tested] = True
+            # Seasonal component of the next m steps (tail of decompose$seasonal)
+            steps = (lengths[tested, None] + np.arange(m) - m) % m
+            season[tested] = np.take_along_axis(figure, steps, axis=1)
+            # Seasonally adjusted series
+            positions = np.arange(y.shape[1]) % m
+            y[tested] = y[tested] / figure[:, positions]
+
+    alpha, level = ses_optimal(y, mask)
+    drift = _slopes(y, mask) / 2
+
+    return {'level': level, 'alpha': alpha, 'drift': drift,
+            'length': lengths, 'season': season}
+
+def theta_predict(state: Dict[str, np.ndarray], h: int) -> np.ndarray:
+    """Forecasts of theta_fit of shape (n_series, h)."""
+    alpha = np.maximum(1e-10, state['alpha'])[:, None]
+    offset = (1 - (1 - alpha) ** state['length'][:, None]) / alpha
+    y_hat = state['level'][:, None] + state['drift'][:, None] * (np.arange(h) + offset)
+
+    m = state['season'].shape[1]
+
+    return y_hat * state['season'][:, np.arange(h) % m]
@@ -5,16 +5,28 @@ import sys
 from copy import deepcopy
 from functools import partial
 from math import ceil
-from typing import Callable, Dict, List
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-import dask.dataframe as dd
 import numpy as np
 import pandas as pd
 from dask import delayed, compute
 from multiprocessing import cpu_count
 from sklearn.utils.validation import check_is_fitted
 
-from fforma.utils.reshaping import long_to_wide, train_to_horizontal, wide_to_long
+from fforma.base._cache import ForecastCache, model_key, series_keys
+from fforma.base._isolation import run_isolated
+from fforma.base._pool import WorkerPool
+from fforma.base._rworker import RWorkerPool, active_r_pool, use_r_pool
+from fforma.base._panel import (append_panel, fit_panel, get_panel_state,
+                                has_panel_engine, has_panel_state, has_panel_update,
+                                predict_panel, take_panel, update_panel)
+from fforma.base._routing import DemandRouter
+from fforma.base._scheduling import TaskCostModel, schedule_tasks
+from fforma.base._shared import SharedPanel
+from fforma.base._store import FittedModels
+from fforma.utils.reshaping import long_to_panel, long_to_wide, wide_to_long
+from fforma.utils.streaming import iter_series_chunks
 
 
 class BaseModelsTrainer:
@@ -28,22 +40,105 @@ class BaseModelsTrainer:
     scheduler: str
         Dask scheduler. See https://docs.dask.org/en/latest/setup/single-machine.html
         for details.
-        Using "threads" can cause severe conflicts.
+        Using "threads" can cause severe conflicts with the embedded R
+        (rpy2), use it only with r_pool.
     predict_scheduler: str
         Dask scheduler for prediction task.
     partitions: int
         Number of partitions to be used in parallel processing.
         Default to None, number of cores minus 1.
+    cost_model: TaskCostModel
+        Estimates the cost of each (series, model) task to balance
+        the partitions (longest processing time first). It is calibrated
+        with the timings of each fit, pass the same instance to several
+        trainers to reuse it. Default to None, a new TaskCostModel.
+    timeout: float
+        Wall-clock budget in seconds of each (series, model) task.
+        Tasks of models without typed parameters (R models, regressions)
+        run in a forked process, so a hang or a crash only loses that task.
+        Default to None, no limit and no isolation.
+    fallback: BaseEstimator or Dict[str, BaseEstimator]
+        Cheap model (Naive2, SeasonalNaive, ...) used instead of a model
+        that times out or fails for a series, can be given by model name.
+        Substitutions are recorded in fallbacks_.
+        Default to None, failures raise an exception.
+    pool: WorkerPool
+        Warmed up pool of processes used instead of scheduler and
+        predict_scheduler. Pass the same pool to several trainers
+        to avoid starting processes on each call.
+        Default to None, dask schedulers.
+    cache: ForecastCache
+        On-disk cache of the forecasts of fit_predict. Forecasts of
+        (series, model) pairs already stored are read back instead of
+        computed, so an interrupted run resumes from the stored ones.
+        The number of forecasts read back is kept in cache_hits_.
+        Default to None, no cache.
+    r_pool: RWorkerPool
+        Pool of Rscript processes that forecast the batches of R models
+        in fit_predict. Partitions of R models then run in threads of
+        the calling process and only wait for the workers, R is not
+        embedded in python. The rest of the models still use scheduler
+        and pool.
+        Default to None, R runs inside the python workers (rpy2).
+    router: DemandRouter
+        Classifies the series by demand in fit_predict and fits
+        each model only on the series routed to it: intermittent
+        series to the intermittent demand models, smooth series to
+        the rest and trivial series (all zero, constant, short) to
+        none, every model forecasts them in closed form. Forecasts of
+        models not routed to a series are NaN. The class of each series
+        is kept in demand_classes_.
+        Default to None, every model fits every series.
+
+    Notes
+    -----
+    [1] Models with a panel engine (Naive, SeasonalNaive, Naive2, ADIDA,
+        iMAPA, RandomWalkDrift, Average, MovingAverage, SeasonalMovingAverage) are fitted and
+        forecasted for all the series in a single vectorized call, they
+        do not go through the parallel per series loop.
+    [2] Fitted models are kept in a FittedModels store (fitted_models_).
+        Models with typed parameters (panel engines, Naive2, Croston,
+        TSB, ADIDA and iMAPA) are forecasted for the whole panel at once.
+    [3] Series are written once to a SharedPanel (memory-mapped values
+        and offsets), partitions only receive the positions of their
+        series and read them without copies.
+    [4] update adds new observations to a fitted trainer. Panel engines
+        are updated in O(new observations), ETS and ARIMA reuse the
+        fitted model (model= argument of _forecast_) and the rest of
+        the models are fitted again only on series with new observations.
+    [5] Models with a fit_predict_batch method (R models) forecast all the
+        series of a partition in a single call in fit_predict, without
+        timeout or with r_pool. With r_pool the call is sent to an Rscript
+        worker with a budget of timeout seconds per series of the call.
+        If R crashes or times out, the series of the call are sent again
+        one by one and only the series that fail alone use the fallback.
+    [6] Models with several outputs (output_names attribute, for example
+        MultiQuantileAutoRegression) have a column '{model_name}_{output_name}'
+        for each output. Their fallback forecasts every output.
     """
 
     def __init__(self, models: Dict[str, Callable],
                  scheduler: str = 'processes',
                  predict_scheduler: str = 'processes',
-                 partitions: int = None):
+                 partitions: int = None,
+                 cost_model: Optional[TaskCostModel] = None,
+                 timeout: Optional[float] = None,
+                 fallback: Optional[Union[Callable, Dict[str, Callable]]] = None,
+                 pool: Optional[WorkerPool] = None,
+                 cache: Optional[ForecastCache] = None,
+                 r_pool: Optional[RWorkerPool] = None,
+                 router: Optional[DemandRouter] = None):
         self.models = models
         self.scheduler = scheduler
         self.predict_scheduler = predict_scheduler
         self.partitions = cpu_count() - 1 if partitions is None else partitions
+        self.cost_model = TaskCostModel() if cost_model is None else cost_model
+        self.timeout = timeout
+        self.fallback = fallback
+        self.pool = pool
+        self.cache = cache
+        self.r_pool = r_pool
+        self.router = router
 
     def fit(self, X: pd.DataFrame, y: pd.DataFrame) -> 'BaseModelsTrainer':
         """For each time series fit each model in models.
@@ -56,8 +151,210 @@ class BaseModelsTrainer:
             Pandas DataFrame with columns ['unique_id', 'ds', 'y'].
 
         """
-        self.fitted_models_ = _fit(X, y, self.models,
-                                   self.partitions, self.scheduler)
+        panel_models, models = _split_panel_models(self.models)
+        uids, values, indptr = long_to_panel(y)
+
+        results, timings, fallbacks = _fit(X, uids, values, indptr, models,
+                                           self.partitions, self.scheduler,
+                                           self.cost_model, self.timeout,
+                                           self.fallback, self.pool)
+
+        fitted_models = _collect_fitted_models(uids, models, results)
+        for model_name, model in panel_models.items():
+            fitted_models.add_state(model_name, fit_panel(model, values, indptr))
+
+        self.fitted_models_ = fitted_models
+        self.values_, self.indptr_ = values, indptr
+        self.timings_ = timings
+        self.fallbacks_ = fallbacks
+        self.cost_model.update(timings, models)
+
+        return self
+
+    def update(self, y: pd.DataFrame) -> 'BaseModelsTrainer':
+        """Updates the fitted models with new observations.
+
+        Parameters
+        ----------
+        y: pandas df
+            Pandas DataFrame with columns ['unique_id', 'ds', 'y'],
+            new observations (after the ones used in fit) of series
+            already fitted. Series can have no new observations.
+
+        Notes
+        -----
+        [1] Models with exogenous variables are not supported.
+        """
+        check_is_fitted(self, 'fitted_models_')
+
+        panel_models, models = _split_panel_models(self.models)
+        uids = self.fitted_models_.uids
+        new_uids, new_values, new_indptr = long_to_panel(y)
+
+        pos = uids.get_indexer(new_uids)
+        if np.any(pos < 0):
+            raise ValueError('update only supports series already fitted')
+        # uids and new_uids are sorted, so new_values are already in the order of uids
+        new_lengths = np.zeros(len(uids), dtype=np.int64)
+        new_lengths[pos] = np.diff(new_indptr)
+        new_indptr = np.zeros(len(uids) + 1, dtype=np.int64)
+        np.cumsum(new_lengths, out=new_indptr[1:])
+
+        values, indptr = append_panel(self.values_, self.indptr_, new_values, new_indptr)
+
+        results, timings, fallbacks = _update(self.fitted_models_, new_lengths > 0,
+                                              values, indptr, models,
+                                              self.partitions, self.scheduler,
+                                              self.cost_model, self.timeout,
+                                              self.fallback, self.pool)
+
+        fitted_models = _collect_fitted_models(uids, models, results)
+        for model_name, model in panel_models.items():
+            if has_panel_update(model):
+                state = update_panel(model, self.fitted_models_.states[model_name],
+                                     new_values, new_indptr)
+            else:
+                state = fit_panel(model, values, indptr)
+            fitted_models.add_state(model_name, state)
+
+        self.fitted_models_ = fitted_models
+        self.values_, self.indptr_ = values, indptr
+        self.timings_ = timings
+        self.fallbacks_ = fallbacks
+        self.cost_model.update(timings, models)
+
+        return self
+
+    def fit_predict(self, X: pd.DataFrame, y: pd.DataFrame,
+                    h: Union[int, pd.DataFrame]) -> pd.DataFrame:
+        """For each time series fit and predict each model in models.
+
+        Each partition fits, forecasts and discards its models, so
+        fitted models are never sent back to the main process nor
+        stored (fitted_models_ is not set).
+
+        Parameters
+        ----------
+        X: pandas df
+            Pandas DataFrame with columns ['unique_id', 'ds'] and exogenous vars.
+        y: pandas df
+            Pandas DataFrame with columns ['unique_id', 'ds', 'y'].
+        h: int or pandas df
+            Forecast horizon. Either an int, in that case ds of the
+            forecasts is the step (1, ..., h), or a Pandas DataFrame
+            with columns ['unique_id', 'ds'] and exogenous vars to predict
+            (same as X in predict).
+        """
+        panel_models, models = _split_panel_models(self.models)
+        forecasts = _forecasts_frame(y, h)
+        max_h = forecasts.groupby('unique_id', sort=False).size().max() if len(forecasts) else 0
+
+        uids, values, indptr = long_to_panel(y)
+        routes = None
+        if self.router is not None:
+            classes = self.router.classify(values, indptr)
+            routes = self.router.routes(self.models, classes)
+            self.demand_classes_ = pd.Series(classes, index=uids, name='demand_class')
+
+        for model_name, model in panel_models.items():
+            model_uids, model_values, model_indptr = uids, values, indptr
+            if routes is not None:
+                pos, = np.where(routes[model_name])
+                model_uids = uids[pos]
+                model_values, model_indptr = take_panel(values, indptr, pos)
+            y_hats = {model_name: np.empty((0, max_h))}
+            if len(model_uids):
+                state = fit_panel(model, model_values, model_indptr)
+                y_hats = {model_name: predict_panel(model, state, max_h)}
+            forecasts = _assign_forecasts(forecasts, model_uids, y_hats)
+
+        # With r_pool, R runs in the Rscript workers and the partitions
+        # of R models only wait for them, so they run in threads
+        r_models = {} if self.r_pool is None else \
+                   {model_name: model for model_name, model in models.items()
+                    if hasattr(model, 'fit_predict_batch')}
+        py_models = {model_name: model for model_name, model in models.items()
+                     if model_name not in r_models}
+        runs = [_fit_predict(X, uids, values, indptr, h, py_models, self.partitions,
+                             self.scheduler, self.cost_model, self.timeout,
+                             self.fallback, self.pool, self.cache, routes)]
+        if r_models:
+            with use_r_pool(self.r_pool, self.timeout):
+                runs.append(_fit_predict(X, uids, values, indptr, h, r_models, self.partitions,
+                                         'threads', self.cost_model, self.timeout,
+                                         self.fallback, None, self.cache, routes))
+        results = {model_name: result for run in runs for model_name, result in run[0].items()}
+        timings = pd.concat([run[1] for run in runs])
+        fallbacks = pd.concat([run[2] for run in runs])
+        n_cached = sum(run[3] for run in runs)
+        for model_name, (model_uids, y_hats) in results.items():
+            columns = _model_columns(model_name, models[model_name])
+            y_hats = _pad_forecasts(y_hats, max_h, len(columns))
+            y_hats = {column: y_hats[:, :, i] for i, column in enumerate(columns)}
+            forecasts = _assign_forecasts(forecasts, pd.Index(model_uids), y_hats)
+
+        if self.router is not None:
+            trivial = self.router.trivial_forecasts(values, indptr, classes, max_h)
+            forecasts = _assign_trivial_forecasts(forecasts, uids, trivial,
+                                                  _forecast_columns(self.models))
+
+        forecasts = forecasts[['unique_id', 'ds'] + _forecast_columns(self.models)]
+
+        self.timings_ = timings
+        self.fallbacks_ = fallbacks
+        self.cache_hits_ = n_cached
+        self.cost_model.update(timings, models)
+
+        return forecasts
+
+    def fit_predict_stream(self, y: Union[pd.DataFrame, str, Iterable[pd.DataFrame]],
+                           h: Union[int, pd.DataFrame],
+                           sink: Callable[[pd.DataFrame], None],
+                           chunk_size: int = 10_000,
+                           **read_kwargs) -> 'BaseModelsTrainer':
+        """Fits and predicts each model for chunks of series.
+
+        Forecasts of each chunk are written to sink and discarded,
+        so peak memory is set by chunk_size and not by the size of
+        the panel.
+
+        Parameters
+        ----------
+        y: pandas df, str or iterable of pandas df
+            Pandas DataFrame with columns ['unique_id', 'ds', 'y'],
+            path of a csv file or iterable of DataFrames with rows
+            grouped by unique_id. See iter_series_chunks.
+        h: int or pandas df
+            Forecast horizon. See fit_predict.
+        sink: Callable
+            Function called with the forecasts of each chunk,
+            for example a CSVSink.
+        chunk_size: int
+            Number of series of each chunk.
+        read_kwargs:
+            Arguments of pd.read_csv if y is a path.
+
+        Notes
+        -----
+        [1] Models with exogenous variables are not supported.
+        [2] fallbacks_ gathers the fallbacks of every chunk, timings_
+            only keeps the last chunk (the cost model is calibrated
+            with every chunk).
+        """
+        if isinstance(h, pd.DataFrame):
+            h = h.set_index('unique_id')
+
+        fallbacks = []
+        for y_chunk in iter_series_chunks(y, chunk_size, **read_kwargs):
+            h_chunk = h
+            if isinstance(h, pd.DataFrame):
+                uids = y_chunk['unique_id'].unique()
+                h_chunk = h.loc[h.index.intersection(uids)].reset_index()
+
+            sink(self.fit_predict(None, y_chunk, h_chunk))
+            fallbacks.append(self.fallbacks_)
+
+        self.fallbacks_ = pd.concat(fallbacks) if fallbacks else _empty_fallbacks()
 
         return self
 
@@ -69,60 +366,570 @@ class BaseModelsTrainer:
         """
         check_is_fitted(self, 'fitted_models_')
 
-        forecasts = _predict(X, self.models, self.fitted_models_,
-                             self.partitions, self.predict_scheduler)
+        state_models = {model_name: model for model_name, model in self.models.items()
+                        if model_name in self.fitted_models_.states}
+        models = {model_name: model for model_name, model in self.models.items()
+                  if model_name not in state_models}
+
+        forecasts = _predict(X, models, self.fitted_models_.to_frame(),
+                             self.partitions, self.predict_scheduler, self.pool)
+        forecasts = _predict_panel(forecasts, state_models, self.fitted_models_)
+
+        columns = _forecast_columns(self.models)
+        cols = [col for col in forecasts.columns if col not in columns]
+        forecasts = forecasts[cols + columns]
 
         return forecasts
 
-def _fit(X: pd.DataFrame,
-         y: pd.DataFrame,
-         models: Dict[str, Callable],
-         partitions: int,
-         scheduler: str) -> 'BaseModelsTrainer':
-    """Auxiliar function to handle parallel processing."""
-    if X is None:
-        y_panel_df = long_to_wide(y)
+def _model_columns(model_name: str, model: Callable) -> List[str]:
+    """Forecast columns of a model.
+
+    Models with several outputs (output_names attribute, predict
+    returns an array of shape (h, n_outputs)) have a column
+    '{model_name}_{output_name}' for each output.
+    """
+    output_names = getattr(model, 'output_names', None)
+    if output_names is None:
+        return [model_name]
+
+    return [f'{model_name}_{output_name}' for output_name in output_names]
+
+def _forecast_columns(models: Dict[str, Callable]) -> List[str]:
+    """Forecast columns of every model, in the order of models."""
+    return [column for model_name, model in models.items()
+            for column in _model_columns(model_name, model)]
+
+def _split_panel_models(models: Dict[str, Callable]) -> Tuple[Dict[str, Callable],
+                                                              Dict[str, Callable]]:
+    """Splits models in models with a panel engine and the rest."""
+    panel_models = {name: model for name, model in models.items()
+                    if has_panel_engine(model)}
+    models = {name: model for name, model in models.items()
+              if name not in panel_models}
+
+    return panel_models, models
+
+def _predict_panel(forecasts: pd.DataFrame,
+                   models: Dict[str, Callable],
+                   fitted_models: FittedModels) -> pd.DataFrame:
+    """Adds the forecasts of models stored as typed parameters to forecasts.
+
+    forecasts must be sorted by ds within each unique_id.
+    """
+    h = forecasts.groupby('unique_id', sort=False).size().max() if len(forecasts) else 0
+    y_hats = {model_name: predict_panel(model, fitted_models.states[model_name], h)
+              for model_name, model in models.items()}
+
+    return _assign_forecasts(forecasts, fitted_models.uids, y_hats)
+
+def _assign_forecasts(forecasts: pd.DataFrame,
+                      uids: pd.Index,
+                      y_hats: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Adds forecasts of shape (n_series, h) to the long forecasts frame.
+
+    Row i of each array belongs to uids[i]. forecasts must be
+    sorted by ds within each unique_id.
+    """
+    pos = uids.get_indexer(forecasts['unique_id'])
+    step = forecasts.groupby('unique_id', sort=False).cumcount().values
+
+    for model_name, y_hat in y_hats.items():
+        if not len(uids):
+            forecasts[model_name] = np.nan
+            continue
+        forecasts[model_name] = np.where(pos >= 0, y_hat[pos, step], np.nan)
+
+    return forecasts
+
+def _assign_trivial_forecasts(forecasts: pd.DataFrame,
+                              uids: pd.Index,
+                              y_hat: np.ndarray,
+                              model_names: List[str]) -> pd.DataFrame:
+    """Sets the closed form forecasts of shape (n_series, h) in every model.
+
+    Rows of y_hat with NaNs (series routed to the models) are skipped.
+    """
+    if not len(uids):
+        return forecasts
+
+    pos = uids.get_indexer(forecasts['unique_id'])
+    step = forecasts.groupby('unique_id', sort=False).cumcount().values
+    y_hat = np.where(pos >= 0, y_hat[pos, step], np.nan)
+    trivial = ~np.isnan(y_hat)
+
+    for model_name in model_names:
+        forecasts.loc[trivial, model_name] = y_hat[trivial]
+
+    return forecasts
+
+def _forecasts_frame(y: pd.DataFrame, h: Union[int, pd.DataFrame]) -> pd.DataFrame:
+    """Long frame with columns ['unique_id', 'ds'] of the dates to forecast."""
+    if isinstance(h, pd.DataFrame):
+        forecasts = h[['unique_id', 'ds']].sort_values(['unique_id', 'ds'],
+                                                       kind='mergesort')
+        return forecasts.reset_index(drop=True)
+
+    uids = np.sort(y['unique_id'].unique())
+    forecasts = pd.DataFrame({'unique_id': np.repeat(uids, h),
+                              'ds': np.tile(np.arange(1, h + 1), len(uids))})
+
+    return forecasts
+
+def _panel_df(X: pd.DataFrame,
+              uids: pd.Index,
+              h: Optional[Union[int, pd.DataFrame]] = None) -> pd.DataFrame:
+    """Wide panel indexed by unique_id with the position of each series.
+
+    The values of the series are read from a SharedPanel with the
+    column 'pos'. The column 'X' is added if X is given. If h is given,
+    only series to forecast are kept and the columns 'horizon' and
+    'X_test' (if h has exogenous vars) are added.
+    """
+    panel_df = pd.DataFrame({'pos': np.arange(len(uids))}, index=uids)
+
+    if X is not None:
+        x_cols = list(set(X.columns) - {'unique_id', 'ds'})
+        X_train = long_to_wide(X, cols_to_parse=[x_cols], cols_wide=['X'])
+        panel_df = panel_df.join(X_train.set_index('unique_id'))
+
+    if h is None:
+        return panel_df
+
+    if isinstance(h, pd.DataFrame):
+        horizon = h.groupby('unique_id').size().rename('horizon')
+        x_cols = list(set(h.columns) - {'unique_id', 'ds'})
+        if x_cols:
+            X_test = long_to_wide(h, cols_to_parse=[x_cols], cols_wide=['X_test'])
+            panel_df = panel_df.join(X_test.set_index('unique_id'), how='inner')
+    else:
+        horizon = pd.Series(h, index=panel_df.index, name='horizon')
+    panel_df = panel_df.join(horizon, how='inner')
+
+    return panel_df
+
+def _run_batches(panel_df: pd.DataFrame,
+                 values: np.ndarray,
+                 indptr: np.ndarray,
+                 batch_fn: Callable,
+                 models: Dict[str, Callable],
+                 partitions: int,
+                 scheduler: str,
+                 cost_model: TaskCostModel,
+                 timeout: Optional[float],
+                 fallback: Optional[Union[Callable, Dict[str, Callable]]],
+                 pool: Optional[WorkerPool] = None,
+                 tasks: Optional[Dict[str, np.ndarray]] = None,
+                 **batch_kwargs) -> Tuple[Dict, pd.DataFrame, pd.DataFrame]:
+    """Schedules (series, model) tasks in partitions and runs batch_fn on them.
+
+    tasks are the positions in panel_df of the series of each model
+    (default all). Returns the results of each model as (unique_ids, payloads),
+    the timings of each task and the tasks replaced by the fallback.
+    """
+    lengths = pd.Series(np.diff(indptr)[panel_df['pos'].values], index=panel_df.index)
+    parts = schedule_tasks(panel_df, lengths, models, cost_model, partitions, tasks)
+
+    with SharedPanel(values, indptr) as panel:
+        batch_fn = partial(batch_fn, models=models, panel=panel,
+                           timeout=timeout, fallback=fallback, **batch_kwargs)
+        task = [delayed(batch_fn)(part) for part in parts]
+
+        results_batches = _compute(task, scheduler, pool)
+
+    results = {model_name: ([], []) for model_name in models}
+    timings, fallbacks = [], []
+    for results_batch, timings_batch, fallbacks_batch in results_batches:
+        for model_name, (uids, payloads) in results_batch.items():
+            results[model_name][0].extend(uids)
+            results[model_name][1].extend(payloads)
+        timings.extend(timings_batch)
+        fallbacks.extend(fallbacks_batch)
+
+    timings = pd.DataFrame(timings, columns=['unique_id', 'model', 'length', 'time'])
+    fallbacks = pd.DataFrame(fallbacks, columns=['unique_id', 'model', 'reason'])
+
+    return results, timings, fallbacks
+
+def _compute(tasks: List, scheduler: str, pool: Optional[WorkerPool]) -> Tuple:
+    """Computes delayed tasks with the pool if given, otherwise with scheduler."""
+    if pool is not None:
+        return compute(*tasks, scheduler='processes', pool=pool.executor)
+
+    return compute(*tasks, scheduler=scheduler)
+
+def _run_task(task_fn: Callable,
+              model: Callable,
+              args: Tuple,
+              uid: str,
+              model_name: str,
+              timeout: Optional[float],
+              fallback: Optional[Union[Callable, Dict[str, Callable]]]) -> Tuple[object,
+                                                                                 Optional[str]]:
+    """Runs task_fn(model, *args) replacing model by fallback on failure.
+
+    Returns the result and the reason of the fallback (None if
+    the model succeeded).
+    """
+    if timeout is not None and not has_panel_state(model):
+        status, result = run_isolated(task_fn, (model, *args), timeout)
     else:
-        y_panel_df = train_to_horizontal(X, y)
+        try:
+            status, result = 'ok', task_fn(model, *args)
+        except Exception as e:
+            status, result = 'error', str(e)
+
+    if status == 'ok':
+        return result, None
+
+    reason = result if status == 'error' else f'{status}: {result}'
 
-    y_panel_df_dask = dd.from_pandas(y_panel_df.set_index('unique_id').sample(frac=1),
-                                     npartitions=partitions)
-    y_panel_df_dask = y_panel_df_dask.to_delayed()
+    return _run_fallback(task_fn, args, uid, model_name, reason, fallback)
 
-    fit_batch = partial(_fit_batch, models=models)
-    task = [delayed(fit_batch)(part) for part in y_panel_df_dask]
+def _run_fallback(task_fn: Callable,
+                  args: Tuple,
+                  uid: str,
+                  model_name: str,
+                  reason: str,
+                  fallback: Optional[Union[Callable, Dict[str, Callable]]]) -> Tuple[object, str]:
+    """Runs task_fn with the fallback of model_name, raises if there is none."""
+    fallback_model = fallback.get(model_name) if isinstance(fallback, dict) else fallback
+    if fallback_model is None:
+        raise Exception(f'Exception with {uid} and model {model_name}: {reason}')
 
-    fitted_models = compute(*task, scheduler=scheduler)
-    fitted_models = pd.concat(fitted_models)
+    return task_fn(deepcopy(fallback_model), *args), reason
+
+def _fit_task(model: Callable, X: np.ndarray, y: np.ndarray) -> Callable:
+    return model.fit(X, y)
+
+def _update_task(model: Callable, X: np.ndarray, y: np.ndarray) -> Callable:
+    return model.update(X, y)
+
+def _fit_predict_task(model: Callable, X: np.ndarray, y: np.ndarray,
+                      X_test: np.ndarray) -> np.ndarray:
+    y_hat = np.asarray(model.fit(X, y).predict(X_test), dtype=np.float64)
+
+    # Models with several outputs keep a column per output
+    return y_hat if y_hat.ndim == 2 else y_hat.ravel()
+
+def _fit(X: pd.DataFrame,
+         uids: pd.Index,
+         values: np.ndarray,
+         indptr: np.ndarray,
+         models: Dict[str, Callable],
+         partitions: int,
+         scheduler: str,
+         cost_model: TaskCostModel,
+         timeout: Optional[float],
+         fallback: Optional[Union[Callable, Dict[str, Callable]]],
+         pool: Optional[WorkerPool] = None) -> Tuple[Dict, pd.DataFrame,
+                                                     pd.DataFrame]:
+    """Auxiliar function to handle parallel processing."""
+    if not models:
+        return {}, _empty_timings(), _empty_fallbacks()
+
+    panel_df = _panel_df(X, uids)
+
+    return _run_batches(panel_df, values, indptr, _fit_batch, models,
+                        partitions, scheduler, cost_model,
+                        timeout, fallback, pool)
+
+def _update(fitted_models: FittedModels,
+            updated: np.ndarray,
+            values: np.ndarray,
+            indptr: np.ndarray,
+            models: Dict[str, Callable],
+            partitions: int,
+            scheduler: str,
+            cost_model: TaskCostModel,
+            timeout: Optional[float],
+            fallback: Optional[Union[Callable, Dict[str, Callable]]],
+            pool: Optional[WorkerPool] = None) -> Tuple[Dict, pd.DataFrame,
+                                                        pd.DataFrame]:
+    """Fits models again on the series with new observations.
+
+    Fitted estimators are sent with the series so models with an
+    update method reuse them. Results of the rest of the series
+    are the ones already stored.
+    """
+    if not models:
+        return {}, _empty_timings(), _empty_fallbacks()
+
+    uids = fitted_models.uids
+    panel_df = _panel_df(None, uids).join(fitted_models.to_frame())
+    panel_df = panel_df[updated]
+
+    results = {model_name: ([], []) for model_name in models}
+    timings, fallbacks = _empty_timings(), _empty_fallbacks()
+    if len(panel_df):
+        results, timings, fallbacks = _run_batches(panel_df, values, indptr, _fit_batch,
+                                                   models, partitions, scheduler,
+                                                   cost_model, timeout, fallback, pool)
+
+    idx, = np.where(~updated)
+    for model_name, (model_uids, payloads) in results.items():
+        model_uids.extend(uids[idx])
+        payloads.extend(_stored_payloads(fitted_models, model_name, idx))
+
+    return results, timings, fallbacks
+
+def _stored_payloads(fitted_models: FittedModels,
+                     model_name: str,
+                     idx: np.ndarray) -> List:
+    """Fitted estimators (or typed parameters) of the series in positions idx."""
+    if model_name in fitted_models.states:
+        state = fitted_models.states[model_name]
+        return [{key: value[i] for key, value in state.items()} for i in idx]
+
+    return list(fitted_models.objects[model_name][idx])
+
+def _previous_model(df: pd.DataFrame, model_name: str, model: Callable) -> Tuple[Callable,
+                                                                               Callable]:
+    """Model to fit and task function for a series.
+
+    If the fitted estimator of the series is available (update), it is
+    reused through its update method. Series that used the fallback
+    are fitted from scratch.
+    """
+    fitted_model = df[model_name].values.item() if model_name in df.columns else None
+    if type(fitted_model) is not type(model) or not hasattr(fitted_model, 'update'):
+        return model, _fit_task
 
-    return fitted_models
+    return fitted_model, _update_task
 
-def _fit_batch(batch: pd.DataFrame, models: Dict[str, Callable]) -> pd.DataFrame:
-    df_models = pd.DataFrame(index=batch.index, columns=models.keys())
+def _fit_batch(batch: pd.DataFrame,
+               models: Dict[str, Callable],
+               panel: SharedPanel,
+               timeout: Optional[float] = None,
+               fallback: Optional[Union[Callable, Dict[str, Callable]]] = None) -> Tuple[Dict, List, List]:
+    results = {model_name: ([], []) for model_name in models}
+    timings, fallbacks = [], []
 
     for uid, df in batch.groupby('unique_id'):
-        y = df['y'].values.item()
-        y = np.array(y)
+        y = np.array(panel.series(df['pos'].values.item()))
 
         X = df['X'].values.item() if 'X' in df.columns else None
 
-        for model_name, model in models.items():
+        for model_name in df['models'].values.item():
+            model, task_fn = _previous_model(df, model_name, models[model_name])
             model = deepcopy(model)
-            try:
-                fitted_model = model.fit(X, y)
-            except Exception as e:
-                raise Exception(f'Exception with {uid} and model {model_name}: {str(e)}')
-
-            df_models.loc[uid, model_name] = fitted_model
+            start = perf_counter()
+            fitted_model, reason = _run_task(task_fn, model, (X, y), uid, model_name,
+                                             timeout, fallback)
+            timings.append((uid, model_name, len(y), perf_counter() - start))
+
+            if reason is not None:
+                fallbacks.append((uid, model_name, reason))
+            elif has_panel_state(fitted_model):
+                fitted_model = get_panel_state(fitted_model)
+
+            results[model_name][0].append(uid)
+            results[model_name][1].append(fitted_model)
+
+    return results, timings, fallbacks
+
+def _collect_fitted_models(uids: pd.Index,
+                           models: Dict[str, Callable],
+                           results: Dict[str, Tuple[List, List]]) -> FittedModels:
+    """Builds the store of fitted models ordered by uids."""
+    states, objects = {}, {}
+
+    for model_name, (model_uids, fitted_models) in results.items():
+        idx = pd.Index(model_uids).get_indexer(uids)
+        if np.any(idx < 0):
+            raise Exception(f'Model {model_name} was not fitted for every series')
+        fitted_models = [fitted_models[i] for i in idx]
+        model = models[model_name]
+
+        if not has_panel_state(model):
+            objects[model_name] = fitted_models
+        elif all(isinstance(fitted_model, dict) for fitted_model in fitted_models):
+            states[model_name] = fitted_models
+        else:
+            # Some series use the fallback model
+            objects[model_name] = [_StatePredictor(model, fitted_model)
+                                   if isinstance(fitted_model, dict) else fitted_model
+                                   for fitted_model in fitted_models]
+
+    return FittedModels.from_lists(uids, states, objects)
+
+class _StatePredictor:
+    """Predicts a single series from the typed parameters of a model."""
+
+    def __init__(self, model: Callable, state: Dict):
+        self.model = model
+        self.state = state
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        state = {key: np.asarray(value)[None] for key, value in self.state.items()}
+
+        return predict_panel(self.model, state, len(X))[0]
+
+def _fit_predict(X: pd.DataFrame,
+                 uids: pd.Index,
+                 values: np.ndarray,
+                 indptr: np.ndarray,
+                 h: Union[int, pd.DataFrame],
+                 models: Dict[str, Callable],
+                 partitions: int,
+                 scheduler: str,
+                 cost_model: TaskCostModel,
+                 timeout: Optional[float],
+                 fallback: Optional[Union[Callable, Dict[str, Callable]]],
+                 pool: Optional[WorkerPool] = None,
+                 cache: Optional[ForecastCache] = None,
+                 routes: Optional[Dict[str, np.ndarray]] = None) -> Tuple[Dict, pd.DataFrame,
+                                                                          pd.DataFrame, int]:
+    """Auxiliar function to handle parallel processing.
+
+    If cache is given (and there are no exogenous vars in X), stored
+    forecasts are read and only the missing (series, model) pairs run.
+    The number of forecasts read from the cache is returned last.
+    If routes is given (mask of the series of uids by model name),
+    each model only runs on its series.
+    """
+    if not models:
+        return {}, _empty_timings(), _empty_fallbacks(), 0
+
+    panel_df = _panel_df(X, uids, h)
+    routed = {model_name: np.ones(len(panel_df), dtype=bool) if routes is None
+                          else routes[model_name][panel_df['pos'].values]
+              for model_name in models}
+    if cache is None or X is not None:
+        tasks = None if routes is None else {model_name: np.flatnonzero(routed[model_name])
+                                             for model_name in models}
+        return (*_run_batches(panel_df, values, indptr, _fit_predict_batch, models,
+                              partitions, scheduler, cost_model,
+                              timeout, fallback, pool, tasks), 0)
+
+    pos = panel_df['pos'].values
+    X_test = panel_df['X_test'].values if 'X_test' in panel_df.columns else None
+    panel_df['key'] = series_keys(values, indptr[pos], indptr[pos + 1],
+                                  panel_df['horizon'].values, X_test)
+
+    cached, tasks = {}, {}
+    for model_name, model in models.items():
+        stored = cache.get(model_key(model), panel_df['key'])
+        is_stored = panel_df['key'].isin(stored.keys()).values & routed[model_name]
+        # Forecasts of several outputs are stored flattened
+        n_outputs = len(_model_columns(model_name, model))
+        cached[model_name] = (panel_df.index[is_stored],
+                              [stored[key].reshape(-1, n_outputs)
+                               for key in panel_df['key'][is_stored]])
+        tasks[model_name] = np.flatnonzero(~is_stored & routed[model_name])
+
+    results, timings, fallbacks = _run_batches(panel_df, values, indptr, _fit_predict_batch,
+                                               models, partitions, scheduler, cost_model,
+                                               timeout, fallback, pool, tasks, cache=cache)
+    for model_name, (model_uids, y_hats) in cached.items():
+        results[model_name][0].extend(model_uids)
+        results[model_name][1].extend(y_hats)
+    n_cached = sum(len(y_hats) for _, y_hats in cached.values())
+
+    return results, timings, fallbacks, n_cached
+
+def _fit_predict_batch(batch: pd.DataFrame,
+                       models: Dict[str, Callable],
+                       panel: SharedPanel,
+                       timeout: Optional[float] = None,
+                       fallback: Optional[Union[Callable, Dict[str, Callable]]] = None,
+                       cache: Optional[ForecastCache] = None) -> Tuple[Dict, List, List]:
+    results = {model_name: ([], []) for model_name in models}
+    timings, fallbacks = [], []
+    writers = {model_name: cache.writer(model_key(model))
+               for model_name, model in models.items()} if cache is not None else {}
+    # Models with a batch API (R models) fit all their series of the
+    # partition in a single call. Such a call can not be isolated, so
+    # with timeout it is only used if an RWorkerPool runs it.
+    use_batch = timeout is None or active_r_pool() is not None
+    batched = {model_name: [] for model_name, model in models.items()
+               if use_batch and hasattr(model, 'fit_predict_batch')}
+
+    def add_result(uid, model_name, key, y, y_hat, reason, elapsed):
+        timings.append((uid, model_name, len(y), elapsed))
+        if reason is not None:
+            fallbacks.append((uid, model_name, reason))
+        elif model_name in writers:
+            # Forecasts of the fallback are not stored, the model is tried again
+            writers[model_name].add(key, y_hat)
+
+        results[model_name][0].append(uid)
+        results[model_name][1].append(y_hat)
+
+    try:
+        for uid, df in batch.groupby('unique_id'):
+            y = np.array(panel.series(df['pos'].values.item()))
+
+            X = df['X'].values.item() if 'X' in df.columns else None
+
+            h = int(df['horizon'].values.item())
+            X_test = df['X_test'].values.item() if 'X_test' in df.columns else np.empty((h, 0))
+            key = df['key'].values.item() if 'key' in df.columns else None
+
+            for model_name in df['models'].values.item():
+                if model_name in batched:
+                    batched[model_name].append((uid, key, y, (X, y, X_test)))
+                    continue
+
+                model = deepcopy(models[model_name])
+                start = perf_counter()
+                y_hat, reason = _run_task(_fit_predict_task, model, (X, y, X_test), uid, model_name,
+                                          timeout, fallback)
+                add_result(uid, model_name, key, y, y_hat, reason, perf_counter() - start)
+
+        for model_name, tasks in batched.items():
+            if not tasks:
+                continue
+            model = deepcopy(models[model_name])
+            start = perf_counter()
+            y_hats, errors = model.fit_predict_batch([y for _, _, y, _ in tasks],
+                                                     [len(args[2]) for *_, args in tasks])
+            elapsed = (perf_counter() - start) / len(tasks)
+
+            for (uid, key, y, args), y_hat, error in zip(tasks, y_hats, errors):
+                y_hat, reason = np.asarray(y_hat[:len(args[2])], dtype=np.float64), None
+                if error is not None:
+                    y_hat, reason = _run_fallback(_fit_predict_task, args, uid, model_name,
+                                                  error, fallback)
+                add_result(uid, model_name, key, y, y_hat, reason, elapsed)
+    finally:
+        # Stored forecasts survive a failure of the batch
+        for writer in writers.values():
+            writer.flush()
+
+    return results, timings, fallbacks
+
+def _empty_timings() -> pd.DataFrame:
+    return pd.DataFrame(columns=['unique_id', 'model', 'length', 'time'])
+
+def _empty_fallbacks() -> pd.DataFrame:
+    return pd.DataFrame(columns=['unique_id', 'model', 'reason'])
+
+def _pad_forecasts(y_hats: List[np.ndarray], h: int, n_outputs: int = 1) -> np.ndarray:
+    """Stacks forecasts of different horizons into an array padded with NaNs.
+
+    The array has shape (n_series, h, n_outputs), forecasts with a single
+    output (fallbacks of models with several outputs) are used in every output.
+    """
+    padded = np.full((len(y_hats), h, n_outputs), np.nan)
+    for i, y_hat in enumerate(y_hats):
+        y_hat = np.asarray(y_hat, dtype=np.float64)
+        if y_hat.ndim < 2:
+            y_hat = y_hat.reshape(-1, 1)
+        padded[i, :len(y_hat)] = y_hat
 
-    return df_models
+    return padded
 
 def _predict(X: pd.DataFrame,
              models: Dict[str, Callable],
              fitted_models: pd.DataFrame,
              partitions: int,
-             scheduler: str) -> pd.DataFrame:
+             scheduler: str,
+             pool: Optional[WorkerPool] = None) -> pd.DataFrame:
     """Auxiliar function to handle parallel processing."""
+    if not models:
+        forecasts = X[['unique_id', 'ds']].sort_values(['unique_id', 'ds'])
+        return forecasts.reset_index(drop=True)
+
     y_hat_df = long_to_wide(X)
     y_hat_df['horizon'] = y_hat_df['ds'].apply(lambda x: x.shape[0])
 
@@ -136,17 +943,17 @@ def _predict(X: pd.DataFrame,
 
     task = [delayed(predict_batch)(part) for part in parts_df]
 
-    forecasts = compute(*task, scheduler=scheduler)
+    forecasts = _compute(task, scheduler, pool)
 
     forecasts = pd.concat(forecasts)
     forecasts = forecasts.reset_index()
     forecasts = y_hat_df.merge(forecasts, how='left', on=['unique_id']).drop('horizon', 1)
-    forecasts = wide_to_long(forecasts, ['ds'] + list(models.keys()))
+    forecasts = wide_to_long(forecasts, ['ds'] + _forecast_columns(models))
 
     return forecasts
 
 def _predict_batch(batch: pd.DataFrame, models: List[str]) -> pd.DataFrame:
-    forecasts = pd.DataFrame(index=batch.index, columns=models.keys())
+    forecasts = pd.DataFrame(index=batch.index, columns=_forecast_columns(models))
 
     for uid, df in batch.groupby('unique_id'):
         if 'horizon' in df.columns:
@@ -162,6 +969,15 @@ def _predict_batch(batch: pd.DataFrame, models: List[str]) -> pd.DataFrame:
             except Exception as e:
                 raise Exception(f'Exception with {uid} and model {model_name}: {str(e)}')
 
-            forecasts.loc[uid, model_name] = y_hat
+            columns = _model_columns(model_name, models[model_name])
+            if len(columns) == 1:
+                forecasts.loc[uid, model_name] = y_hat
+                continue
+            y_hat = np.asarray(y_hat, dtype=np.float64)
+            if y_hat.ndim < 2:
+                # Fallback with a single output
+                y_hat = np.repeat(y_hat.reshape(-1, 1), len(columns), axis=1)
+            for i, column in enumerate(columns):
+                forecasts.loc[uid, column] = y_hat[:, i]
 
     return forecasts
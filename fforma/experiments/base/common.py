@@ -10,8 +10,8 @@ import pandas as pd
 from tsfeatures.tsfeatures_r import tsfeatures_r
 
 from fforma.base.trainer import BaseModelsTrainer
-from fforma.base import (Naive2, ARIMA, ETS, NNETAR, STLM, TBATS, STLMFFORMA,
-                         RandomWalk, ThetaF, NaiveR, SeasonalNaiveR)
+from fforma.base import (Naive2, AutoARIMA, ETS, NNETAR, STLM, TBATS, STLMFFORMA,
+                         RandomWalk, ThetaF, NaiveR, SeasonalNaiveR, ForecastCache)
 from fforma.experiments.datasets.tourism import TourismInfo, Tourism
 from fforma.metrics.numpy import mape, smape
 from fforma.utils.evaluation import evaluate_models
@@ -105,7 +105,8 @@ class BaseData:
 def get_base_data(train: Union[Tourism],
                   test: Union[Tourism],
                   info: Union[TourismInfo],
-                  add_forecasts: Optional[pd.DataFrame] = None) -> 'BaseData':
+                  add_forecasts: Optional[pd.DataFrame] = None,
+                  cache: Optional[ForecastCache] = None) -> 'BaseData':
     """
 
     Parameters
@@ -115,6 +116,9 @@ def get_base_data(train: Union[Tourism],
     info:
     add_forecasts: pd.DataFrame
         Additional forecasts to include.
+    cache: ForecastCache
+        Cache of base forecasts, only models or series
+        that changed are computed again.
     """
     logger.info(info.name)
 
@@ -144,8 +148,8 @@ def get_base_data(train: Union[Tourism],
         logger.info('Calculating forecasts')
         forecasts_group = ground_truth_group.drop('y', 1)
         if meta_models:
-            models = BaseModelsTrainer(meta_models).fit(None, train_group)
-            forecasts_group = models.predict(forecasts_group)
+            forecasts_group = BaseModelsTrainer(meta_models, cache=cache) \
+                                  .fit_predict(None, train_group, forecasts_group)
         forecasts_group = forecasts_group.query('unique_id in @ids_group')
         forecasts_group = forecasts_group.sort_values(['unique_id', 'ds'])
 
@@ -194,7 +198,7 @@ def get_base_data(train: Union[Tourism],
 def _meta_models(seasonality: int, models: Iterable) -> Dict:
     """Returns dict of models."""
     meta_models = {
-        'auto_arima_forec': ARIMA(seasonality, stepwise=False, approximation=False),
+        'auto_arima_forec': AutoARIMA(seasonality, stepwise=False, approximation=False),
         'ets_forec': ETS(seasonality),
         'nnetar_forec': NNETAR(seasonality),
         'tbats_forec': TBATS(seasonality),
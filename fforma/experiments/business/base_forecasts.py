@@ -6,7 +6,7 @@ import logging
 from functools import partial
 from gc import collect
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 import numpy as np
 import pandas as pd
@@ -14,8 +14,9 @@ from time import time
 from tsfeatures import tsfeatures
 
 from fforma.base.trainer import BaseModelsTrainer
-from fforma.base import Naive2, ARIMA, ETS, NNETAR, STLM, TBATS, STLMFFORMA, \
-                        RandomWalk, ThetaF, NaiveR, SeasonalNaiveR
+from fforma.base import Naive2, AutoARIMA, ETS, NNETAR, STLM, TBATS, STLMFFORMA, \
+                        RandomWalk, ThetaF, NaiveR, SeasonalNaiveR, WorkerPool, \
+                        ForecastCache
 from fforma.experiments.datasets.business import Business, BusinessInfo
 
 
@@ -50,7 +51,47 @@ def _transform_base_file(file: str,
 
     return meta, forecasts, features
 
-def main(directory: str, group: str, replace: bool) -> None:
+def _forecast_cutoff(ts: pd.DataFrame, cutoff: pd.Timestamp, seasonality: int,
+                     meta_models: dict, file: Path, pool: WorkerPool,
+                     cache: Optional[ForecastCache]) -> None:
+    """Saves features and forecasts of the series before cutoff in file."""
+    logger.info(f'============Cutoff: {cutoff}')
+
+    test_cutoff = cutoff + pd.Timedelta(days=seasonality)
+    train = ts.query('ds < @cutoff')
+    test = ts.query('ds >= @cutoff & ds < @test_cutoff').drop('y', 1)
+
+    logger.info('Features...')
+    init = time()
+    features = tsfeatures(train, seasonality)
+    feats_time = time() - init
+    logger.info(f'Features time: {feats_time}')
+
+    logger.info('Training and forecasting...')
+    init = time()
+    model = BaseModelsTrainer(meta_models, pool=pool, cache=cache)
+    forecasts = model.fit_predict(None, train, test)
+    fit_predict_time = time() - init
+    logger.info(f'Training and forecasting time: {fit_predict_time}\n')
+    if model.cache_hits_:
+        # Forecasts read from the cache were not computed, the time is not comparable
+        logger.info(f'Forecasts read from the cache: {model.cache_hits_}\n')
+        fit_predict_time = None
+
+    meta = {'features_time': feats_time,
+            'fit_predict_time': fit_predict_time,
+            'cache_hits': model.cache_hits_,
+            'train_cutoff': cutoff,
+            'test_cutoff': test_cutoff,
+            'features': features,
+            'forecasts': forecasts,}
+
+    pd.to_pickle(meta, file)
+
+    del features, model, forecasts
+    collect()
+
+def main(directory: str, group: str, replace: bool, use_cache: bool) -> None:
     logger.info('Reading dataset')
     ts = Business.load(directory, group)
     logger.info('Dataset readed')
@@ -63,7 +104,7 @@ def main(directory: str, group: str, replace: bool) -> None:
     base_path.mkdir(exist_ok=True, parents=True)
 
     # Meta models
-    meta_models = {'auto_arima_forec': ARIMA(seasonality),
+    meta_models = {'auto_arima_forec': AutoARIMA(seasonality),
                    'ets_forec': ETS(seasonality),
                    'nnetar_forec': NNETAR(seasonality),
                    'tbats_forec': TBATS(seasonality),
@@ -77,49 +118,23 @@ def main(directory: str, group: str, replace: bool) -> None:
     periods = 91
     cutoffs = pd.date_range(end=ts['ds'].max(), periods=periods, freq='W-THU')
 
-    for cutoff in cutoffs:
-        logger.info(f'============Cutoff: {cutoff}')
-
-        file = saving_path / f'cutoff={cutoff.date()}_freq={seasonality}.p'
-        if file.exists() and not replace:
-            logger.info('File already saved\n')
-            continue
-
-        test_cutoff = cutoff + pd.Timedelta(days=seasonality)
-        train = ts.query('ds < @cutoff')
-        test = ts.query('ds >= @cutoff & ds < @test_cutoff').drop('y', 1)
-
-        logger.info('Features...')
-        init = time()
-        features = tsfeatures(train, seasonality)
-        feats_time = time() - init
-        logger.info(f'Features time: {feats_time}')
-
-        logger.info('Training...')
-        init = time()
-        model = BaseModelsTrainer(meta_models)
-        model.fit(None, train)
-        training_time = time() - init
-        logger.info(f'Training time: {training_time}')
-
-        logger.info('Forecasting...')
-        init = time()
-        forecasts = model.predict(test)
-        forecasting_time = time() - init
-        logger.info(f'Forecasting time: {forecasting_time}\n')
-
-        meta = {'features_time': feats_time,
-                'training_time': training_time,
-                'forecasting_time': forecasting_time,
-                'train_cutoff': cutoff,
-                'test_cutoff': test_cutoff,
-                'features': features,
-                'forecasts': forecasts,}
-
-        pd.to_pickle(meta, file)
-
-        del features, model, forecasts
-        collect()
+    files = {cutoff: saving_path / f'cutoff={cutoff.date()}_freq={seasonality}.p'
+             for cutoff in cutoffs}
+    pending = [cutoff for cutoff in cutoffs if replace or not files[cutoff].exists()]
+    logger.info(f'Files already saved: {len(cutoffs) - len(pending)}\n')
+
+    # Reruns only compute models or series that changed,
+    # replaced files are always computed again
+    cache = None
+    if use_cache and not replace:
+        cache = ForecastCache(main_path / 'cache')
+
+    if pending:
+        # Workers import rpy2 and the forecast package once for all cutoffs
+        with WorkerPool() as pool:
+            for cutoff in pending:
+                _forecast_cutoff(ts, cutoff, seasonality, meta_models,
+                                 files[cutoff], pool, cache)
 
     logger.info(f'Forecast finished')
 
@@ -130,9 +145,7 @@ def main(directory: str, group: str, replace: bool) -> None:
                         models=meta_models.keys(),
                         feats_to_drop=feats_to_drop)
 
-    files = [saving_path / f'cutoff={cutoff.date()}_freq={seasonality}.p' \
-             for cutoff in cutoffs]
-    meta, forecasts, features = zip(*[transform(file) for file in files])
+    meta, forecasts, features = zip(*[transform(files[cutoff]) for cutoff in cutoffs])
 
     meta = pd.DataFrame(meta).sort_values('test_cutoff')
     forecasts = pd.concat(forecasts)
@@ -153,10 +166,12 @@ if __name__ == '__main__':
                         choices=['GLB', 'BRC'])
     parser.add_argument('--replace', required=False, action='store_true',
                         help='Replace files already saved')
+    parser.add_argument('--cache', required=False, action='store_true',
+                        help='Reuse forecasts stored in the cache (ignored with --replace)')
 
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
-    main(args.directory, args.group, args.replace)
+    main(args.directory, args.group, args.replace, args.cache)
@@ -6,7 +6,7 @@ import logging
 from functools import partial
 from gc import collect
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 import numpy as np
 import pandas as pd
@@ -14,7 +14,7 @@ from time import time
 from tsfeatures import tsfeatures
 
 from fforma.base.trainer import BaseModelsTrainer
-from fforma.base import QuantileAutoRegression
+from fforma.base import MultiQuantileAutoRegression, WorkerPool, ForecastCache
 from fforma.experiments.datasets.business import Business, BusinessInfo
 
 
@@ -35,7 +35,39 @@ def _transform_base_file(file: str,
 
     return meta, forecasts
 
-def main(directory: str, group: str, replace: bool) -> None:
+def _forecast_cutoff(ts: pd.DataFrame, cutoff: pd.Timestamp, seasonality: int,
+                     meta_models: dict, file: Path, pool: WorkerPool,
+                     cache: Optional[ForecastCache]) -> None:
+    """Saves the forecasts of the series before cutoff in file."""
+    logger.info(f'============Cutoff: {cutoff}')
+
+    test_cutoff = cutoff + pd.Timedelta(days=seasonality)
+    train = ts.query('ds < @cutoff')
+    test = ts.query('ds >= @cutoff & ds < @test_cutoff').drop('y', 1)
+
+    logger.info('Training and forecasting...')
+    init = time()
+    model = BaseModelsTrainer(meta_models, pool=pool, cache=cache)
+    forecasts = model.fit_predict(None, train, test)
+    fit_predict_time = time() - init
+    logger.info(f'Training and forecasting time: {fit_predict_time}\n')
+    if model.cache_hits_:
+        # Forecasts read from the cache were not computed, the time is not comparable
+        logger.info(f'Forecasts read from the cache: {model.cache_hits_}\n')
+        fit_predict_time = None
+
+    meta = {'fit_predict_time': fit_predict_time,
+            'cache_hits': model.cache_hits_,
+            'train_cutoff': cutoff,
+            'test_cutoff': test_cutoff,
+            'forecasts': forecasts,}
+
+    pd.to_pickle(meta, file)
+
+    del model, forecasts
+    collect()
+
+def main(directory: str, group: str, replace: bool, use_cache: bool) -> None:
     logger.info('Reading dataset')
     ts = Business.load(directory, group)
     logger.info('Dataset readed')
@@ -47,72 +79,42 @@ def main(directory: str, group: str, replace: bool) -> None:
     base_path = main_path / 'base'
     base_path.mkdir(exist_ok=True, parents=True)
 
-    # Meta models
-    meta_models = {}
+    # Meta models: q_ar_{tau}, q_ar_{tau}_naive, q_ar_{tau}_trend and
+    # q_ar_{tau}_naive_trend share the preprocessing of each series
     ar_terms = [7, 14, 28]
-    for tau in [0.3, 0.5, 0.7, 0.9]:
-        meta_models[f'q_ar_{tau}'] = QuantileAutoRegression(tau=tau,
-                                                            ar_terms=ar_terms,
-                                                            max_diffs=0)
-        meta_models[f'q_ar_{tau}_naive'] = QuantileAutoRegression(tau=tau,
-                                                                  ar_terms=ar_terms,
-                                                                  naive_forecasts=True,
-                                                                  max_diffs=0)
-        meta_models[f'q_ar_{tau}_trend'] = QuantileAutoRegression(tau=tau,
-                                                                  ar_terms=ar_terms,
-                                                                  add_trend=True)
-        meta_models[f'q_ar_{tau}_naive_trend'] = QuantileAutoRegression(tau=tau,
-                                                                        ar_terms=ar_terms,
-                                                                        naive_forecasts=True,
-                                                                        add_trend=True)
+    meta_models = {'q_ar': MultiQuantileAutoRegression(taus=[0.3, 0.5, 0.7, 0.9],
+                                                       ar_terms=ar_terms,
+                                                       max_diffs=0)}
+    meta_columns = [f'q_ar_{output_name}'
+                    for output_name in meta_models['q_ar'].output_names]
 
     periods = 54
     cutoffs = pd.date_range(end=ts['ds'].max(), periods=periods, freq='W-THU')
 
-    for cutoff in cutoffs:
-        logger.info(f'============Cutoff: {cutoff}')
+    files = {cutoff: saving_path / f'cutoff={cutoff.date()}_freq={seasonality}_quantile.p'
+             for cutoff in cutoffs}
+    pending = [cutoff for cutoff in cutoffs if replace or not files[cutoff].exists()]
+    logger.info(f'Files already saved: {len(cutoffs) - len(pending)}\n')
 
-        file = saving_path / f'cutoff={cutoff.date()}_freq={seasonality}_quantile.p'
-        if file.exists() and not replace:
-            logger.info('File already saved\n')
-            continue
+    # Reruns only compute models or series that changed,
+    # replaced files are always computed again
+    cache = None
+    if use_cache and not replace:
+        cache = ForecastCache(main_path / 'cache')
 
-        test_cutoff = cutoff + pd.Timedelta(days=seasonality)
-        train = ts.query('ds < @cutoff')
-        test = ts.query('ds >= @cutoff & ds < @test_cutoff').drop('y', 1)
-
-        logger.info('Training...')
-        init = time()
-        model = BaseModelsTrainer(meta_models, predict_scheduler='threads')
-        model.fit(None, train)
-        training_time = time() - init
-        logger.info(f'Training time: {training_time}')
-
-        logger.info('Forecasting...')
-        init = time()
-        forecasts = model.predict(test)
-        forecasting_time = time() - init
-        logger.info(f'Forecasting time: {forecasting_time}\n')
-
-        meta = {'training_time': training_time,
-                'forecasting_time': forecasting_time,
-                'train_cutoff': cutoff,
-                'test_cutoff': test_cutoff,
-                'forecasts': forecasts,}
-
-        pd.to_pickle(meta, file)
-
-        del model, forecasts
-        collect()
+    if pending:
+        # Workers are started once for all cutoffs
+        with WorkerPool() as pool:
+            for cutoff in pending:
+                _forecast_cutoff(ts, cutoff, seasonality, meta_models,
+                                 files[cutoff], pool, cache)
 
     logger.info(f'Forecast finished')
 
     transform = partial(_transform_base_file,
-                        models=meta_models.keys())
+                        models=meta_columns)
 
-    files = [saving_path / f'cutoff={cutoff.date()}_freq={seasonality}_quantile.p' \
-             for cutoff in cutoffs]
-    meta, forecasts = zip(*[transform(file) for file in files])
+    meta, forecasts = zip(*[transform(files[cutoff]) for cutoff in cutoffs])
     meta = pd.DataFrame(meta).sort_values('test_cutoff')
     forecasts = pd.concat(forecasts)
 
@@ -130,10 +132,12 @@ if __name__ == '__main__':
                         choices=['GLB', 'BRC'])
     parser.add_argument('--replace', required=False, action='store_true',
                         help='Replace files already saved')
+    parser.add_argument('--cache', required=False, action='store_true',
+                        help='Reuse forecasts stored in the cache (ignored with --replace)')
 
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
-    main(args.directory, args.group, args.replace)
+    main(args.directory, args.group, args.replace, args.cache)
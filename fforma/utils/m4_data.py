@@ -8,7 +8,8 @@ import subprocess
 import numpy as np
 import pandas as pd
 
-from src.base_models import Naive2
+from fforma.base import Naive2, fit_panel, predict_panel
+from fforma.utils.reshaping import long_to_panel
 
 
 seas_dict = {'Hourly': {'seasonality': 24, 'input_size': 24,
@@ -161,27 +162,20 @@ def naive2_predictions(dataset_name, directory, num_obs, y_train_df = None, y_te
     print('Preparing {} dataset'.format(dataset_name))
     print('Preparing Naive2 {} dataset predictions'.format(dataset_name))
 
-    # Naive2
-    y_naive2_df = pd.DataFrame(columns=['unique_id', 'ds', 'y_hat'])
-
-    # Sort X by unique_id for faster loop
-    y_train_df = y_train_df.sort_values(by=['unique_id', 'ds'])
-    # List of uniques ids
-    unique_ids = y_train_df['unique_id'].unique()
-    X_test = pd.DataFrame(range(output_size))
-    # Panel of fitted models
-    for unique_id in unique_ids:
-        # Fast filter X and y by id.
-        top_row = np.asscalar(y_train_df['unique_id'].searchsorted(unique_id, 'left'))
-        bottom_row = np.asscalar(y_train_df['unique_id'].searchsorted(unique_id, 'right'))
-        y_id = y_train_df[top_row:bottom_row]
-
-        y_naive2 = pd.DataFrame(columns=['unique_id', 'ds', 'y_hat'])
-        y_naive2['ds'] = pd.date_range(start=y_id.ds.max(),
-                                   periods=output_size+1, freq=freq)[1:]
-        y_naive2['unique_id'] = unique_id
-        y_naive2['y_hat'] = Naive2(seasonality).fit(None, y_id.y.to_numpy()).predict(X_test)
-        y_naive2_df = y_naive2_df.append(y_naive2)
+    # Naive2 of every series in a single vectorized fit
+    unique_ids, values, indptr = long_to_panel(y_train_df)
+    model = Naive2(seasonality)
+    y_hat = predict_panel(model, fit_panel(model, values, indptr), output_size)
+
+    # Same dates as pd.date_range(start=last ds, periods=output_size+1, freq=freq)[1:],
+    # an offset with n=0 rolls the last ds forward to the first date of the range
+    offset = pd.tseries.frequencies.to_offset(freq)
+    last_ds = pd.DatetimeIndex(y_train_df.groupby('unique_id')['ds'].max().loc[unique_ids])
+    first_ds = last_ds + 0 * offset
+    ds = np.column_stack([first_ds + step * offset for step in range(1, output_size + 1)])
+    y_naive2_df = pd.DataFrame({'unique_id': np.repeat(unique_ids.values, output_size),
+                                'ds': ds.ravel(),
+                                'y_hat': y_hat.ravel()})
 
     y_naive2_df = y_test_df.merge(y_naive2_df, on=['unique_id', 'ds'], how='left')
     y_naive2_df.rename(columns={'y_hat': 'y_hat_naive2'}, inplace=True)
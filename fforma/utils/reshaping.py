@@ -58,6 +58,34 @@ def train_to_horizontal(X_df, y_df, x_cols=None, threads=8):
 
     return train_df
 
+def long_to_panel(long_df, col='y'):
+    """Transforms a long panel into the values + offsets layout.
+
+    Parameters
+    ----------
+    long_df: pandas df
+        Pandas DataFrame with columns ['unique_id', 'ds', col].
+    col: str
+        Column with the values of the series.
+
+    Returns
+    -------
+    uids: pandas Index
+        Sorted unique ids.
+    values: numpy array
+        Concatenated values of the series sorted by ds.
+    indptr: numpy array
+        Offsets of each series in values.
+    """
+    long_df = long_df.sort_values(['unique_id', 'ds'], kind='mergesort')
+    codes, uids = pd.factorize(long_df['unique_id'], sort=True)
+    values = long_df[col].to_numpy(dtype=np.float64)
+
+    indptr = np.zeros(len(uids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=len(uids)), out=indptr[1:])
+
+    return pd.Index(uids, name='unique_id'), values, indptr
+
 def wide_to_long(df, lst_cols=None, fill_value='', preserve_index=False):
     # make sure `lst_cols` is list-alike
     if (lst_cols is not None
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+
+
+def _split_series(df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Splits df (rows grouped by unique_id) in chunks of chunk_size series."""
+    codes, _ = pd.factorize(df['unique_id'])
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    bounds = np.append(starts[::chunk_size], len(df))
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield df.iloc[start:end]
+
+def _regroup(blocks: Iterable[pd.DataFrame], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Chunks of complete series from blocks of rows grouped by unique_id.
+
+    A series can be split between consecutive blocks, so the
+    last series of the rows read so far is never yielded until
+    the next block (or the end) is read.
+    """
+    pending, n_series, last_uid = [], 0, None
+
+    for block in blocks:
+        if not len(block):
+            continue
+        uids = block['unique_id'].values
+        n_series += np.count_nonzero(uids[1:] != uids[:-1]) + (uids[0] != last_uid)
+        last_uid = uids[-1]
+        pending.append(block)
+
+        if n_series > chunk_size:
+            chunks = list(_split_series(pd.concat(pending), chunk_size))
+            yield from chunks[:-1]
+            pending = [chunks[-1]]
+            n_series = chunks[-1]['unique_id'].nunique()
+
+    if pending:
+        yield from _split_series(pd.concat(pending), chunk_size)
+
+def iter_series_chunks(source: Union[pd.DataFrame, str, Path, Iterable[pd.DataFrame]],
+                       chunk_size: int,
+                       **read_kwargs) -> Iterator[pd.DataFrame]:
+    """Reads a long panel in chunks of complete series.
+
+    Parameters
+    ----------
+    source: pandas df, str, Path or iterable of pandas df
+        Pandas DataFrame with columns ['unique_id', 'ds', 'y'],
+        path of a csv file with those columns or an iterable of
+        DataFrames. Rows of files and iterables must be grouped
+        by unique_id (for example sorted), a series can span
+        consecutive DataFrames.
+    chunk_size: int
+        Number of series of each chunk.
+    read_kwargs:
+        Arguments of pd.read_csv.
+
+    Returns
+    -------
+    Iterator of pandas df
+        Chunks with chunk_size series (the last one can be smaller).
+        Only one chunk (plus a block of the file) is in memory at once.
+    """
+    if isinstance(source, pd.DataFrame):
+        source = source.sort_values(['unique_id', 'ds'], kind='mergesort')
+        return _split_series(source, chunk_size)
+
+    if isinstance(source, (str, Path)):
+        read_kwargs.setdefault('chunksize', 1_000_000)
+        source = pd.read_csv(source, **read_kwargs)
+
+    return _regroup(source, chunk_size)
+
+
+class CSVSink:
+    """
+    Appends DataFrames to a csv file.
+
+    Parameters
+    ----------
+    path: str or Path
+        Path of the file. An existing file is replaced.
+    to_csv_kwargs:
+        Arguments of pd.DataFrame.to_csv.
+    """
+
+    def __init__(self, path: Union[str, Path], **to_csv_kwargs):
+        self.path = Path(path)
+        self.to_csv_kwargs = to_csv_kwargs
+        self.n_rows = 0
+
+    def __call__(self, df: pd.DataFrame) -> None:
+        header = self.n_rows == 0
+        mode = 'w' if header else 'a'
+        df.to_csv(self.path, mode=mode, header=header, index=False, **self.to_csv_kwargs)
+        self.n_rows += len(df)
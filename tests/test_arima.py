@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from importlib.util import find_spec
+
+import numpy as np
+import pytest
+
+from fforma.base import AutoARIMA
+from fforma.base._arima import auto_arima_fit, fit_arima, nsdiffs, predict_arima
+from test_ets import INTERMITTENT
+from test_panel_r_engines import AIR_PASSENGERS, RANDOM_WALK
+
+requires_rpy2 = pytest.mark.skipif(find_spec('rpy2') is None, reason='rpy2 is not installed')
+
+# Published output of forecast(auto.arima(AirPassengers), h=6):
+# ARIMA(2,1,1)(0,1,0)[12], log likelihood=-504.92
+AIR_PASSENGERS_COEF = {'ar1': 0.5960, 'ar2': 0.2143, 'ma1': -0.9819}
+AIR_PASSENGERS_FORECAST = np.array([445.6349, 420.3950, 449.1983,
+                                    491.8399, 503.3945, 566.8625])
+
+
+def test_air_passengers_matches_auto_arima():
+    fit = auto_arima_fit(AIR_PASSENGERS, 12)
+
+    assert fit['order'] == (2, 1, 1)
+    assert fit['seasonal_order'] == (0, 1, 0)
+    np.testing.assert_allclose(fit['phi'][:2], [AIR_PASSENGERS_COEF['ar1'],
+                                                AIR_PASSENGERS_COEF['ar2']], atol=1e-3)
+    np.testing.assert_allclose(fit['theta'][0], AIR_PASSENGERS_COEF['ma1'], atol=1e-3)
+    np.testing.assert_allclose(fit['neg2loglik'], 2 * 504.92, atol=0.02)
+    np.testing.assert_allclose(predict_arima(AIR_PASSENGERS, fit, 6),
+                               AIR_PASSENGERS_FORECAST, rtol=1e-5)
+
+def test_airline_model_matches_stats_arima():
+    # Example of ?arima: ma1 = -0.4018, sma1 = -0.5569,
+    # sigma^2 = 0.001348, log likelihood = 244.7
+    fit = fit_arima(np.log(AIR_PASSENGERS), (0, 1, 1), (0, 1, 1), 12, False)
+
+    np.testing.assert_allclose(fit['theta'][[0, 11]], [-0.4018, -0.5569], atol=1e-3)
+    np.testing.assert_allclose(fit['sigma2'], 0.001348, atol=1e-6)
+    np.testing.assert_allclose(-fit['neg2loglik'] / 2, 244.7, atol=0.05)
+
+def test_seasonal_differences():
+    # nsdiffs(AirPassengers) and nsdiffs(log(AirPassengers)) are 1
+    assert nsdiffs(AIR_PASSENGERS, 12) == 1
+    assert nsdiffs(np.log(AIR_PASSENGERS), 12) == 1
+    assert nsdiffs(RANDOM_WALK, 12) == 0
+
+@pytest.mark.parametrize('seed', range(10))
+def test_intermittent_series_are_not_seasonally_differenced(seed):
+    y = np.random.default_rng(seed).poisson(0.3, 40).astype(np.float64)
+    fit = auto_arima_fit(y, 12)
+    y_hat = predict_arima(y, fit, 12)
+
+    assert nsdiffs(y, 12) == 0
+    assert fit['seasonal_order'][1] == 0
+    assert not np.allclose(y_hat, y[-12:])
+
+def test_intermittent_with_zeros():
+    fit = auto_arima_fit(INTERMITTENT, 12)
+
+    assert fit['seasonal_order'][1] == 0
+    assert np.isfinite(predict_arima(INTERMITTENT, fit, 12)).all()
+
+def test_constant_series():
+    y = np.full(30, 3.)
+    model = AutoARIMA(12).fit(None, y)
+
+    np.testing.assert_array_equal(model.predict(np.empty(6)), 3.)
+
+@pytest.mark.parametrize('y', [[5.], [5., 7.], [1., 2., 4.], [1., 3., 2., 5.],
+                               AIR_PASSENGERS[:20]])
+def test_short_series(y):
+    y = np.asarray(y)
+    model = AutoARIMA(12).fit(None, y)
+
+    # Seasonal differences need more than two seasons
+    assert model.model_['seasonal_order'][1] == 0
+    assert np.isfinite(model.predict(np.empty(6))).all()
+
+def test_update_keeps_the_model():
+    model = AutoARIMA(12).fit(None, AIR_PASSENGERS[:-12])
+    fit = model.model_
+    model.update(None, AIR_PASSENGERS)
+
+    assert model.model_ is fit
+    np.testing.assert_allclose(model.predict(np.empty(6)),
+                               predict_arima(AIR_PASSENGERS, fit, 6))
+
+@requires_rpy2
+@pytest.mark.parametrize('y', [AIR_PASSENGERS, np.log(AIR_PASSENGERS), RANDOM_WALK,
+                               AIR_PASSENGERS[:30], INTERMITTENT,
+                               np.random.default_rng(0).poisson(0.3, 40).astype(np.float64)])
+def test_matches_r_auto_arima(y):
+    from rpy2.robjects.packages import isinstalled
+    if not isinstalled('forecast'):
+        pytest.skip('R package forecast is not installed')
+    from fforma.base._models_r import fit_forecast_model, get_forecast
+
+    kwargs = {'stepwise': False, 'approximation': False}
+    fitted = fit_forecast_model(y, 12, 'auto.arima', **kwargs)
+    p, q, P, Q, m, d, D = np.asarray(fitted.rx2('arma'), dtype=int)
+    model = AutoARIMA(12, **kwargs).fit(None, y)
+
+    assert model.model_['order'] == (p, d, q)
+    assert model.model_['seasonal_order'] == (P, D, Q)
+    np.testing.assert_allclose(model.predict(np.empty(18)), get_forecast(fitted, 18),
+                               rtol=1e-3)
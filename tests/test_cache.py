@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+
+from fforma.base import ARIMA, TBATS, AutoARIMA
+from fforma.base._cache import ForecastCache, model_key
+from fforma.base.trainer import BaseModelsTrainer
+
+
+class _Level:
+    """Forecasts a constant level given as a keyword argument."""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def fit(self, X, y):
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.kwargs['level'], dtype=np.float64)
+
+def _panel(n_series=3, length=12):
+    return pd.DataFrame({'unique_id': np.repeat(np.arange(n_series), length),
+                         'ds': np.tile(np.arange(length), n_series),
+                         'y': np.arange(n_series * length, dtype=np.float64)})
+
+def test_kwargs_change_the_model_key():
+    assert model_key(ARIMA(12)) == model_key(ARIMA(12))
+    assert model_key(ARIMA(12)) != model_key(ARIMA(12, stepwise=False, approximation=False))
+    assert model_key(TBATS(12)) != model_key(TBATS(12, seasonal_periods=3))
+    assert model_key(AutoARIMA(12)) != model_key(AutoARIMA(12, stepwise=False))
+
+def test_fitted_attributes_do_not_change_the_model_key():
+    model = _Level(level=1.)
+    key = model_key(model)
+    model.fitted_ = np.arange(3)
+
+    assert model_key(model) == key
+
+def test_rerun_with_other_kwargs_misses_the_cache(tmp_path):
+    cache = ForecastCache(tmp_path)
+
+    def run(level):
+        trainer = BaseModelsTrainer({'level': _Level(level=level)}, scheduler='threads',
+                                    partitions=1, cache=cache)
+        forecasts = trainer.fit_predict(None, _panel(), 2)['level'].values
+
+        return forecasts, trainer.cache_hits_
+
+    for level, hits in [(1., 0), (1., 3), (2., 0)]:
+        forecasts, cache_hits = run(level)
+        np.testing.assert_array_equal(forecasts, level)
+        assert cache_hits == hits
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from importlib.util import find_spec
+
+import numpy as np
+import pytest
+
+from fforma.base import AutoETS
+from fforma.base._ets import _COMPONENTS, _etscalc, _ets_forecast
+from test_panel_r_engines import AIR_PASSENGERS, RANDOM_WALK
+
+# Intermittent demand with zeros
+INTERMITTENT = np.array([0, 0, 3, 0, 1, 0, 0, 2, 0, 0, 0, 4,
+                         0, 1, 0, 0, 0, 2, 0, 0, 5, 0, 0, 1], dtype=np.float64)
+
+requires_rpy2 = pytest.mark.skipif(find_spec('rpy2') is None, reason='rpy2 is not installed')
+
+
+def _reference(y, x, m, error, trend, season, alpha, beta, gamma, phi, h):
+    """Error correction form of Hyndman et al. (2008), -2 loglik of forecast::ets."""
+    l = x[0]
+    b = x[1] if trend != 'N' else 0.
+    s = list(x[1 + (trend != 'N'):])
+    phi = phi if trend != 'N' else 0.
+    errors, means = [], []
+    for obs in y:
+        q = l + phi * b
+        seasonal = s[-1] if season != 'N' else (1. if season == 'M' else 0.)
+        mu = q * seasonal if season == 'M' else q + (seasonal if season == 'A' else 0.)
+        e = obs - mu if error == 'A' else (obs - mu) / mu
+        # Change of the one step forecast due to the error
+        scale = 1. if error == 'A' else mu
+        if season == 'M':
+            l, b = q + alpha * scale * e / seasonal, phi * b + beta * scale * e / seasonal
+            s = [seasonal + gamma * scale * e / q] + s[:-1]
+        else:
+            l, b = q + alpha * scale * e, phi * b + beta * scale * e
+            if season == 'A':
+                s = [seasonal + gamma * scale * e] + s[:-1]
+        errors.append(e)
+        means.append(mu)
+
+    lik = len(y) * np.log(np.sum(np.square(errors)))
+    if error == 'M':
+        lik += 2 * np.sum(np.log(np.abs(means)))
+    steps = np.cumsum(phi ** np.arange(1, h + 1)) if trend != 'N' else np.zeros(h)
+    y_hat = l + steps * b
+    if season == 'A':
+        y_hat = y_hat + np.array(s)[m - 1 - np.arange(h) % m]
+    elif season == 'M':
+        y_hat = y_hat * np.array(s)[m - 1 - np.arange(h) % m]
+
+    return lik, y_hat
+
+@pytest.mark.parametrize('error, trend, season, damped', [
+    ('A', 'N', 'N', False), ('A', 'A', 'N', True), ('A', 'A', 'A', False),
+    ('M', 'N', 'M', False), ('M', 'A', 'M', True), ('M', 'A', 'N', False),
+])
+def test_recursions_match_error_correction_form(error, trend, season, damped):
+    m, h = 12, 15
+    y = AIR_PASSENGERS
+    rng = np.random.default_rng(0)
+    x = [y[:12].mean()] + [1.] * (trend != 'N')
+    if season == 'A':
+        x += list(rng.normal(scale=10, size=m))
+    elif season == 'M':
+        x += list(rng.uniform(0.9, 1.1, size=m))
+    x = np.array(x)
+    alpha, beta, gamma, phi = 0.6, 0.05, 0.1, 0.95 if damped else 1.
+    codes = (_COMPONENTS[error], _COMPONENTS[trend], _COMPONENTS[season])
+
+    lik, state = _etscalc(y, x, m, *codes, alpha, beta, gamma, phi)
+    expected_lik, expected = _reference(y, x, m, error, trend, season,
+                                        alpha, beta, gamma, phi, h)
+
+    np.testing.assert_allclose(lik, expected_lik, rtol=1e-10)
+    np.testing.assert_allclose(_ets_forecast(state, m, codes[1], codes[2], phi, h),
+                               expected, rtol=1e-10)
+
+def test_air_passengers_matches_forecast_ets():
+    # Printed output of forecast::ets(AirPassengers): ETS(M,Ad,M) with
+    # alpha = 0.7096, beta = 0.0204, gamma = 1e-04, phi = 0.98 (4 digits)
+    model = AutoETS(12).fit(None, AIR_PASSENGERS)
+    params = model.model_['params']
+
+    assert model.components_ == 'MAdM'
+    np.testing.assert_allclose([params[name] for name in ('alpha', 'beta', 'gamma', 'phi')],
+                               [0.7096, 0.0204, 1e-4, 0.98], atol=5e-5)
+
+def test_constant_series_is_naive():
+    # forecast::ets returns ses(y, alpha=0.99999) for constant series
+    model = AutoETS(12).fit(None, np.full(30, 7.))
+
+    assert model.components_ == 'ANN'
+    np.testing.assert_array_equal(model.predict(np.empty(5)), 7.)
+
+@pytest.mark.parametrize('y', [[5.], [5., 7.], [1., 2., 4.]])
+def test_tiny_series_use_holt_winters(y):
+    model = AutoETS(12).fit(None, np.array(y))
+    y_hat = model.predict(np.empty(5))
+
+    assert model.components_ in ('ANN', 'AAN')
+    assert np.all(np.isfinite(y_hat))
+    if len(y) == 1:
+        np.testing.assert_array_equal(y_hat, y[0])
+
+@pytest.mark.parametrize('y', [INTERMITTENT, RANDOM_WALK - 60])
+def test_non_positive_series_only_use_additive_components(y):
+    model = AutoETS(12).fit(None, y)
+
+    assert 'M' not in model.components_
+    assert np.all(np.isfinite(model.predict(np.empty(12))))
+
+def test_additive_models_are_translation_equivariant():
+    # Negative series only have additive models, their fits shift with the data
+    y = RANDOM_WALK - 60
+    y_hat = AutoETS(12).fit(None, y).predict(np.empty(12))
+    shifted = AutoETS(12).fit(None, y - 100).predict(np.empty(12))
+
+    # up to the tolerance of Nelder-Mead
+    np.testing.assert_allclose(shifted, y_hat - 100, atol=1e-3)
+
+@requires_rpy2
+@pytest.mark.parametrize('y', [AIR_PASSENGERS, np.log(AIR_PASSENGERS), RANDOM_WALK,
+                               AIR_PASSENGERS[:30], INTERMITTENT])
+def test_matches_r_ets(y):
+    from rpy2.robjects.packages import isinstalled
+    if not isinstalled('forecast'):
+        pytest.skip('R package forecast is not installed')
+    from fforma.base._models_r import fit_forecast_model, get_forecast
+
+    fitted = fit_forecast_model(y, 12, 'ets')
+    method = str(fitted.rx2('method')[0])
+    par = dict(zip(fitted.rx2('par').names, fitted.rx2('par')))
+    model = AutoETS(12).fit(None, y)
+    error, trend, season, damped = model.model_['components']
+
+    assert method == f'ETS({error},{trend}{"d" if damped else ""},{season})'
+    for name, value in model.model_['params'].items():
+        np.testing.assert_allclose(value, par[name], atol=1e-3)
+    np.testing.assert_allclose(model.predict(np.empty(18)), get_forecast(fitted, 18),
+                               rtol=1e-3)
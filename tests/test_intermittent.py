@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+from fforma.base import ADIDA, Croston, TSB, iMAPA, to_panel
+from fforma.base._models import (_aggregate_panel, _ses_levels, adida_panel, imapa_panel,
+                                 intervals, mean_intervals, ses)
+from test_ets import INTERMITTENT
+
+SERIES = [INTERMITTENT, np.r_[INTERMITTENT, 0., 0., 0.], np.array([0., 0., 4., 0., 0.]),
+          np.random.default_rng(0).poisson(0.4, 60).astype(np.float64)]
+
+
+def _intervals(x):
+    """Loop of the original implementation."""
+    y, ctr = [], 1
+    for val in x:
+        if val == 0:
+            ctr += 1
+        else:
+            y.append(ctr)
+            ctr = 1
+
+    return np.array(y)
+
+def _ses(a, x):
+    """Loop of the original implementation, fitted values and forecast."""
+    y = np.empty(x.size + 1)
+    y[0] = x[0]
+    for i, val in enumerate(x):
+        y[i + 1] = a * val + (1 - a) * y[i]
+
+    return y[:-1], y[-1]
+
+def _tsb(y):
+    """Grid search of the original implementation."""
+    n, p, z = len(y), (y != 0).astype(int), y[y > 0]
+    forecasts, mses = [], []
+    for a in [0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.5, 0.8]:
+        for b in [0.01, 0.02, 0.03, 0.05, 0.1, 0.2, 0.3]:
+            zfit, pfit = np.empty(n), np.empty(n)
+            zfit[0], pfit[0] = z[0], p[0]
+            for i in range(1, n):
+                pfit[i] = pfit[i - 1] + a * (p[i] - pfit[i - 1])
+                zfit[i] = zfit[i - 1] if p[i] == 0 else zfit[i - 1] + b * (y[i] - zfit[i - 1])
+            yfit = pfit * zfit
+            forecasts.append(yfit[-1])
+            yfit = np.roll(yfit, 1)
+            yfit[0] = np.nan
+            mses.append(np.nanmean((yfit - y) ** 2))
+
+    return forecasts[int(np.argmin(mses))]
+
+@pytest.mark.parametrize('y', SERIES)
+def test_intervals(y):
+    np.testing.assert_array_equal(intervals(y), _intervals(y))
+
+@pytest.mark.parametrize('a', [0.1, 0.25, 0.8])
+def test_ses(a):
+    x = SERIES[3]
+    fitted, forecast = _ses(a, x)
+
+    np.testing.assert_allclose(_ses_levels(a, x), np.r_[fitted, forecast], rtol=1e-12)
+    np.testing.assert_allclose(ses(a, x, 3, 'train'), np.mean((fitted - x) ** 2), rtol=1e-12)
+    np.testing.assert_allclose(ses(a, x, 3, None)['mean'], forecast, rtol=1e-12)
+
+@pytest.mark.parametrize('kind, mult', [('classic', 1.), ('sba', 0.95)])
+@pytest.mark.parametrize('y', SERIES)
+def test_croston(y, kind, mult):
+    _, demand = _ses(0.1, y[y > 0])
+    _, interval = _ses(0.1, _intervals(y).astype(np.float64))
+
+    model = Croston(kind).fit(None, y)
+
+    np.testing.assert_allclose(model.predict(np.empty(3)), mult * demand / interval, rtol=1e-12)
+
+@pytest.mark.parametrize('y', SERIES)
+def test_tsb(y):
+    np.testing.assert_allclose(TSB().fit(None, y).predict(np.empty(3)), _tsb(y), rtol=1e-12)
+
+def test_series_without_demand():
+    y = np.zeros(10)
+
+    np.testing.assert_array_equal(Croston().fit(None, y).predict(np.empty(3)), 0.)
+    np.testing.assert_array_equal(TSB().fit(None, y).predict(np.empty(3)), 0.)
+
+def _sexps(x):
+    """SES with the alpha of the original implementation (L-BFGS-B)."""
+    mse = lambda a: np.mean((_ses(a.item(), x)[0] - x) ** 2)
+    a = minimize(mse, x0=0, bounds=[(0.1, 0.3)], method='L-BFGS-B').x[0]
+
+    return _ses(a, x)[1]
+
+def _aggregate(y, level):
+    """Sums of chunks of the original implementation."""
+    y = y[len(y) % level:]
+
+    return np.array([y[i:i + level].sum() for i in range(0, len(y), level)])
+
+def test_aggregate_panel():
+    values, indptr = to_panel(SERIES)
+    series, levels = np.array([0, 1, 1, 3]), np.array([2, 3, 1, 5])
+
+    agg_values, agg_indptr = _aggregate_panel(values, indptr, series, levels)
+
+    for p, (i, level) in enumerate(zip(series, levels)):
+        np.testing.assert_allclose(agg_values[agg_indptr[p]:agg_indptr[p + 1]],
+                                   _aggregate(SERIES[i], level))
+
+def test_mean_intervals():
+    values, indptr = to_panel(SERIES + [np.zeros(4)])
+
+    np.testing.assert_allclose(mean_intervals(values, indptr),
+                               [_intervals(y).mean() for y in SERIES] + [np.nan])
+
+@pytest.mark.parametrize('y', SERIES)
+def test_adida_and_imapa(y):
+    max_level = int(round(_intervals(y).mean()))
+    level_forecasts = [_sexps(_aggregate(y, level)) / level
+                       for level in range(1, max_level + 1)]
+
+    np.testing.assert_allclose(ADIDA().fit(None, y).predict(np.empty(3)),
+                               level_forecasts[-1], rtol=1e-5)
+    np.testing.assert_allclose(iMAPA().fit(None, y).predict(np.empty(3)),
+                               np.mean(level_forecasts), rtol=1e-5)
+
+def test_adida_and_imapa_panels():
+    values, indptr = to_panel(SERIES + [np.zeros(4)])
+    imapa, _ = imapa_panel(values, indptr)
+
+    np.testing.assert_allclose(adida_panel(values, indptr),
+                               [ADIDA().fit(None, y).al_.item() for y in SERIES] + [0.])
+    np.testing.assert_allclose(imapa, [np.mean(iMAPA().fit(None, y).frc_)
+                                       for y in SERIES] + [0.])
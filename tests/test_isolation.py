@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import signal
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fforma.base import Naive
+from fforma.base._isolation import run_isolated
+from fforma.base.trainer import BaseModelsTrainer
+
+
+class _Flaky:
+    """Mean model that hangs on series ending in 1 and fails on series ending in 2."""
+
+    def fit(self, X, y):
+        if y[-1] == 1:
+            time.sleep(60)
+        if y[-1] == 2:
+            raise ValueError('series ending in 2')
+        self.mean_ = float(np.mean(y))
+
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.mean_)
+
+def _crash():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+def _panel(lasts=(0., 1., 2.), length=10):
+    y = np.tile(np.arange(3., 3. + length), (len(lasts), 1))
+    y[:, -1] = lasts
+    return pd.DataFrame({'unique_id': np.repeat(np.arange(len(lasts)), length),
+                         'ds': np.tile(np.arange(length), len(lasts)),
+                         'y': y.ravel()})
+
+def test_run_isolated():
+    assert run_isolated(sum, ([1, 2],)) == ('ok', 3)
+    assert run_isolated(int, ('a',))[0] == 'error'
+    assert run_isolated(time.sleep, (60,), timeout=0.5)[0] == 'timeout'
+    assert run_isolated(_crash, ())[0] == 'crash'
+
+def test_failed_tasks_use_the_fallback():
+    trainer = BaseModelsTrainer({'flaky': _Flaky()}, scheduler='threads', partitions=1,
+                                timeout=1., fallback=Naive())
+    start = time.monotonic()
+    forecasts = trainer.fit_predict(None, _panel(), 2)
+
+    assert time.monotonic() - start < 30
+    y_hat = forecasts['flaky'].values.reshape(3, 2)
+    np.testing.assert_allclose(y_hat[0], np.mean(np.r_[np.arange(3., 12.), 0.]))
+    np.testing.assert_allclose(y_hat[1:], [[1., 1.], [2., 2.]])
+    fallbacks = trainer.fallbacks_.set_index('unique_id')
+    assert sorted(fallbacks.index) == [1, 2]
+    assert fallbacks.loc[1, 'reason'].startswith('timeout')
+    assert 'series ending in 2' in fallbacks.loc[2, 'reason']
+
+def test_fallback_by_model_name():
+    trainer = BaseModelsTrainer({'flaky': _Flaky()}, scheduler='threads', partitions=1,
+                                fallback={'flaky': Naive()})
+    forecasts = trainer.fit_predict(None, _panel(lasts=(0., 2.)), 2)
+
+    np.testing.assert_allclose(forecasts['flaky'].values[2:], 2.)
+
+def test_failure_without_fallback_raises():
+    trainer = BaseModelsTrainer({'flaky': _Flaky()}, scheduler='threads', partitions=1)
+
+    with pytest.raises(Exception, match='series ending in 2'):
+        trainer.fit_predict(None, _panel(lasts=(0., 2.)), 2)
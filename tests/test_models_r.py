@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from importlib.util import find_spec
+
+import numpy as np
+import pytest
+
+from fforma.base import _models_r
+from fforma.base._models_r import (ARIMA, ETS, _r_function, _to_r, fit_forecast_model,
+                                   get_forecast)
+
+requires_rpy2 = pytest.mark.skipif(find_spec('rpy2') is None, reason='rpy2 is not installed')
+
+
+@requires_rpy2
+def test_list_freq_round_trip():
+    identity = _r_function('function(x) x')
+    freq = list(identity(_to_r([7, 365.25])))
+
+    assert freq == [7, 365.25]
+
+@requires_rpy2
+def test_numpy_scalar_h_round_trip():
+    is_h = _r_function('function(h) is.numeric(h) && length(h) == 1 && h == 3')
+
+    assert is_h(_to_r(np.int64(3)))[0]
+
+@requires_rpy2
+def test_forecast_with_list_freq_and_numpy_h():
+    from rpy2.robjects.packages import isinstalled
+    if not isinstalled('forecast'):
+        pytest.skip('R package forecast is not installed')
+    t = np.arange(60)
+    y = 10 + np.sin(2 * np.pi * t / 7) + np.sin(2 * np.pi * t / 14)
+
+    fitted_model = fit_forecast_model(y, [7, 14], 'snaive', h=np.int64(5))
+    y_hat = get_forecast(fitted_model, np.int64(5))
+
+    assert y_hat.shape == (5,)
+    np.testing.assert_allclose(y_hat, y[-14:-9])
+
+@pytest.mark.parametrize('model, refit_kwargs', [
+    (ARIMA(12, stepwise=False, approximation=False, biasadj=True), {'biasadj': True}),
+    (ETS(12, damped=True, alpha=0.2), {'damped': True, 'alpha': 0.2}),
+])
+def test_update_refits_with_the_kwargs_of_the_fit(monkeypatch, model, refit_kwargs):
+    calls = []
+
+    def fit_forecast_model(y, freq, model_name, **kwargs):
+        calls.append((model_name, kwargs))
+
+        return len(calls)
+
+    monkeypatch.setattr(_models_r, 'fit_forecast_model', fit_forecast_model)
+    y = np.arange(30, dtype=np.float64)
+    model.fit(None, y[:24]).update(None, y)
+
+    assert calls == [(model.model, model.kwargs),
+                     (model.refit_model, {'model': 1, **refit_kwargs})]
+
+@requires_rpy2
+def test_full_forecast_matches_the_forecast():
+    from rpy2.robjects.packages import isinstalled
+    if not isinstalled('forecast'):
+        pytest.skip('R package forecast is not installed')
+    y = 10 + np.sin(np.arange(48)) + np.arange(48) / 10
+    model = ETS(12).fit(None, y)
+
+    full = model.predict_full(np.empty(6), level=(80, 95))
+
+    np.testing.assert_allclose(full['mean'], model.predict(np.empty(6)))
+    assert np.all(full['lower'][:, 1] <= full['lower'][:, 0])
+    assert np.all(full['upper'][:, 0] <= full['upper'][:, 1])
+    np.testing.assert_allclose(full['fitted'] + full['residuals'], y)
+    assert np.isfinite([full['aic'], full['aicc'], full['bic']]).all()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fforma.base import (Naive, SeasonalNaive, Naive2, RandomWalkDrift, Average,
+                         MovingAverage, SeasonalMovingAverage, fit_panel,
+                         predict_panel, take_panel, to_panel)
+from fforma.base.trainer import BaseModelsTrainer
+
+H = 10
+
+# Series of different lengths, all longer than three seasons of 4
+SERIES = [10 + np.random.default_rng(seed).gamma(2., size=length)
+          for seed, length in enumerate([13, 20, 27, 40])]
+
+PANEL_MODELS = [Naive(), SeasonalNaive(4), Naive2(4), Naive2(12), RandomWalkDrift(),
+                Average(), MovingAverage(3), SeasonalMovingAverage(4, n_seasons=3)]
+
+
+def _per_series(model, series, h):
+    return np.array([model.fit(None, y).predict(np.empty(h)) for y in series])
+
+def test_to_panel():
+    values, indptr = to_panel(SERIES)
+
+    np.testing.assert_array_equal(indptr, np.cumsum([0] + [len(y) for y in SERIES]))
+    for i, y in enumerate(SERIES):
+        np.testing.assert_array_equal(values[indptr[i]:indptr[i + 1]], y)
+
+def test_take_panel():
+    values, indptr = to_panel(SERIES)
+    taken_values, taken_indptr = take_panel(values, indptr, np.array([3, 1]))
+    expected_values, expected_indptr = to_panel([SERIES[3], SERIES[1]])
+
+    np.testing.assert_array_equal(taken_values, expected_values)
+    np.testing.assert_array_equal(taken_indptr, expected_indptr)
+
+@pytest.mark.parametrize('model', PANEL_MODELS, ids=repr)
+def test_panel_engine_matches_per_series_model(model):
+    values, indptr = to_panel(SERIES)
+    y_hat = predict_panel(model, fit_panel(model, values, indptr), H)
+
+    np.testing.assert_allclose(y_hat, _per_series(model, SERIES, H), rtol=1e-10)
+
+def test_trainer_panel_models_match_per_series_models():
+    models = {repr(model): model for model in PANEL_MODELS}
+    y = pd.DataFrame({'unique_id': np.repeat(np.arange(len(SERIES)), [len(s) for s in SERIES]),
+                      'ds': np.concatenate([np.arange(len(s)) for s in SERIES]),
+                      'y': np.concatenate(SERIES)})
+    forecasts = BaseModelsTrainer(models, scheduler='threads',
+                                  partitions=1).fit_predict(None, y, H)
+
+    for model_name, model in models.items():
+        np.testing.assert_allclose(forecasts[model_name].values.reshape(len(SERIES), H),
+                                   _per_series(model, SERIES, H), rtol=1e-10)
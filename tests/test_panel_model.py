@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fforma.base import Naive, RandomWalkDrift
+from fforma.base._models import PanelModel
+
+
+class _NanAfterFirst:
+    """Forecasts the last value and NaN after the first step."""
+
+    def fit(self, X, y):
+        self.last_ = float(y[-1])
+
+        return self
+
+    def predict(self, X):
+        y_hat = np.full(len(X), np.nan)
+        y_hat[0] = self.last_
+
+        return y_hat
+
+    def get_params(self, deep=True):
+        return {}
+
+def _frames(uids, lengths, h):
+    """Train y and test X with the rows of the series interleaved (sorted by ds)."""
+    rng = np.random.default_rng(0)
+    train = pd.DataFrame({'unique_id': np.repeat(uids, lengths),
+                          'ds': np.concatenate([np.arange(n) for n in lengths]),
+                          'y': rng.normal(size=sum(lengths))})
+    test = pd.DataFrame({'unique_id': np.repeat(uids, h),
+                         'ds': np.concatenate([np.arange(n, n + h) for n in lengths]),
+                         'x': 0.})
+    train = train.sort_values('ds', kind='mergesort').set_index(['unique_id', 'ds'])
+    test = test.sort_values('ds', kind='mergesort').set_index(['unique_id', 'ds'])
+
+    return train[['y']].assign(x=0.)[['x']], train[['y']], test
+
+@pytest.mark.parametrize('scheduler, partitions', [('synchronous', 1), ('threads', 2),
+                                                   ('threads', 10)])
+def test_panel_model_matches_per_series_fits(scheduler, partitions):
+    uids, lengths = ['b', 'a', 'c'], [5, 8, 3]
+    X, y, X_test = _frames(uids, lengths, 4)
+
+    model = PanelModel(RandomWalkDrift(), scheduler=scheduler, partitions=partitions)
+    y_hat = model.fit(X, y).predict(X_test)
+
+    assert y_hat.index.is_monotonic_increasing
+    for uid in uids:
+        y_uid = y.loc[uid].sort_index()['y'].values
+        expected = RandomWalkDrift().fit(None, y_uid).predict(np.empty(4))
+        np.testing.assert_allclose(y_hat.loc[uid].values, expected)
+
+def test_fill_na_uses_the_mean_of_the_series():
+    X, y, X_test = _frames(['a', 'b'], [5, 6], 3)
+
+    y_hat = PanelModel(_NanAfterFirst()).fit(X, y).predict(X_test)
+    y_hat_na = PanelModel(_NanAfterFirst(), fill_na=False).fit(X, y).predict(X_test)
+
+    for uid in ['a', 'b']:
+        y_uid = y.loc[uid].sort_index()['y'].values
+        np.testing.assert_allclose(y_hat.loc[uid].values, [y_uid[-1]] + [y_uid.mean()] * 2)
+        assert y_hat_na.loc[uid].isna().sum() == 2
+
+def test_unknown_uids_fail():
+    X, y, X_test = _frames(['a', 'b'], [5, 6], 3)
+
+    with pytest.raises(AssertionError):
+        PanelModel(Naive()).fit(X, y.drop('b', level='unique_id'))
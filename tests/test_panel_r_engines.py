@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from importlib.util import find_spec
+
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+from scipy.stats import norm
+from statsmodels.tsa.seasonal import seasonal_decompose
+from statsmodels.tsa.stattools import acf
+
+from fforma.base import (NaiveR, RandomWalk, RandomWalkDrift, SeasonalNaiveR, ThetaF,
+                         fit_panel, predict_panel, to_panel)
+
+# datasets::AirPassengers, monthly from 1949
+AIR_PASSENGERS = np.array([
+    112, 118, 132, 129, 121, 135, 148, 148, 136, 119, 104, 118,
+    115, 126, 141, 135, 125, 149, 170, 170, 158, 133, 114, 140,
+    145, 150, 178, 163, 172, 178, 199, 199, 184, 162, 146, 166,
+    171, 180, 193, 181, 183, 218, 230, 242, 209, 191, 172, 194,
+    196, 196, 236, 235, 229, 243, 264, 272, 237, 211, 180, 201,
+    204, 188, 235, 227, 234, 264, 302, 293, 259, 229, 203, 229,
+    242, 233, 267, 269, 270, 315, 364, 347, 312, 274, 237, 278,
+    284, 277, 317, 313, 318, 374, 413, 405, 355, 306, 271, 306,
+    315, 301, 356, 348, 355, 422, 465, 467, 404, 347, 305, 336,
+    340, 318, 362, 348, 363, 435, 491, 505, 404, 359, 310, 337,
+    360, 342, 406, 396, 420, 472, 548, 559, 463, 407, 362, 405,
+    417, 391, 419, 461, 472, 535, 622, 606, 508, 461, 390, 432], dtype=np.float64)
+
+# Tolerances: closed forms are exact. thetaf minimizes the MSE of SES,
+# the engine and the reference below find the same optimum up to RTOL_SES.
+# forecast::ses stops Nelder-Mead earlier, so R itself is matched to RTOL_R.
+RTOL_SES = 1e-5
+RTOL_R = 1e-2
+
+# Noisy random walk, its seasonality test (m=12) fails
+_RNG = np.random.default_rng(3)
+RANDOM_WALK = 50 + 0.5 * _RNG.normal(size=60).cumsum() + _RNG.normal(size=60)
+
+requires_forecast = pytest.mark.skipif(find_spec('rpy2') is None,
+                                       reason='rpy2 is not installed')
+
+
+def _panel_forecasts(model, ys, h):
+    values, indptr = to_panel(ys)
+
+    return predict_panel(model, fit_panel(model, values, indptr), h)
+
+def _ses(x):
+    """forecast::ses: alpha and initial level minimizing the MSE, last level."""
+    def levels(params):
+        alpha, level = params
+        fitted = np.empty(len(x))
+        for t, value in enumerate(x):
+            fitted[t] = level
+            level += alpha * (value - level)
+
+        return fitted, level
+
+    def mse(params):
+        return np.mean((x - levels(params)[0]) ** 2)
+
+    starts = [(alpha, x[0]) for alpha in (0.05, 0.3, 0.6, 0.95)]
+    fits = [minimize(mse, start, method='L-BFGS-B',
+                     bounds=[(1e-4, 0.9999), (None, None)],
+                     options={'ftol': 1e-15, 'gtol': 1e-10, 'maxiter': 10_000})
+            for start in starts]
+    best = min(fits, key=lambda fit: fit.fun)
+
+    return best.x[0], levels(best.x)[1]
+
+def _thetaf(x, m, h):
+    """Transcription of forecast::thetaf (forecast 8.x)."""
+    n = len(x)
+    seasonal = False
+    if m > 1 and np.ptp(x) > 0 and n > 2 * m:
+        r = acf(x, nlags=m, fft=False)[1:]
+        stat = np.sqrt((1 + 2 * np.sum(r[:-1] ** 2)) / n)
+        seasonal = np.abs(r[-1]) / stat > norm.ppf(0.95)
+    if seasonal:
+        figure = seasonal_decompose(x, model='multiplicative', period=m).seasonal
+        x = x / figure
+    alpha, level = _ses(x)
+    drift = np.polyfit(np.arange(n), x, 1)[0] / 2
+    y_hat = level + drift * (np.arange(h) + (1 - (1 - alpha) ** n) / alpha)
+    if seasonal:
+        y_hat = y_hat * figure[n - m:][np.arange(h) % m]
+
+    return y_hat
+
+def test_naive_r_is_rwf():
+    y_hat = _panel_forecasts(NaiveR(12), [AIR_PASSENGERS, AIR_PASSENGERS[:5]], 3)
+
+    np.testing.assert_array_equal(y_hat, [[432.] * 3, [121.] * 3])
+
+def test_seasonal_naive_r_is_snaive():
+    y_hat = _panel_forecasts(SeasonalNaiveR(12), [AIR_PASSENGERS], 15)
+
+    np.testing.assert_array_equal(y_hat[0], np.r_[AIR_PASSENGERS[-12:], AIR_PASSENGERS[-12:-9]])
+
+def test_random_walk_drift_is_rwf_drift():
+    y_hat = _panel_forecasts(RandomWalk(12, drift=True), [AIR_PASSENGERS], 3)
+
+    # rwf(AirPassengers, h=3, drift=TRUE)$mean: 432 + h * (432 - 112) / 143
+    np.testing.assert_allclose(y_hat[0], [434.2377622, 436.4755245, 438.7132867])
+
+def test_random_walk_drift_needs_two_observations():
+    values, indptr = to_panel([AIR_PASSENGERS, AIR_PASSENGERS[:1]])
+
+    with pytest.raises(ValueError, match='at least 2 observations'):
+        fit_panel(RandomWalkDrift(), values, indptr)
+    with pytest.raises(ValueError, match='at least 2 observations'):
+        fit_panel(RandomWalk(12, drift=True), values, indptr)
+
+@pytest.mark.parametrize('y, m', [
+    (AIR_PASSENGERS, 12),          # seasonal
+    (np.log(AIR_PASSENGERS), 4),   # seasonal, other frequency
+    (AIR_PASSENGERS, 1),           # non seasonal frequency
+    (AIR_PASSENGERS[:20], 12),     # too short for the seasonality test
+    (RANDOM_WALK, 12),             # seasonality test fails
+])
+def test_thetaf_matches_reference(y, m):
+    h = 18
+
+    np.testing.assert_allclose(_panel_forecasts(ThetaF(m), [y], h)[0], _thetaf(y, m, h),
+                               rtol=RTOL_SES)
+
+def test_thetaf_constant_series():
+    y_hat = _panel_forecasts(ThetaF(12), [np.full(30, 7.)], 5)
+
+    np.testing.assert_allclose(y_hat, 7.)
+
+@requires_forecast
+@pytest.mark.parametrize('model, rtol', [
+    (NaiveR(12), 1e-12),
+    (SeasonalNaiveR(12), 1e-12),
+    (RandomWalk(12, drift=True), 1e-12),
+    (ThetaF(12), RTOL_R),
+])
+def test_engines_match_r(model, rtol):
+    from rpy2.robjects.packages import isinstalled
+    if not isinstalled('forecast'):
+        pytest.skip('R package forecast is not installed')
+    ys, h = [AIR_PASSENGERS, AIR_PASSENGERS[:30], RANDOM_WALK], 18
+    expected = [model.fit(None, y).predict(np.empty(h)) for y in ys]
+
+    np.testing.assert_allclose(_panel_forecasts(model, ys, h), expected, rtol=rtol)
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import pickle
+
+from fforma.base import WorkerPool
+from fforma.base.trainer import BaseModelsTrainer
+from test_rworker import _Pid, _panel
+
+
+def test_pool_starts_lazily_and_shuts_down():
+    pool = WorkerPool(n_workers=1)
+    assert pool.executor_ is None
+
+    with pool:
+        assert pool.executor_ is not None
+        copy = pickle.loads(pickle.dumps(pool))
+        assert copy.executor_ is None
+    assert pool.executor_ is None
+
+def test_workers_are_reused_across_trainers():
+    with WorkerPool(n_workers=2) as pool:
+        workers = set(pool.executor_._processes)
+        pids = [set(BaseModelsTrainer({'pid': _Pid()}, partitions=2, pool=pool)
+                    .fit_predict(None, _panel(), 2)['pid'].astype(int))
+                for _ in range(2)]
+
+    assert pids[0] | pids[1] <= workers
+    assert os.getpid() not in workers
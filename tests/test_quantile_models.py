@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pytest
+
+from fforma.base import (QuantileAutoRegression, MultiQuantileAutoRegression,
+                         qar_predict_batch)
+
+
+def _step_recursion(y, ar_terms, params, h):
+    """One step at a time recursion on the whole series (constant as last param)."""
+    y = list(y)
+    for _ in range(h):
+        lags = [y[-k] for k in ar_terms]
+        y.append(np.dot(lags, params[:len(ar_terms)]) + params[-1])
+
+    return np.array(y[-h:])
+
+@pytest.fixture
+def short_series():
+    # Shorter than 2 * max(ar_terms)
+    rng = np.random.default_rng(0)
+    t = np.arange(22)
+
+    return 8 + np.sin(2 * np.pi * t / 7) + rng.normal(scale=0.3, size=len(t))
+
+@pytest.mark.parametrize('tau', [0.3, 0.5, 0.9])
+def test_short_series_forecasts_match_step_recursion(short_series, tau):
+    ar_terms, h = [7, 14], 10
+    model = QuantileAutoRegression(tau, ar_terms, max_diffs=0).fit(None, short_series)
+    expected = _step_recursion(short_series, ar_terms, model.model_.params, h)
+
+    np.testing.assert_allclose(model.predict(np.empty(h)), expected)
+    np.testing.assert_allclose(qar_predict_batch([model], h)[0], expected)
+
+def test_short_series_multi_output_matches_step_recursion(short_series):
+    ar_terms, taus, h = [7, 14], [0.3, 0.9], 10
+    model = MultiQuantileAutoRegression(taus, ar_terms, max_diffs=0, variants=('ar',))
+    y_hat = model.fit(None, short_series).predict(np.empty(h))
+
+    for i, fit in enumerate(model.models_[False]['models']):
+        expected = _step_recursion(short_series, ar_terms, fit.params, h)
+        np.testing.assert_allclose(y_hat[:, i], expected)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+
+from fforma.base import Croston, DemandRouter, Naive2, classify_demand, to_panel
+from fforma.base.trainer import BaseModelsTrainer
+
+# Series of each class with their ADI and CV² of the non zero demands
+CASES = {
+    # ADI 1, CV² 0.009
+    'smooth': np.tile([5., 6.], 6),
+    # ADI 1, CV² 0.89
+    'erratic': np.tile([1., 20.], 6),
+    # ADI 3, CV² 0
+    'intermittent': np.tile([0., 0., 5.], 4),
+    # ADI 3, CV² 1.17
+    'lumpy': np.tile([0., 0., 1., 0., 0., 30.], 2),
+    'zero': np.zeros(12),
+    'constant': np.full(12, 3.),
+    'short': np.array([1., 4., 2.]),
+}
+
+
+def test_classify_known_cases():
+    values, indptr = to_panel(list(CASES.values()))
+
+    assert classify_demand(values, indptr).tolist() == list(CASES)
+
+def test_thresholds():
+    # ADI of 1.5 and CV² of 0.29
+    y = np.tile([0., 1., 3.], 4)
+    values, indptr = to_panel([y])
+
+    assert classify_demand(values, indptr)[0] == 'intermittent'
+    assert classify_demand(values, indptr, adi_threshold=1.6)[0] == 'smooth'
+    assert classify_demand(values, indptr, adi_threshold=1.6, cv2_threshold=0.2)[0] == 'erratic'
+    assert classify_demand(values, indptr, cv2_threshold=0.2)[0] == 'lumpy'
+    assert classify_demand(values, indptr, min_length=13)[0] == 'short'
+
+def test_routes():
+    classes = np.array(list(CASES))
+    routes = DemandRouter().routes({'croston': Croston(), 'naive2': Naive2(1)}, classes)
+
+    assert classes[routes['croston']].tolist() == ['intermittent', 'lumpy']
+    assert classes[routes['naive2']].tolist() == ['smooth', 'erratic']
+
+def test_trainer_routes_series():
+    y = pd.DataFrame({'unique_id': np.repeat(list(CASES), [len(s) for s in CASES.values()]),
+                      'ds': np.concatenate([np.arange(len(s)) for s in CASES.values()]),
+                      'y': np.concatenate(list(CASES.values()))})
+    models = {'croston': Croston(), 'naive2': Naive2(1)}
+    trainer = BaseModelsTrainer(models, scheduler='threads', partitions=1,
+                                router=DemandRouter())
+
+    forecasts = trainer.fit_predict(None, y, 2).groupby('unique_id').first()
+
+    assert trainer.demand_classes_.to_dict() == {uid: uid for uid in CASES}
+    assert forecasts.loc[['smooth', 'erratic'], 'croston'].isna().all()
+    assert forecasts.loc[['intermittent', 'lumpy'], 'naive2'].isna().all()
+    np.testing.assert_allclose(forecasts.loc['intermittent', 'croston'],
+                               Croston().fit(None, CASES['intermittent']).pred_)
+    np.testing.assert_allclose(forecasts.loc['smooth', 'naive2'], 6.)
+    for uid, value in [('zero', 0.), ('constant', 3.), ('short', 2.)]:
+        np.testing.assert_allclose(forecasts.loc[uid, ['croston', 'naive2']], value)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import socket
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fforma.base import ARIMA, RWorkerPool, forecast_dtype
+from fforma.base._rworker import (_decode_full_response, _decode_response, _set_row,
+                                  full_forecast_array)
+from fforma.base.trainer import BaseModelsTrainer
+
+
+class _StubPool(RWorkerPool):
+    """Pool that answers the batches without R and records their timeouts."""
+
+    def __init__(self, timeout=None):
+        super().__init__(n_workers=1, timeout=timeout)
+        self.calls = []
+
+    def start(self):
+        return self
+
+    def fit_predict(self, fit_expression, ys, freq, h, **kwargs):
+        self.calls.append((len(ys), self._batch_timeout(len(ys))))
+        y_hat = np.array([np.repeat(y[-1], max(h)) for y in ys])
+
+        return y_hat, [None] * len(ys)
+
+def _panel(n_series=3, length=20):
+    return pd.DataFrame({'unique_id': np.repeat(np.arange(n_series), length),
+                         'ds': np.tile(np.arange(length), n_series),
+                         'y': np.arange(n_series * length, dtype=np.float64)})
+
+def test_r_models_use_r_pool_with_timeout():
+    r_pool = _StubPool(timeout=100.)
+    trainer = BaseModelsTrainer({'ARIMA': ARIMA(freq=7)}, partitions=1,
+                                timeout=2., r_pool=r_pool)
+    forecasts = trainer.fit_predict(None, _panel(), 4)
+
+    # One batch of the 3 series with 2 seconds per series
+    assert r_pool.calls == [(3, 6.)]
+    np.testing.assert_allclose(forecasts['ARIMA'].values, np.repeat([19., 39., 59.], 4))
+
+def test_r_pool_timeout_caps_batch_timeout():
+    r_pool = _StubPool(timeout=5.)
+    BaseModelsTrainer({'ARIMA': ARIMA(freq=7)}, partitions=1,
+                      timeout=2., r_pool=r_pool).fit_predict(None, _panel(), 4)
+
+    assert r_pool.calls == [(3, 5.)]
+
+class _Pid:
+    """Forecasts the id of the process that fits it."""
+
+    def fit(self, X, y):
+        self.pid_ = os.getpid()
+
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.pid_, dtype=np.float64)
+
+def test_r_pool_keeps_the_scheduler_of_python_models():
+    r_pool = _StubPool()
+    trainer = BaseModelsTrainer({'ARIMA': ARIMA(freq=7), 'pid': _Pid()},
+                                scheduler='processes', partitions=1, r_pool=r_pool)
+    forecasts = trainer.fit_predict(None, _panel(), 4)
+
+    assert r_pool.calls == [(3, None)]
+    assert not np.any(forecasts['pid'].values == os.getpid())
+
+class _HangingPool(RWorkerPool):
+    """Pool whose requests time out if a series contains a negative value."""
+
+    def __init__(self):
+        super().__init__(n_workers=1)
+        self.requests = []
+
+    def _send(self, request, decode, n_series):
+        values = np.frombuffer(request[1], dtype='<f8')
+        self.requests.append(n_series)
+        if np.any(values < 0):
+            raise socket.timeout()
+        ys = np.split(values, n_series)
+        if decode is _decode_response:
+            return np.array([np.repeat(y[-1], 2) for y in ys]), [None] * n_series
+        full = np.empty(n_series, dtype=forecast_dtype(2, 1, len(ys[0])))
+        for name in full.dtype.names:
+            full[name] = np.nan
+        full['mean'] = [np.repeat(y[-1], 2) for y in ys]
+
+        return full, [None] * n_series
+
+@pytest.mark.parametrize('full', [False, True])
+def test_hanging_series_only_fails_itself(full):
+    r_pool = _HangingPool()
+    ys = [np.array([1., 2.]), np.array([-1., 3.]), np.array([4., 5.])]
+    if full:
+        y_hat, errors = r_pool.fit_predict_full('auto.arima(y_ts)', ys, 7, [2, 2, 2], [95])
+        y_hat = y_hat['mean']
+    else:
+        y_hat, errors = r_pool.fit_predict('auto.arima(y_ts)', ys, 7, [2, 2, 2])
+
+    assert r_pool.requests == [3, 1, 1, 1]
+    np.testing.assert_array_equal(y_hat, [[2., 2.], [np.nan, np.nan], [5., 5.]])
+    assert errors == [None, 'Error: R worker failed (timeout)', None]
+
+def test_full_forecast_array_reshapes_the_columns_of_r():
+    n, h, n_levels, length = 2, 3, 2, 4
+    mean = np.arange(n * h, dtype=np.float64)
+    lower = np.arange(n * h * n_levels, dtype=np.float64)
+    fitted = np.arange(n * length, dtype=np.float64)
+    ic = np.array([1., 2., 3., 4., 5., 6.])
+
+    full = full_forecast_array((n, h, n_levels, length), mean, lower, lower + 100,
+                               fitted, -fitted, ic)
+
+    assert full.dtype == forecast_dtype(h, n_levels, length)
+    np.testing.assert_array_equal(full['mean'][1], [3., 4., 5.])
+    np.testing.assert_array_equal(full['lower'][1, 0], [6., 7.])
+    np.testing.assert_array_equal(full['upper'][0, 2], [104., 105.])
+    np.testing.assert_array_equal(full['residuals'][1], [-4., -5., -6., -7.])
+    np.testing.assert_array_equal(full['aicc'], [2., 5.])
+
+def test_decode_full_response():
+    n, h, n_levels, length = 2, 2, 1, 3
+    columns = [np.arange(n * size, dtype='<f8')
+               for size in [h, h * n_levels, h * n_levels, length, length, 3]]
+    message = b'R error'
+    response = b''.join([np.array([n, h, n_levels, length], dtype='<i4').tobytes()] +
+                        [column.tobytes() for column in columns] +
+                        [np.array([0, len(message)], dtype='<i4').tobytes(), message])
+
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(response)
+        full, errors = _decode_full_response(right)
+
+    assert errors == [None, 'R error']
+    np.testing.assert_array_equal(full['mean'], [[0., 1.], [2., 3.]])
+    np.testing.assert_array_equal(full['fitted'][1], [3., 4., 5.])
+    np.testing.assert_array_equal(full['bic'], [2., 5.])
+
+def test_set_row_pads_shorter_series():
+    batch = np.full(2, np.nan, dtype=forecast_dtype(3, 1, 4))
+    result = np.zeros(1, dtype=forecast_dtype(2, 1, 2))
+    result['mean'] = [[1., 2.]]
+    result['fitted'] = [[5., 6.]]
+
+    _set_row(batch, 1, result)
+
+    np.testing.assert_array_equal(batch['mean'][1], [1., 2., np.nan])
+    np.testing.assert_array_equal(batch['fitted'][1], [5., 6., np.nan, np.nan])
+    assert np.isnan(batch['mean'][0]).all()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+
+from fforma.base import ARIMA, ETS, Naive2
+from fforma.base._scheduling import TaskCostModel, pack_tasks, schedule_tasks
+
+
+def test_pack_tasks_longest_first():
+    bins = pack_tasks(np.array([1., 5., 2., 4., 3.]), 2)
+
+    # 5 -> 0, 4 -> 1, 3 -> 1, 2 -> 0, 1 -> 0
+    np.testing.assert_array_equal(bins, [0, 0, 0, 1, 1])
+    loads = np.bincount(bins, weights=[1., 5., 2., 4., 3.])
+    np.testing.assert_array_equal(loads, [8., 7.])
+
+def test_prior_ranks_models():
+    cost_model = TaskCostModel()
+    lengths = np.array([100])
+
+    arima = cost_model.estimate('arima', ARIMA(1), lengths)
+    exhaustive = cost_model.estimate('arima', ARIMA(1, stepwise=False), lengths)
+    ets = cost_model.estimate('ets', ETS(1), lengths)
+
+    np.testing.assert_allclose(arima, 1.)
+    np.testing.assert_allclose(exhaustive, 10.)
+    assert ets < arima
+
+def test_cost_model_calibrates_to_timings():
+    models = {'naive2': Naive2(1)}
+    lengths = np.repeat([20, 50, 100, 400], 250)
+    timings = pd.DataFrame({'model': 'naive2', 'length': lengths, 'time': 1e-4 * lengths})
+
+    cost_model = TaskCostModel().update(timings, models)
+
+    np.testing.assert_allclose(cost_model.estimate('naive2', models['naive2'], [200]),
+                               2e-2, rtol=0.05)
+
+def test_schedule_tasks_covers_every_task_once():
+    panel_df = pd.DataFrame({'y': np.arange(6)}, index=pd.Index(list('abcdef'), name='unique_id'))
+    lengths = pd.Series([10, 200, 30, 400, 50, 60], index=panel_df.index)
+    models = {'arima': ARIMA(1), 'naive2': Naive2(1)}
+    tasks = {'arima': np.array([0, 1, 3]), 'naive2': np.arange(6)}
+
+    parts = schedule_tasks(panel_df, lengths, models, TaskCostModel(), 2, tasks)
+
+    scheduled = sorted((uid, model_name) for part in parts
+                       for uid, models_uid in part['models'].items()
+                       for model_name in models_uid)
+    expected = sorted([(uid, 'arima') for uid in 'abd'] + [(uid, 'naive2') for uid in 'abcdef'])
+    assert scheduled == expected
+    assert len(parts) == 2
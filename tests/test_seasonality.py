@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from math import sqrt
+
+import numpy as np
+import pytest
+from statsmodels.tsa.stattools import acf as sm_acf
+
+from fforma.base import to_panel
+from fforma.base._models import (_gather_padded, acf, acf_panel, deseasonalize_panel,
+                                 moving_averages, seasonality_test_panel)
+from test_panel_r_engines import AIR_PASSENGERS
+
+
+def _series():
+    rng = np.random.default_rng(0)
+    series = [AIR_PASSENGERS, AIR_PASSENGERS[:31], AIR_PASSENGERS[:50] + rng.normal(0, 30, 50)]
+    for length in [14, 25, 36, 47, 60]:
+        t = np.arange(length)
+        series.append(50 + 10 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 3, length))
+        series.append(50 + rng.normal(0, 3, length))
+
+    return series
+
+SERIES = _series()
+
+
+def _acf(data, k):
+    """Loop of the original implementation."""
+    m = np.mean(data)
+    s1 = sum((data[i] - m) * (data[i - k] - m) for i in range(k, len(data)))
+    s2 = sum((data[i] - m) ** 2 for i in range(len(data)))
+
+    return float(s1 / s2)
+
+def _seasonality_test(y, ppy):
+    """Original implementation."""
+    s = _acf(y, 1)
+    for i in range(2, ppy):
+        s = s + _acf(y, i) ** 2
+    limit = 1.645 * sqrt((1 + 2 * s) / len(y)) if 1 + 2 * s > 0 else 0
+
+    return abs(_acf(y, ppy)) > limit
+
+def _deseasonalize(y, ppy):
+    """Original implementation."""
+    if not _seasonality_test(y, ppy):
+        return np.ones(ppy)
+    le_ts = y * 100 / moving_averages(y, ppy)
+    le_ts = np.hstack((le_ts, np.full((ppy - (len(le_ts) % ppy)), np.nan)))
+    si = np.nanmean(np.reshape(le_ts, (-1, ppy)), 0)
+
+    return si / (np.sum(si) / (ppy * 100))
+
+def _padded(series):
+    values, indptr = to_panel(series)
+
+    return _gather_padded(values, indptr, np.arange(len(series)))
+
+def test_acf_panel_matches_statsmodels():
+    y = _padded(SERIES)
+    r = acf_panel(y, 13)
+
+    for i, series in enumerate(SERIES):
+        np.testing.assert_allclose(r[i], sm_acf(series, nlags=13, fft=False)[1:],
+                                   rtol=1e-9, atol=1e-12)
+
+def test_acf_panel_lags_longer_than_the_series():
+    series = [np.array([1., 3., 2.]), np.array([4., 1., 5., 2., 2.])]
+    r = acf_panel(_padded(series), 6)
+
+    for i, y in enumerate(series):
+        np.testing.assert_allclose(r[i], [_acf(y, k) for k in range(1, 7)], atol=1e-12)
+        assert acf(y, 2) == pytest.approx(_acf(y, 2))
+
+@pytest.mark.parametrize('ppy', [4, 12])
+def test_seasonality_test_panel(ppy):
+    seasonal = seasonality_test_panel(_padded(SERIES), ppy)
+
+    assert seasonal.tolist() == [_seasonality_test(y, ppy) for y in SERIES]
+    assert seasonal.any() and not seasonal.all()
+
+@pytest.mark.parametrize('ppy', [4, 12])
+def test_deseasonalize_panel(ppy):
+    values, indptr = to_panel(SERIES)
+    si = deseasonalize_panel(values, indptr, ppy)
+
+    np.testing.assert_allclose(si, [_deseasonalize(y, ppy) for y in SERIES], rtol=1e-10)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from fforma.base import Naive2, to_panel
+from fforma.base._shared import SharedPanel
+from fforma.base.trainer import BaseModelsTrainer
+from test_store import _Mean
+
+SERIES = [np.arange(5.), np.arange(10., 17.), np.array([3.])]
+
+
+def test_series_are_read_from_the_file(tmp_path):
+    values, indptr = to_panel(SERIES)
+
+    with SharedPanel(values, indptr, directory=tmp_path) as panel:
+        assert len(panel) == 3
+        assert os.path.dirname(panel.path) == str(tmp_path)
+        for pos, y in enumerate(SERIES):
+            np.testing.assert_array_equal(panel.series(pos), y)
+        assert not panel.series(0).flags.writeable
+    assert not os.path.exists(panel.path)
+
+def test_pickled_panel_maps_the_same_file(tmp_path):
+    values, indptr = to_panel(SERIES)
+
+    with SharedPanel(values, indptr, directory=tmp_path) as panel:
+        data = pickle.dumps(panel)
+        # Only the path is sent, not the values
+        assert len(data) < 500
+        copy = pickle.loads(data)
+        np.testing.assert_array_equal(copy.series(1), SERIES[1])
+        # Only the process that created the file removes it
+        copy.close()
+        assert os.path.exists(panel.path)
+
+def test_processes_match_threads():
+    rng = np.random.default_rng(0)
+    y = pd.DataFrame({'unique_id': np.repeat(np.arange(6), 20),
+                      'ds': np.tile(np.arange(20), 6),
+                      'y': rng.gamma(2., size=120)})
+    models = {'mean': _Mean(), 'naive2': Naive2(4)}
+
+    forecasts = [BaseModelsTrainer(models, scheduler=scheduler,
+                                   partitions=2).fit_predict(None, y, 3)
+                 for scheduler in ['threads', 'processes']]
+
+    pd.testing.assert_frame_equal(*forecasts)
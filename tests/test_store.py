@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from fforma.base import Naive, Naive2, Croston, TSB
+from fforma.base._store import FittedModels
+from fforma.base.trainer import BaseModelsTrainer
+
+
+class _Mean:
+    """Forecasts the mean of the series (stored as an object)."""
+
+    def fit(self, X, y):
+        self.mean_ = float(np.mean(y))
+
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.mean_)
+
+def _panel(n_series=4, length=24):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'unique_id': np.repeat(np.arange(n_series), length),
+                         'ds': np.tile(np.arange(length), n_series),
+                         'y': rng.poisson(2., n_series * length).astype(np.float64)})
+
+def _horizon(y, h):
+    uids = y['unique_id'].unique()
+    return pd.DataFrame({'unique_id': np.repeat(uids, h),
+                         'ds': np.tile(np.arange(h), len(uids))})
+
+def test_pickle_round_trip():
+    states = {'a': {'last': np.arange(3, dtype=np.float64),
+                    'season': np.arange(12, dtype=np.float32).reshape(3, 4)},
+              'b': {'period': np.array([1, 2, 3]), 'level': np.ones(3)}}
+    objects = np.empty(3, dtype=object)
+    objects[:] = [_Mean().fit(None, [i]) for i in range(3)]
+    store = FittedModels(pd.Index(['x', 'y', 'z']), states, {'c': objects})
+
+    loaded = pickle.loads(pickle.dumps(store))
+
+    assert loaded.uids.equals(store.uids)
+    assert loaded.models == ['a', 'b', 'c']
+    for model_name, state in states.items():
+        for key, value in state.items():
+            assert loaded.states[model_name][key].dtype == value.dtype
+            np.testing.assert_array_equal(loaded.states[model_name][key], value)
+    assert [model.mean_ for model in loaded.objects['c']] == [0., 1., 2.]
+
+def test_from_lists_stacks_states():
+    store = FittedModels.from_lists(['x', 'y'],
+                                    {'a': [{'level': 1.}, {'level': 2.}]},
+                                    {'b': [_Mean(), _Mean()]})
+
+    np.testing.assert_array_equal(store.states['a']['level'], [1., 2.])
+    assert store.objects['b'].dtype == object and len(store.objects['b']) == 2
+    assert len(store) == 2
+
+def test_pickled_trainer_predicts_the_same():
+    y = _panel()
+    models = {'naive': Naive(), 'naive2': Naive2(4), 'croston': Croston(),
+              'tsb': TSB(), 'mean': _Mean()}
+    trainer = BaseModelsTrainer(models, scheduler='threads', predict_scheduler='threads',
+                                partitions=2).fit(None, y)
+    X = _horizon(y, 6)
+
+    forecasts = trainer.predict(X)
+    loaded = pickle.loads(pickle.dumps(trainer))
+
+    assert set(trainer.fitted_models_.states) == {'naive', 'naive2', 'croston', 'tsb'}
+    pd.testing.assert_frame_equal(loaded.predict(X), forecasts)
+    for model_name, model in models.items():
+        expected = [model.fit(None, group['y'].values).predict(np.empty(6))
+                    for _, group in y.groupby('unique_id')]
+        np.testing.assert_allclose(forecasts[model_name].values,
+                                   np.concatenate(expected), rtol=1e-10)
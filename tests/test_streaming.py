@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fforma.base import Naive2
+from fforma.base.trainer import BaseModelsTrainer
+from fforma.utils.streaming import CSVSink, iter_series_chunks
+from test_store import _Mean
+
+
+def _panel(n_series=7):
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(5, 15, n_series)
+    return pd.DataFrame({'unique_id': np.repeat(np.arange(n_series), lengths),
+                         'ds': np.concatenate([np.arange(length) for length in lengths]),
+                         'y': rng.gamma(2., size=lengths.sum())})
+
+@pytest.mark.parametrize('read_chunksize', [3, 8, 1000])
+def test_chunks_of_a_file_hold_complete_series(tmp_path, read_chunksize):
+    y = _panel()
+    path = tmp_path / 'y.csv'
+    y.to_csv(path, index=False)
+
+    chunks = list(iter_series_chunks(str(path), 3, chunksize=read_chunksize))
+
+    assert [chunk['unique_id'].nunique() for chunk in chunks] == [3, 3, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks).reset_index(drop=True), y)
+
+def test_chunks_of_a_dataframe_are_sorted():
+    y = _panel()
+    chunks = list(iter_series_chunks(y.sample(frac=1, random_state=0), 2))
+
+    assert [list(chunk['unique_id'].unique()) for chunk in chunks] == [[0, 1], [2, 3],
+                                                                       [4, 5], [6]]
+    pd.testing.assert_frame_equal(pd.concat(chunks).reset_index(drop=True), y)
+
+def test_stream_matches_fit_predict(tmp_path):
+    y = _panel()
+    models = {'mean': _Mean(), 'naive2': Naive2(4)}
+    kwargs = dict(scheduler='threads', partitions=2)
+    sink = CSVSink(tmp_path / 'forecasts.csv')
+
+    BaseModelsTrainer(models, **kwargs).fit_predict_stream(y, 3, sink, chunk_size=3)
+    expected = BaseModelsTrainer(models, **kwargs).fit_predict(None, y, 3)
+
+    assert sink.n_rows == len(expected)
+    pd.testing.assert_frame_equal(pd.read_csv(sink.path), expected, check_dtype=False)
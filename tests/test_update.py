@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fforma.base import (Naive, SeasonalNaive, Naive2, RandomWalkDrift, Average,
+                         MovingAverage, SeasonalMovingAverage, Croston, TSB,
+                         fit_panel, predict_panel, to_panel, update_panel)
+from fforma.base._panel import has_panel_update
+from fforma.base.trainer import BaseModelsTrainer
+from test_panel import SERIES
+from test_store import _Mean, _horizon
+
+# New observations of each series of SERIES, the second one has none
+NEW = [np.array([11., 12.]), np.empty(0), np.arange(20., 29.), np.array([7.])]
+
+MODELS = {'naive': Naive(), 'snaive': SeasonalNaive(4), 'naive2': Naive2(4),
+          'rwd': RandomWalkDrift(), 'average': Average(), 'ma': MovingAverage(3),
+          'sma': SeasonalMovingAverage(4, n_seasons=3), 'croston': Croston(),
+          'tsb': TSB(), 'mean': _Mean()}
+
+
+def _long(series):
+    return pd.DataFrame({'unique_id': np.repeat(np.arange(len(series)), [len(s) for s in series]),
+                         'ds': np.concatenate([np.arange(len(s)) for s in series]),
+                         'y': np.concatenate(series)})
+
+@pytest.mark.parametrize('model_name', [name for name, model in MODELS.items()
+                                        if has_panel_update(model)])
+def test_update_panel_matches_fit_panel(model_name):
+    model = MODELS[model_name]
+    values, indptr = to_panel(SERIES)
+    new_values, new_indptr = to_panel(NEW)
+    full_values, full_indptr = to_panel([np.r_[y, new] for y, new in zip(SERIES, NEW)])
+
+    state = update_panel(model, fit_panel(model, values, indptr), new_values, new_indptr)
+    expected = fit_panel(model, full_values, full_indptr)
+
+    np.testing.assert_allclose(predict_panel(model, state, 10),
+                               predict_panel(model, expected, 10), rtol=1e-10)
+
+def test_trainer_update_matches_refit():
+    y = _long(SERIES)
+    new = _long(NEW)
+    new['ds'] += y.groupby('unique_id')['ds'].max().reindex(new['unique_id']).values + 1
+    full = pd.concat([y, new]).sort_values(['unique_id', 'ds'])
+    X = _horizon(y, 6)
+
+    kwargs = dict(scheduler='threads', predict_scheduler='threads', partitions=2)
+    updated = BaseModelsTrainer(MODELS, **kwargs).fit(None, y).update(new).predict(X)
+    refitted = BaseModelsTrainer(MODELS, **kwargs).fit(None, full).predict(X)
+
+    pd.testing.assert_frame_equal(updated, refitted)